@@ -5,7 +5,6 @@ from pathlib import Path
 from datetime import datetime
 import streamlit as st
 from dotenv import load_dotenv
-import json
 import subprocess
 from subprocess import Popen, PIPE, STDOUT
 import time
@@ -15,11 +14,13 @@ from typing import Optional
 PROJECT_ROOT = Path(__file__).resolve().parent
 
 # --- imports del proyecto ---
+from core.extraccion import llm_cache, limite_llm, registro_llm
 from core.extraccion.regex_extract import regex_extract_min_fields
 from core.build_global_json import build_global_placeholders
+from core.modelo_placeholders import cargar_json, guardar_json
 from core.export_docx_template import export_docx_from_placeholder_map
-from core.extraccion.pdf_reader import leer_pdf_texto_completo
-from core.sintesis.instalacion_electrica import redactar_instalacion_llm
+from core.extraccion.pdf_reader import leer_pdf_hasta_campos, seleccionar_paginas_relevantes, texto_documento
+from core.sintesis.secciones import anotar_huellas, generar_secciones, recalcular
 
 # ========================
 # CONFIGURACIÓN INICIAL
@@ -56,13 +57,11 @@ def run_script_streaming(cmd: list[str], ui_title: str, height: int = 240) -> st
 
 
 def load_json(path: Path) -> dict:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return cargar_json(path)
 
 
 def save_json(path: Path, data: dict):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    guardar_json(path, data)
 
 
 def update_json_field(json_path: Path, updates: dict):
@@ -85,6 +84,38 @@ def comprobar_red_natura(json_path: Path) -> bool:
     return (estado == "en_red_natura") or bool(data.get("red_natura"))
 
 
+APARTADOS_MEDIO = {
+    "4.3_Medio_biotico": "🌱 4.3 Medio biótico",
+    "4.4_Medio_perceptual": "👁️ 4.4 Medio perceptual",
+    "4.5_Medio_socioeconomico": "👥 4.5 Medio socioeconómico",
+}
+
+
+def redactar_medio_en_vivo(json_path: Path, dentro: bool) -> dict:
+    """Redacta 4.3-4.5 en este proceso, pintando cada apartado según llega del modelo."""
+    cajas = {k: st.empty() for k in APARTADOS_MEDIO}
+    ultimo = {}
+
+    def pintar(clave: str, texto: str):
+        # Repintar en cada token satura el navegador: como mucho ~10 veces por segundo
+        ahora = time.monotonic()
+        if clave in cajas and ahora - ultimo.get(clave, 0) >= 0.1:
+            ultimo[clave] = ahora
+            cajas[clave].markdown(f"**{APARTADOS_MEDIO[clave]}**\n\n{texto}▌")
+
+    data = load_json(json_path)
+    with registro_llm.informe_llm(json_path):
+        if dentro:
+            from core.sintesis.medio_biotico_red_natura import redactar_medio_red_natura
+            apartados = redactar_medio_red_natura(data, on_apartado=pintar)
+        else:
+            from core.sintesis.medio_biotico_no_red_natura import redactar_medio_no_red_natura
+            apartados = redactar_medio_no_red_natura(data, on_apartado=pintar)
+    for caja in cajas.values():
+        caja.empty()  # el texto definitivo se muestra abajo, editable
+    return apartados
+
+
 def find_script(*paths: str) -> str:
     """Busca el primer script existente entre varias rutas posibles."""
     for p in paths:
@@ -93,6 +124,17 @@ def find_script(*paths: str) -> str:
             return str(candidate)
     raise FileNotFoundError(f"No se encontró ninguno de los scripts: {paths}")
 
+def rangos_paginas(paginas: list[int]) -> str:
+    """[1, 2, 3, 7, 9, 10] -> "1-3, 7, 9-10"."""
+    tramos = []
+    for n in paginas:
+        if tramos and n == tramos[-1][1] + 1:
+            tramos[-1][1] = n
+        else:
+            tramos.append([n, n])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in tramos) or "ninguna"
+
+
 def get_latest_json(output_dir: str = "outputs") -> Optional[Path]:
     """Devuelve el JSON más reciente en outputs/."""
     out_dir = Path(output_dir)
@@ -106,22 +148,57 @@ pdf = st.file_uploader("📄 Sube el PROYECTO en PDF", type=["pdf"])
 
 if pdf and "json_path" not in st.session_state:
     with st.spinner("🔍 Procesando el documento..."):
-        texto_completo = leer_pdf_texto_completo(pdf)
+        # Se deja de leer en cuanto aparecen todos los datos y bloques (el resto suelen ser planos/anexos)
+        lectura = leer_pdf_hasta_campos(pdf)
+        paginas = lectura["paginas"]
+        texto_completo = texto_documento(paginas)
+        # Al LLM solo van las páginas con más puntuación, no el documento entero
+        texto_relevante, paginas_usadas = seleccionar_paginas_relevantes(paginas)
         datos_regex = regex_extract_min_fields(texto_completo)
 
         out_dir = Path("outputs")
         out_dir.mkdir(exist_ok=True)
         json_path = out_dir / f"placeholders_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
 
+        cache_antes = llm_cache.estadisticas()
         build_global_placeholders(
-            texto_relevante=texto_completo,
+            texto_relevante=texto_relevante,
             texto_completo_pdf=texto_completo,
             datos_regex_min=datos_regex,
             save_to=str(json_path)
         )
+        cache_despues = llm_cache.estadisticas()
+        cola = limite_llm.metricas(ventana_s=600)
 
         st.success("✅ PDF procesado correctamente.")
         st.caption(f"📁 JSON generado: `{json_path.name}`")
+        st.caption(f"🔎 Páginas leídas: {lectura['leidas']}"
+                   + ("" if lectura["total"] is None else f" de {lectura['total']}")
+                   + f" · enviadas al modelo: {len(paginas_usadas)}")
+        if lectura["reutilizadas"] and lectura["reextraidas"]:
+            # Versión revisada de un PDF ya leído: solo se extraen y limpian las páginas que cambian
+            st.caption(f"♻️ Páginas reutilizadas de la caché: {rangos_paginas(lectura['reutilizadas'])}"
+                       f" · reextraídas: {rangos_paginas(lectura['reextraidas'])}")
+        st.caption(f"🗃️ Caché LLM: {cache_despues['aciertos'] - cache_antes['aciertos']} aciertos, "
+                   f"{cache_despues['fallos'] - cache_antes['fallos']} fallos")
+        if any(m["esperaron"] for m in cola.values()):
+            st.caption("⏳ Cola LLM (10 min, todos los procesos): " + " · ".join(
+                f"{modelo} p95 {m['p95_s']:.1f} s ({m['esperaron']}/{m['llamadas']} esperaron)"
+                for modelo, m in cola.items()))
+        extraccion = load_json(json_path).get("extraccion_llm") or {}
+        ventanas, tiempos = extraccion.get("ventanas") or {}, extraccion.get("tiempos") or {}
+        if ventanas.get("tokens_texto"):
+            st.caption(f"✂️ Extracción por ventanas: {ventanas['tokens_ventanas']} de "
+                       f"{ventanas['tokens_texto']} tokens "
+                       f"(ahorro {ventanas['ahorro_pct']} %)")
+        elif extraccion.get("modo") == "omitido":
+            st.caption("✂️ Extracción resuelta por regex: sin llamada al modelo")
+        if tiempos.get("total_s") is not None:
+            st.caption(f"⏱️ Extracción {tiempos['total_s']:.1f} s "
+                       f"(LLM {tiempos['llm_s']:.1f} s y bloques "
+                       f"{tiempos['bloques_s']:.1f} s a la vez)")
+        if lectura["faltan"]:
+            st.warning(f"⚠️ No localizados en el PDF: {', '.join(lectura['faltan'])}")
 
         st.session_state["json_path"] = str(json_path)
         st.session_state["pdf_cargado"] = True
@@ -155,17 +232,17 @@ with col2:
         seleccion = "fotovoltaica"
 
 if seleccion:
-    data = load_json(json_path)
-    tipo_anterior = st.session_state.get("ultimo_tipo")
+    update_json_field(json_path, {"tipo_instalacion": seleccion})
+    # Solo se redacta si cambió alguna entrada (tipo, potencia, municipio...) desde la última vez
+    with st.spinner(f"⚙️ Generando texto técnico para instalación {seleccion}..."):
+        informe = recalcular(json_path, ["instalacion_electrica"])
 
-    if tipo_anterior != seleccion:
-        with st.spinner(f"⚙️ Generando texto técnico para instalación {seleccion}..."):
-            nuevo_texto = redactar_instalacion_llm(data, tipo=seleccion)
-            update_json_field(json_path, {"instalacion_electrica": nuevo_texto})
-            st.session_state["ultimo_tipo"] = seleccion
+    if "instalacion_electrica" in informe["generadas"]:
         st.success(f"✅ Texto actualizado: instalación {seleccion}.")
-    else:
+    elif "instalacion_electrica" in informe["al_dia"]:
         st.info("ℹ️ Ya está generada esta opción.")
+    else:
+        st.error(f"❌ Error generando el texto: {informe['errores'].get('instalacion_electrica')}")
 
     texto_actual = load_json(json_path).get("instalacion_electrica", "")
     if texto_actual:
@@ -220,38 +297,17 @@ if st.button("🔎 Comprobar Red Natura y generar medio biótico si procede"):
 
     if dentro:
         st.success("✅ Dentro de Red Natura 2000. Generando medio biótico específico…")
-        try:
-            run_script_streaming(
-                [sys.executable, "-u", "core/sintesis/medio_biotico_red_natura.py", str(json_path)],
-                ui_title="🪶 Log medio biótico Red Natura (en vivo)",
-                height=220
-            )
-            # Esperar hasta que el campo se complete
-            for _ in range(5):
-                time.sleep(1)
-                data_actual = load_json(json_path)
-                if data_actual.get("4.3_Medio_biotico"):
-                    break
-            st.success("🪶 Medio biótico/perceptual/socioeconómico (Red Natura) generado.")
-        except Exception as e:
-            st.error(f"Error generando medio biótico (Red Natura): {e}")
-
     else:
         st.warning("⚠️ Fuera de Red Natura 2000. Generando medio biótico estándar…")
-        try:
-            run_script_streaming(
-                [sys.executable, "-u", "core/sintesis/medio_biotico_no_red_natura.py", str(json_path)],
-                ui_title="🪶 Log medio biótico (fuera Red Natura)",
-                height=220
-            )
-            for _ in range(5):
-                time.sleep(1)
-                data_actual = load_json(json_path)
-                if data_actual.get("4.3_Medio_biotico"):
-                    break
-            st.success("🪶 Medio biótico/perceptual/socioeconómico (fuera Red Natura) generado.")
-        except Exception as e:
-            st.error(f"Error generando medio biótico: {e}")
+    try:
+        apartados = redactar_medio_en_vivo(json_path, dentro)
+        data = {**load_json(json_path), **apartados}
+        anotar_huellas(data, ["medio"])
+        save_json(json_path, data)
+        origen = "Red Natura" if dentro else "fuera Red Natura"
+        st.success(f"🪶 Medio biótico/perceptual/socioeconómico ({origen}) generado.")
+    except Exception as e:
+        st.error(f"Error generando medio biótico: {e}")
 
     data_actual = load_json(json_path)
     update_json_field(json_path, {
@@ -300,6 +356,40 @@ else:
 
 
 
+# ========================
+# ⚡ SECCIONES IA EN PARALELO
+# ========================
+st.markdown("---")
+st.subheader("⚡ Redactar todas las secciones IA a la vez")
+st.caption("Consumo, localización, alternativas, instalación eléctrica (si ya se eligió), usos actuales "
+           "y 4.3–4.5 (si ya se comprobó Red Natura), lanzadas en paralelo.")
+
+if st.button("🚀 Generar secciones en paralelo"):
+    with st.spinner("Generando secciones…"):
+        informe = generar_secciones(json_path)
+    suma = sum(informe["tiempos_s"].values())
+    st.success(f"✅ {len(informe['generadas'])} secciones en {informe['total_s']:.1f} s "
+               f"(en serie habrían sido ~{suma:.1f} s) · caché: {informe['cache']['aciertos']} aciertos")
+    if informe["cola"]["esperas"] or informe["cola"]["rechazos_429"]:
+        st.caption(f"⏳ Límite de ritmo: {informe['cola']['esperas']} llamadas en cola "
+                   f"({informe['cola']['espera_s']:.1f} s), {informe['cola']['rechazos_429']} rechazos 429")
+    if informe["omitidas"]:
+        st.info(f"ℹ️ Sin datos todavía: {', '.join(informe['omitidas'])}")
+    for nombre, err in informe["errores"].items():
+        st.warning(f"⚠️ {nombre}: {err}")
+
+st.caption("Tras corregir un dato (tipo de instalación, coordenadas, Red Natura…) basta con recalcular: "
+           "solo se redactan de nuevo las secciones cuyas entradas han cambiado.")
+if st.button("🔁 Recalcular solo lo desactualizado"):
+    with st.spinner("Comprobando qué secciones han quedado desactualizadas…"):
+        informe = recalcular(json_path)
+    if informe["generadas"]:
+        st.success(f"✅ Regeneradas: {', '.join(informe['generadas'])} ({informe['total_s']:.1f} s)")
+    st.info(f"ℹ️ Al día, sin regenerar: {', '.join(informe['al_dia']) or '—'}")
+    for nombre, err in informe["errores"].items():
+        st.warning(f"⚠️ {nombre}: {err}")
+
+
 # ========================
 # EXPORTAR DOCX FINAL
 # ========================
@@ -344,6 +434,10 @@ if st.button("💾 Generar DOCX final"):
         )
 
     st.success("📄 Documento exportado correctamente.")
+    resumen_llm = registro_llm.escribir_resumen(json_path)
+    if resumen_llm["total"]["llamadas"] or resumen_llm["total"]["aciertos_cache"]:
+        st.caption(f"💶 LLM en este informe: {registro_llm.texto_resumen(resumen_llm)} · "
+                   f"detalle en `{registro_llm.carpeta_registro(json_path).name}/resumen.json`")
     with open(docx_path, "rb") as f:
         st.download_button(
             "⬇️ Descargar DOCX generado",
@@ -0,0 +1,72 @@
+# benchmarks/bench_llm_client.py
+"""
+Latencia por llamada con un cliente OpenAI nuevo en cada llamada (conexión + TLS cada vez)
+frente al cliente compartido de llm_utils.get_client() (pool keep-alive).
+
+Hace llamadas reales y mínimas (max_tokens=1) al modelo indicado, sin pasar por la caché.
+Respeta OPENAI_API_KEY y OPENAI_BASE_URL.
+
+Uso:
+    python benchmarks/bench_llm_client.py [--calls 10] [--model gpt-4o-mini] [--llamadas-informe 8]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from core.extraccion.llm_utils import get_client, cerrar_clientes
+
+load_dotenv(PROJECT_ROOT / ".env", override=True)
+
+
+def _llamar(cliente, model: str):
+    cliente.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": "Responde solo: ok"}],
+        max_tokens=1,
+        temperature=0,
+    )
+
+
+def _medir(fabrica, model: str, calls: int):
+    tiempos = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        _llamar(fabrica(), model)
+        tiempos.append(time.perf_counter() - t0)
+    return tiempos
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=10)
+    ap.add_argument("--model", default="gpt-4o-mini")
+    ap.add_argument("--llamadas-informe", type=int, default=8,
+                    help="llamadas al LLM de un informe completo (extracción + síntesis)")
+    args = ap.parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    nuevo = _medir(lambda: OpenAI(api_key=api_key), args.model, args.calls)
+    cerrar_clientes()
+    get_client()  # el pool se crea una vez, como en una ejecución real
+    compartido = _medir(get_client, args.model, args.calls)
+
+    m_nuevo, m_comp = statistics.median(nuevo), statistics.median(compartido)
+    print(f"cliente por llamada : mediana {m_nuevo * 1000:7.1f} ms")
+    print(f"cliente compartido  : mediana {m_comp * 1000:7.1f} ms")
+    ahorro = m_nuevo - m_comp
+    print(f"ahorro por llamada  : {ahorro * 1000:7.1f} ms "
+          f"-> ~{ahorro * args.llamadas_informe:.2f} s por informe ({args.llamadas_informe} llamadas)")
+
+
+if __name__ == "__main__":
+    main()
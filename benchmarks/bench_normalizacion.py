@@ -0,0 +1,124 @@
+# benchmarks/bench_normalizacion.py
+"""
+Compara la limpieza de texto de antes (cada módulo con sus replace/re.sub sobre el texto
+completo) con el motor común de core/extraccion/normalizacion.py (translate + regex
+precompiladas, una vez por documento y en caché), sobre el texto de un PDF o sobre un
+texto sintético de ~1 MB. Cuenta las pasadas sobre el texto completo y mide el tiempo.
+
+Uso:
+    python benchmarks/bench_normalizacion.py [proyecto.pdf] [--repeat 5]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.extraccion import normalizacion
+from core.extraccion.bloques_textuales import _RUIDO_PDF, _quitar_lineas_indice
+
+_FRAGMENTOS = [
+    "1.1. ANTECEDENTES", "1.2 Objeto ............ 4", "--- Página 12 ---", "GEOLOGÍA",
+    "El sondeo se locali-\nza en la parcela 2621", "Caudal máximo instantáneo:\t2,5 l/s",
+    "diámetro de perfo\u00ADración 300 mm", "Índice", "\r\n",
+]
+
+
+def _texto_sintetico(n_chars: int = 1_000_000) -> str:
+    random.seed(0)
+    relleno = "Memoria técnica del sondeo  con 12 datos, 3 parcelas y otra línea de texto corrido.\n" * 6
+    partes, total = [], 0
+    while total < n_chars:
+        p = relleno + (random.choice(_FRAGMENTOS) + "\n\n\n" if random.random() < 0.3 else "")
+        partes.append(p)
+        total += len(p)
+    return "".join(partes)
+
+
+def _antes(texto: str):
+    """Limpieza de bloques_textuales antes del motor común. Devuelve (texto, pasadas)."""
+    pasos = [
+        lambda s: s.replace("\r", "\n"),
+        lambda s: s.replace("\u00A0", " "),
+        lambda s: s.replace("\u00AD", ""),
+        lambda s: re.sub(r"(?<=\w)-\n(?=\w)", "", s),
+        lambda s: re.sub(r"Pl\.\s*San\s*Crist[oó]bal[^\n]+ipsaingenieros\.com", "", s, flags=re.I),
+        lambda s: re.sub(r"---\s*P[aá]gina\s*\d+\s*---", "", s, flags=re.I),
+        lambda s: re.sub(r"[ \t]+", " ", s),
+        lambda s: re.sub(r"\n{3,}", "\n\n", s),
+        lambda s: s.strip(),
+    ]
+    for paso in pasos:
+        texto = paso(texto)
+    # Índice: dos re.search por línea (cuentan como dos pasadas más sobre el texto)
+    out = []
+    for line in texto.splitlines():
+        L = line.strip()
+        if re.search(r"\.{3,}\s*\d{1,4}\s*$", L):
+            continue
+        if re.search(r"^\s*(Contenido|Índice)\s*:?\s*$", L, re.IGNORECASE):
+            continue
+        out.append(line)
+    return "\n".join(out), len(pasos) + 2
+
+
+def _ahora(texto: str, consumidores: int):
+    """
+    Motor común: pdf_reader normaliza el documento y los demás consumidores (build_global_json,
+    bloques_textuales) lo reciben de la caché; bloques solo añade su purga y el índice.
+    Devuelve (texto, pasadas).
+    """
+    antes = normalizacion.estadisticas()["pasadas"]
+    for _ in range(consumidores):
+        s = normalizacion.normalizar_documento(texto)
+    s = _quitar_lineas_indice(_RUIDO_PDF.sub("", s))
+    return s, normalizacion.estadisticas()["pasadas"] - antes + 2
+
+
+def _comparable(s: str) -> str:
+    # La purga ya no recolapsa lo que deja; cada bloque se colapsa al recortarlo
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _medir(fn, repeat: int):
+    tiempos = []
+    for _ in range(repeat):
+        normalizacion._CACHE.clear()
+        t0 = time.perf_counter()
+        res = fn()
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos), res
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdf", type=Path, nargs="?")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--consumidores", type=int, default=3,
+                    help="módulos que piden el texto normalizado del mismo documento")
+    args = ap.parse_args()
+
+    if args.pdf:
+        from core.extraccion.pdf_reader import leer_pdf_paginas
+        with open(args.pdf, "rb") as f:
+            texto = "\n\n".join(leer_pdf_paginas(f, use_cache=False))
+    else:
+        texto = _texto_sintetico()
+
+    print(f"{len(texto)} caracteres")
+    t_antes, (ref, p_antes) = _medir(lambda: _antes(texto), args.repeat)
+    t_ahora, (res, p_ahora) = _medir(lambda: _ahora(texto, args.consumidores), args.repeat)
+    print(f"antes : {p_antes:2d} pasadas  {t_antes * 1000:8.1f} ms")
+    print(f"ahora : {p_ahora:2d} pasadas  {t_ahora * 1000:8.1f} ms  (x{t_antes / t_ahora:4.2f}, "
+          f"{p_antes - p_ahora} pasadas menos)  salida {'OK' if _comparable(res) == _comparable(ref) else 'DIFIERE'}")
+    e = normalizacion.estadisticas()
+    print(f"caché de normalización: {e['documentos']} documentos normalizados, {e['aciertos']} aciertos")
+
+
+if __name__ == "__main__":
+    main()
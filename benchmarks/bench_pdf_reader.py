@@ -0,0 +1,57 @@
+# benchmarks/bench_pdf_reader.py
+"""
+Compara la extracción de texto en serie frente a la extracción por procesos,
+y los backends de texto disponibles (pdfplumber / pymupdf) entre sí.
+
+Uso:
+    python benchmarks/bench_pdf_reader.py <proyecto.pdf> [--workers 2 4 8] [--repeat 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.extraccion.pdf_reader import _read_all_pages
+from core.extraccion.pdf_backends import calibrar, disponibles
+
+
+def _medir(pdf_path: Path, workers: int, repeat: int, backend: str = "pdfplumber"):
+    tiempos, paginas = [], None
+    for _ in range(repeat):
+        with open(pdf_path, "rb") as f:
+            t0 = time.perf_counter()
+            pages = _read_all_pages(f, workers=workers, backend=backend)
+            tiempos.append(time.perf_counter() - t0)
+        paginas = pages
+    return min(tiempos), paginas
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdf", type=Path)
+    ap.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    base, ref = _medir(args.pdf, 1, args.repeat)
+    print(f"{len(ref)} páginas")
+    print(f"serie          : {base:7.2f} s")
+    for w in args.workers:
+        t, pages = _medir(args.pdf, w, args.repeat)
+        igual = "OK" if pages == ref else "DIFIERE"
+        print(f"{w:2d} procesos    : {t:7.2f} s  (x{base / t:4.2f})  salida {igual}")
+
+    print("\nBackends (en serie):")
+    for nombre in disponibles():
+        t, pages = _medir(args.pdf, 1, args.repeat, backend=nombre)
+        chars = sum(len(p) for p in pages)
+        print(f"{nombre:14s} : {t:7.2f} s  (x{base / t:4.2f})  {chars} caracteres")
+    calibrar(args.pdf.read_bytes(), verbose=True)
+
+
+if __name__ == "__main__":
+    main()
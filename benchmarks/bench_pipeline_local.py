@@ -0,0 +1,106 @@
+# benchmarks/bench_pipeline_local.py
+"""
+Informe completo (extracción + secciones IA en paralelo) contra el servidor LLM local,
+sin red ni gasto de API: mide la latencia de extremo a extremo y su reparto por etapa.
+
+Parte de un JSON de placeholders ya generado (su texto hace de "PDF"), arranca
+servidor_llm_local en un hilo y ejecuta N informes, opcionalmente varios a la vez
+para ver cómo se comportan el limitador de ritmo y el pool de conexiones bajo carga.
+La caché LLM se desactiva para que cada informe haga sus llamadas.
+
+Uso:
+    python benchmarks/bench_pipeline_local.py outputs/placeholders_XXXX.json
+        [--informes 5] [--paralelo 1] [--perfil realista] [--errores 0.0] [--lentas 0.0] [--puerto 8765]
+    Con EIA_LLM_RESPALDO=1 y --lentas 0.05 se ve el efecto del respaldo en la cola de latencias.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# Antes de importar la app: sin caché (se lee al importar llm_cache)
+os.environ["EIA_LLM_CACHE"] = "0"
+
+from benchmarks.servidor_llm_local import PERFILES, arrancar
+from core.build_global_json import build_global_placeholders
+from core.extraccion import limite_llm, respaldo_llm
+from core.extraccion.regex_extract import regex_extract_min_fields
+from core.modelo_placeholders import cargar_json, guardar_json
+from core.sintesis.secciones import generar_secciones
+
+# Secciones que no necesitan red más allá del LLM (Red Natura consulta el visor del SDF)
+SECCIONES = ["PH_Consumo", "PH_Localizacion", "alternativas", "instalacion_electrica", "usos_actuales", "medio"]
+
+
+def _texto_base(data: dict) -> str:
+    return "\n\n".join(str(v) for k, v in data.items() if k.startswith("PH_") and isinstance(v, str))
+
+
+def _informe(base: dict, texto: str, carpeta: Path, i: int) -> dict:
+    json_path = carpeta / f"placeholders_bench_{i}.json"
+    t0 = time.perf_counter()
+    build_global_placeholders(texto_relevante=texto, texto_completo_pdf=texto,
+                              datos_regex_min=regex_extract_min_fields(texto), save_to=str(json_path))
+    t_extraccion = time.perf_counter() - t0
+
+    data = cargar_json(json_path)
+    # Datos que en la app llegan por botones: sin Red Natura y con conexión a red
+    data.update({k: base[k] for k in ("PH_Consumo", "PH_Localizacion") if base.get(k)})
+    data.update({"estado_red_natura": "fuera_red_natura", "tipo_instalacion": "red"})
+    guardar_json(json_path, data)
+
+    inf = generar_secciones(json_path, SECCIONES)
+    return {"extraccion_s": t_extraccion, "secciones_s": inf["total_s"],
+            "total_s": time.perf_counter() - t0, "errores": inf["errores"]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("json", help="JSON de placeholders de partida (outputs/placeholders_*.json)")
+    ap.add_argument("--informes", type=int, default=5)
+    ap.add_argument("--paralelo", type=int, default=1, help="informes simultáneos")
+    ap.add_argument("--perfil", choices=sorted(PERFILES), default="realista")
+    ap.add_argument("--errores", type=float, default=0.0)
+    ap.add_argument("--lentas", type=float, default=0.0, help="fracción de llamadas con +--lentas-s de retraso")
+    ap.add_argument("--lentas-s", type=float, default=20.0)
+    ap.add_argument("--puerto", type=int, default=8765)
+    args = ap.parse_args()
+
+    servidor = arrancar(args.puerto, args.perfil, args.errores, lentas=args.lentas, lentas_s=args.lentas_s)
+    os.environ["EIA_LLM_BASE_URL"] = f"http://127.0.0.1:{args.puerto}/v1"
+
+    base = cargar_json(args.json)
+    texto = _texto_base(base)
+    carpeta = Path(tempfile.mkdtemp(prefix="eia_bench_"))
+    try:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.paralelo) as ex:
+            res = list(ex.map(lambda i: _informe(base, texto, carpeta, i), range(args.informes)))
+        pared = time.perf_counter() - t0
+    finally:
+        servidor.shutdown()
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+    for etapa in ("extraccion_s", "secciones_s", "total_s"):
+        v = [r[etapa] for r in res]
+        print(f"{etapa:13s} mediana {statistics.median(v):6.2f} s · máx {max(v):6.2f} s")
+    errores = sum(len(r["errores"]) for r in res)
+    print(f"{args.informes} informes ({args.paralelo} a la vez, perfil {args.perfil}) en {pared:.2f} s · "
+          f"{args.informes / pared * 60:.1f} informes/min · {errores} secciones con error")
+    estado = servidor.RequestHandlerClass.estado
+    print(f"servidor: {dict(estado.peticiones)} · fallos inyectados {dict(estado.fallos)}")
+    print(limite_llm.resumen())
+    print(respaldo_llm.resumen())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_regex_extract.py
+"""
+Compara el motor de extracción regex de una pasada (anclas + re.match) con el recorrido
+secuencial de antes (un re.search por campo sobre todo el texto), sobre el texto de un PDF
+o sobre un texto sintético de ~1 MB.
+
+Uso:
+    python benchmarks/bench_regex_extract.py [proyecto.pdf] [--repeat 5]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.extraccion.regex_extract import _CAMPOS, regex_extract_candidates
+
+_FRAGMENTOS = [
+    "X = 254.123,5", "Y= 4.612.345", "Huso 30", "ETRS89", "Latitud = 41º 2' 3\" N",
+    "La profundidad proyectada del sondeo será de 120 m.",
+    "El diámetro definitivo de la entubación\nserá de 180 mm",
+    "diámetro inicial de perforación será como mínimo de 300 mm",
+    "tubería de impulsión de PE de 63 mm", "Caudal máximo instantáneo: 2,5 l/s",
+    "bomba de 7,5 C.V. (5,5 kW)",
+]
+
+
+def _texto_sintetico(n_chars: int = 1_000_000) -> str:
+    random.seed(0)
+    relleno = "Memoria técnica del sondeo con 12 datos, 3 parcelas y otra línea de texto corrido. " * 12 + "\n"
+    partes, total = [], 0
+    while total < n_chars:
+        p = relleno + (random.choice(_FRAGMENTOS) + "\n" if random.random() < 0.02 else "")
+        partes.append(p)
+        total += len(p)
+    return "".join(partes)
+
+
+def _secuencial(texto: str) -> dict:
+    """Primer valor de cada campo con un re.search por patrón (el recorrido antiguo)."""
+    out = {}
+    for campo, rx, grupo, conv in _CAMPOS.values():
+        m = rx.search(texto)
+        out[campo] = conv(m.group(grupo)) if m else None
+    return out
+
+
+def _una_pasada(texto: str) -> dict:
+    out = {}
+    for c in regex_extract_candidates(texto):
+        out.setdefault(c["campo"], c["valor"])
+    return {campo: out.get(campo) for campo in _CAMPOS}
+
+
+def _medir(fn, texto: str, repeat: int):
+    tiempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = fn(texto)
+        tiempos.append(time.perf_counter() - t0)
+    return min(tiempos), res
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdf", type=Path, nargs="?")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    if args.pdf:
+        from core.extraccion.pdf_reader import leer_pdf_texto_completo
+        with open(args.pdf, "rb") as f:
+            texto = leer_pdf_texto_completo(f, use_cache=False)
+    else:
+        texto = _texto_sintetico()
+
+    print(f"{len(texto)} caracteres")
+    t_seq, ref = _medir(_secuencial, texto, args.repeat)
+    t_one, res = _medir(_una_pasada, texto, args.repeat)
+    print(f"secuencial : {t_seq * 1000:8.1f} ms")
+    print(f"una pasada : {t_one * 1000:8.1f} ms  (x{t_seq / t_one:4.2f})  salida {'OK' if res == ref else 'DIFIERE'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# benchmarks/servidor_llm_local.py
+"""
+Servidor local compatible con /v1/chat/completions de OpenAI para ejecutar y medir la app
+sin red ni gasto de API.
+
+Devuelve respuestas deterministas (mismo prompt -> misma respuesta) según la familia del
+prompt: extracción, alternativas, medio biótico, consumo, localización, instalación eléctrica
+y usos actuales. Con response_format json_schema rellena el esquema recibido, así que la
+respuesta siempre lo cumple. Admite stream=True (SSE, como el API real).
+
+Los perfiles de latencia simulan el tiempo hasta el primer token y el ritmo de generación;
+--lentas añade una cola de peticiones muy lentas (para probar el respaldo de llm_utils) y
+--errores inyecta fallos 429/500 (todo reproducible con --semilla).
+
+Uso:
+    python benchmarks/servidor_llm_local.py [--puerto 8765] [--perfil realista] [--errores 0.05]
+    EIA_LLM_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+
+Estadísticas del servidor: GET /estadisticas
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Perfil(NamedTuple):
+    primer_token_s: float   # latencia hasta el primer token
+    s_por_token: float      # ritmo de generación
+    jitter: float           # variación relativa (0.3 = ±30 %)
+
+
+PERFILES: Dict[str, Perfil] = {
+    "instantaneo": Perfil(0.0, 0.0, 0.0),
+    "rapido": Perfil(0.15, 0.002, 0.2),
+    "realista": Perfil(0.6, 0.012, 0.3),   # ~80 tokens/s, como gpt-4.1-mini
+    "lento": Perfil(2.0, 0.03, 0.5),
+}
+
+# ================== Fixtures ==================
+DATOS_EXTRACCION: Dict[str, Any] = {
+    "id": "SONDEO-LOCAL-001",
+    "municipio": "Vega de Tera",
+    "provincia": "Zamora",
+    "poligono": "1",
+    "parcela": "2621",
+    "referencia_catastral": "49262A001026210000XY",
+    "uso_previsto": "riego agrícola",
+    "detalles_de_uso": "Riego por goteo de una parcela de cultivo leñoso.",
+    "caudal_max_instantaneo_l_s": 2.5,
+    "caudal_minimo_l_s": 0.8,
+    "numero_sondeos_previstos": 1,
+    "observaciones": None,
+}
+
+FRASES: Dict[str, List[str]] = {
+    "alternativas": [
+        "La alternativa de sondeo permite captar el recurso con una ocupación mínima del terreno.",
+        "La no actuación impediría atender la demanda de agua prevista para el uso indicado.",
+        "El pozo tradicional exige una excavación de mayor diámetro y un volumen de residuos superior.",
+        "La captación superficial depende de un caudal estacional que no garantiza el suministro.",
+        "El transporte mediante cubas supone un tránsito continuo de vehículos y emisiones asociadas.",
+        "La conexión a la red municipal no es viable por la distancia a las infraestructuras existentes.",
+    ],
+    "medio": [
+        "La vegetación del entorno está dominada por cultivos herbáceos de secano y setos de linde.",
+        "La fauna presente es la propia de medios agrarios, con aves esteparias y pequeños mamíferos.",
+        "El paisaje se caracteriza por un relieve llano con amplias cuencas visuales.",
+        "La actuación no altera la calidad escénica por su reducida dimensión y carácter temporal.",
+        "La economía local se basa en la agricultura y la ganadería extensiva.",
+        "La población del municipio muestra una dinámica demográfica regresiva y envejecida.",
+    ],
+    "consumo": [
+        "El consumo de agua previsto se ajusta a las necesidades hídricas del uso declarado.",
+        "El caudal máximo instantáneo se limita al valor indicado en la solicitud.",
+        "El volumen anual se distribuye en la campaña de riego, con máximos en los meses estivales.",
+    ],
+    "localizacion": [
+        "El sondeo se sitúa en el término municipal indicado, en suelo rústico.",
+        "La parcela se identifica por su polígono, parcela y referencia catastral.",
+        "El acceso se realiza por caminos agrícolas existentes, sin necesidad de abrir nuevos viales.",
+    ],
+    "instalacion": [
+        "El sistema de bombeo se alimentará mediante conexión a la red eléctrica existente.",
+        "La solución garantiza un suministro continuo sin instalaciones auxiliares ni acumuladores.",
+    ],
+    "usos": [
+        "La parcela se dedica actualmente a cultivo agrícola, sin construcciones en su interior.",
+        "En el entorno inmediato predominan las parcelas de labor y los caminos rurales.",
+    ],
+    "generico": [
+        "Texto de prueba generado por el servidor local.",
+    ],
+}
+
+# Longitud mínima de los textos de las respuestas estructuradas (cubre los minLength de la app)
+MIN_CHARS_JSON = 700
+
+
+def familia(prompt: str, esquema_nombre: Optional[str]) -> str:
+    if esquema_nombre:
+        return "medio" if esquema_nombre.startswith("medio") else esquema_nombre
+    p = prompt.lower()
+    if "devuelve exclusivamente un json válido con este esquema" in p and "localizacion" in p:
+        return "extraccion"
+    if "consumo de agua" in p:
+        return "consumo"
+    if "apartado “localización”" in p or "apartado \"localización\"" in p:
+        return "localizacion"
+    if "alimentación eléctrica" in p:
+        return "instalacion"
+    if "usos actuales" in p:
+        return "usos"
+    return "generico"
+
+
+def _texto(fam: str, semilla: str, min_chars: int) -> str:
+    frases = FRASES.get(fam) or FRASES["generico"]
+    rng = random.Random(semilla)
+    out: List[str] = []
+    while sum(len(f) + 1 for f in out) < min_chars:
+        out.append(rng.choice(frases))
+    return " ".join(out)
+
+
+def _rellenar(esquema: Dict[str, Any], fam: str, semilla: str, campo: str = "") -> Any:
+    tipos = esquema.get("type") or "string"
+    tipos = [tipos] if isinstance(tipos, str) else tipos
+    tipo = next((t for t in tipos if t != "null"), "null")
+    if "enum" in esquema:
+        return esquema["enum"][0]
+    if tipo == "object":
+        return {k: _rellenar(sub, fam, f"{semilla}/{k}", k) for k, sub in (esquema.get("properties") or {}).items()}
+    if tipo == "array":
+        return [_rellenar(esquema.get("items") or {}, fam, f"{semilla}/0", campo)]
+    if campo in DATOS_EXTRACCION:
+        valor = DATOS_EXTRACCION[campo]
+        if valor is None and "null" in tipos:
+            return None
+        if tipo == "string":
+            return str(valor if valor is not None else "")
+        if tipo in ("number", "integer") and isinstance(valor, (int, float)):
+            return int(valor) if tipo == "integer" else valor
+    if tipo == "string":
+        return _texto(fam, semilla, MIN_CHARS_JSON)
+    if tipo in ("number", "integer"):
+        return 1
+    if tipo == "boolean":
+        return True
+    return None
+
+
+def responder(prompt: str, response_format: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    """(familia, contenido) deterministas para el prompt."""
+    semilla = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    json_schema = (response_format or {}).get("json_schema") or {}
+    fam = familia(prompt, json_schema.get("name"))
+    if json_schema.get("schema"):
+        return fam, json.dumps(_rellenar(json_schema["schema"], fam, semilla), ensure_ascii=False)
+    if fam == "extraccion" or (response_format or {}).get("type") == "json_object":
+        datos = {
+            "id": DATOS_EXTRACCION["id"],
+            "localizacion": {k: DATOS_EXTRACCION[k] for k in
+                             ("municipio", "provincia", "poligono", "parcela", "referencia_catastral")},
+            "parametros": {k: DATOS_EXTRACCION[k] for k in
+                           ("uso_previsto", "detalles_de_uso", "caudal_max_instantaneo_l_s", "caudal_minimo_l_s")},
+            "particularidades": {k: DATOS_EXTRACCION[k] for k in ("numero_sondeos_previstos", "observaciones")},
+        }
+        return fam, json.dumps(datos, ensure_ascii=False)
+    return fam, _texto(fam, semilla, 500)
+
+
+# ================== Servidor ==================
+class Estado:
+    def __init__(self, perfil: Perfil, errores: float, proporcion_429: float, semilla: int,
+                 lentas: float = 0.0, lentas_s: float = 20.0):
+        self.perfil = perfil
+        self.lentas = lentas
+        self.lentas_s = lentas_s
+        self.errores = errores
+        self.proporcion_429 = proporcion_429
+        self.rng = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.peticiones: Counter = Counter()
+        self.fallos: Counter = Counter()
+
+    def sortear(self) -> Tuple[Optional[int], float, float]:
+        """(código de error o None, factor de jitter, retraso extra de cola) de la siguiente petición."""
+        with self.lock:
+            error = None
+            if self.rng.random() < self.errores:
+                error = 429 if self.rng.random() < self.proporcion_429 else 500
+            jitter = 1 + self.perfil.jitter * (2 * self.rng.random() - 1)
+            extra = self.lentas_s if self.rng.random() < self.lentas else 0.0
+        return error, jitter, extra
+
+
+def _trozos(texto: str, tam: int = 4) -> List[str]:
+    # ~1 token = 4 caracteres, como estimar_tokens
+    return [texto[i:i + tam] for i in range(0, len(texto), tam)]
+
+
+class Manejador(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    estado: Estado
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, codigo: int, cuerpo: Dict[str, Any], cabeceras: Optional[Dict[str, str]] = None):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        for k, v in (cabeceras or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/estadisticas", "/v1/estadisticas"):
+            with self.estado.lock:
+                self._json(200, {"peticiones": dict(self.estado.peticiones), "fallos": dict(self.estado.fallos)})
+        elif self.path.rstrip("/") in ("/salud", "/v1/models"):
+            self._json(200, {"object": "list", "data": []})
+        else:
+            self._json(404, {"error": {"message": "ruta no encontrada"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "ruta no encontrada"}})
+            return
+        cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        prompt = "\n".join(str(m.get("content") or "") for m in cuerpo.get("messages") or [])
+        model = cuerpo.get("model") or "local"
+        fam, contenido = responder(prompt, cuerpo.get("response_format"))
+        error, jitter, extra = self.estado.sortear()
+        perfil = self.estado.perfil
+        with self.estado.lock:
+            self.estado.peticiones[fam] += 1
+            if error:
+                self.estado.fallos[str(error)] += 1
+            if extra:
+                self.estado.fallos["lenta"] += 1
+
+        time.sleep(perfil.primer_token_s * jitter + extra)
+        if error == 429:
+            self._json(429, {"error": {"message": "Rate limit reached (simulado)", "type": "requests",
+                                       "code": "rate_limit_exceeded"}}, {"retry-after": "1"})
+            return
+        if error:
+            self._json(500, {"error": {"message": "Error interno (simulado)", "type": "server_error"}})
+            return
+
+        id_ = f"chatcmpl-local-{uuid.uuid4().hex[:12]}"
+        creado = int(time.time())
+        trozos = _trozos(contenido)
+        uso = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(trozos),
+               "total_tokens": len(prompt) // 4 + len(trozos)}
+        if not cuerpo.get("stream"):
+            time.sleep(perfil.s_por_token * jitter * len(trozos))
+            self._json(200, {
+                "id": id_, "object": "chat.completion", "created": creado, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": contenido},
+                             "finish_reason": "stop"}],
+                "usage": uso,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def evento(delta: Dict[str, Any], fin: Optional[str] = None):
+            chunk = {"id": id_, "object": "chat.completion.chunk", "created": creado, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": fin}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        evento({"role": "assistant", "content": ""})
+        for t in trozos:
+            time.sleep(perfil.s_por_token * jitter)
+            evento({"content": t})
+        evento({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def arrancar(puerto: int = 8765, perfil: str = "realista", errores: float = 0.0,
+             proporcion_429: float = 0.7, semilla: int = 0, host: str = "127.0.0.1",
+             lentas: float = 0.0, lentas_s: float = 20.0) -> ThreadingHTTPServer:
+    """Arranca el servidor en un hilo de fondo (para benchmarks) y lo devuelve; parar con .shutdown()."""
+    estado = Estado(PERFILES[perfil], errores, proporcion_429, semilla, lentas, lentas_s)
+    servidor = ThreadingHTTPServer((host, puerto), type("ManejadorLocal", (Manejador,), {"estado": estado}))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--puerto", type=int, default=8765)
+    ap.add_argument("--perfil", choices=sorted(PERFILES), default="realista")
+    ap.add_argument("--errores", type=float, default=0.0, help="fracción de peticiones que fallan (0-1)")
+    ap.add_argument("--proporcion-429", type=float, default=0.7, help="de los fallos, cuántos son 429 (el resto 500)")
+    ap.add_argument("--lentas", type=float, default=0.0, help="fracción de peticiones con retraso extra (0-1)")
+    ap.add_argument("--lentas-s", type=float, default=20.0, help="retraso extra de las peticiones lentas")
+    ap.add_argument("--semilla", type=int, default=0)
+    args = ap.parse_args()
+
+    servidor = arrancar(args.puerto, args.perfil, args.errores, args.proporcion_429, args.semilla, args.host,
+                        args.lentas, args.lentas_s)
+    print(f"Servidor LLM local en http://{args.host}:{args.puerto}/v1 (perfil {args.perfil}, "
+          f"errores {args.errores:.0%}). Exporta EIA_LLM_BASE_URL=http://{args.host}:{args.puerto}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
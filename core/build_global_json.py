@@ -1,5 +1,10 @@
-import os, json, unicodedata, re
-from typing import Dict, Any, Optional
+import os, time, unicodedata, re
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Tuple
+
+from core.extraccion.normalizacion import colapsar_espacios, limpiar_caracteres, normalizar_documento
+from core.modelo_placeholders import CLAVE_ORIGEN, FUENTES, guardar_json
 
 # --- utilidades básicas ---
 def _strip_accents(s: str) -> str:
@@ -23,6 +28,32 @@ def _flatten(d: Dict[str, Any], parent: str = "", sep: str = ".") -> Dict[str, A
             out[key] = v
     return out
 
+# Placeholders que son texto literal del PDF (bloques_textuales)
+BLOQUES_PLACEHOLDERS = ("PH_Antecedentes", "PH_Localizacion", "PH_Consumo", "geologia")
+
+def _origenes(placeholders: Dict[str, str], merged: Dict[str, Any], datos_regex: Dict[str, Any],
+              modo: str, dudosos: list) -> Dict[str, str]:
+    """
+    De dónde sale cada placeholder con valor: "bloques" (texto literal del PDF) o el origen del
+    dato del que se copia (FUENTES): "regex" si coincide con lo de la regex, si no se llamó al
+    LLM o si el LLM no lo pidió (modo reducido); "llm" en otro caso.
+    """
+    datos, regex = _flatten(merged), _flatten(datos_regex)
+    origen = {}
+    for ph, valor in placeholders.items():
+        if not valor:
+            continue
+        if ph in BLOQUES_PLACEHOLDERS:
+            origen[ph] = "bloques"
+            continue
+        fuentes = [f for f in FUENTES.get(ph, ()) if datos.get(f) not in (None, "", [])]
+        if not fuentes:
+            continue
+        f = next((f for f in fuentes if str(datos[f]) == valor), fuentes[0])
+        llm = modo != "omitido" and (modo == "completo" or f in dudosos or f.startswith("flags."))
+        origen[ph] = "llm" if llm and datos[f] != regex.get(f) else "regex"
+    return origen
+
 def _fmt_num(v) -> str:
     if v in (None, "", []):
         return ""
@@ -53,47 +84,88 @@ def _table_from_coords(coords: Dict[str, Any]) -> str:
     return "\n".join(lines).strip()
 
 # --- formateador avanzado para PH_Consumo ---
+_TITULO_CONSUMO = re.compile(r"^\s*(\d+[.,]?\d*\s*)?(Caudal\s+necesario)\s*[:\-–—]?\s*", re.IGNORECASE)
+# Saltos dobles antes de bloques relevantes y negritas automáticas: una alternancia cada uno
+_ANTES_DE_SALTO = re.compile(
+    r"(?=\bConsumos\s*:|\bEl\s+reparto|\bSondeo\s+(?:nuevo|existente)|\bPozo\s+existente|\bNOTA\s*:)",
+    re.IGNORECASE,
+)
+_NEGRITAS = re.compile(
+    r"\b(Consumos\s*:|Sondeo\s+nuevo\s*:?|Sondeo\s+existente\s*:?|Pozo\s+existente\s*:?|NOTA\s*:)",
+    re.IGNORECASE,
+)
+_SALTOS_REPETIDOS = re.compile(r"\n{2,}")
+_SALTOS_DE_MAS = re.compile(r"\n{3,}")
+
 def _format_consumo(text: str) -> str:
     """Limpia y formatea el bloque de consumo: elimina títulos, añade saltos y negritas automáticas."""
     if not text:
         return ""
 
-    s = re.sub(r"[ \t]+", " ", text)
-    s = re.sub(r"\n{2,}", "\n", s).strip()
+    s = colapsar_espacios(limpiar_caracteres(text))
+    s = _SALTOS_REPETIDOS.sub("\n", s).strip()
 
     # Elimina encabezados tipo "3.1. Caudal necesario"
-    s = re.sub(
-        r"^\s*(\d+[.,]?\d*\s*)?(Caudal\s+necesario)\s*[:\-–—]?\s*",
-        "",
-        s,
-        flags=re.IGNORECASE
-    )
+    s = _TITULO_CONSUMO.sub("", s)
 
-    # Añade saltos dobles antes de bloques relevantes
-    patrones_salto = [
-        r"(?=\bConsumos\s*:)",
-        r"(?=\bEl\s+reparto)",
-        r"(?=\bSondeo\s+(nuevo|existente))",
-        r"(?=\bPozo\s+existente)",
-        r"(?=\bNOTA\s*:)",
-    ]
-    for pat in patrones_salto:
-        s = re.sub(pat, "\n\n", s, flags=re.IGNORECASE)
-
-    # Negritas automáticas
-    reemplazos_negrita = {
-        r"\b(Consumos\s*:)"           : r"<b>\1</b>",
-        r"\b(Sondeo\s+nuevo\s*:?)"    : r"<b>\1</b>",
-        r"\b(Sondeo\s+existente\s*:?)": r"<b>\1</b>",
-        r"\b(Pozo\s+existente\s*:?)"  : r"<b>\1</b>",
-        r"\b(NOTA\s*:)"               : r"<b>\1</b>",
-    }
-    for pat, rep in reemplazos_negrita.items():
-        s = re.sub(pat, rep, s, flags=re.IGNORECASE)
+    s = _ANTES_DE_SALTO.sub("\n\n", s)
+    s = _NEGRITAS.sub(r"<b>\1</b>", s)
 
-    s = re.sub(r"\n{3,}", "\n\n", s)
+    s = _SALTOS_DE_MAS.sub("\n\n", s)
     return s.strip()
 
+# --- texto que se manda al LLM de extracción ---
+# "ventanas": solo los fragmentos alrededor de las anclas de cada campo; "completo": todo el texto relevante
+MODO_EXTRACCION = os.getenv("EIA_EXTRACCION_MODO", "ventanas")
+
+def _texto_para_llm(texto_relevante: str, campos: Optional[list]):
+    """(texto, informe de ventanas o None). Si no hay anclas se usa el texto relevante entero."""
+    if MODO_EXTRACCION == "ventanas":
+        from core.extraccion.ventanas import componer_ventanas
+        compacto, informe = componer_ventanas(texto_relevante, campos)
+        if compacto and informe["tokens_ventanas"] < informe["tokens_texto"]:
+            return compacto, informe
+    return texto_relevante, None
+
+# --- bloques literales en paralelo con el LLM ---
+# Dónde corren los bloques mientras se espera al LLM: "proceso" (regex pesadas sin competir por el
+# GIL con la preparación del prompt), "hilo" o "serie" (después del LLM, como antes)
+BLOQUES_WORKER = os.getenv("EIA_BLOQUES_WORKER", "proceso")
+# Por debajo de este tamaño de texto no compensa arrancar un proceso: se usa un hilo
+MIN_CHARS_PROCESO = int(os.getenv("EIA_BLOQUES_MIN_CHARS_PROCESO") or 200_000)
+
+def _bloques_cronometrados(texto_completo_pdf: str) -> Tuple[Dict[str, str], float]:
+    """(bloques, segundos) de un texto ya normalizado. A nivel de módulo para poder enviarse a otro proceso."""
+    from core.extraccion.bloques_textuales import extraer_bloques_literal
+    t0 = time.perf_counter()
+    bloques = extraer_bloques_literal(texto_completo_pdf, normalizado=True)
+    return bloques, time.perf_counter() - t0
+
+def _lanzar_bloques(texto_completo_pdf: str) -> Tuple[Optional[Future], str]:
+    """Arranca la extracción de bloques en segundo plano. (futuro o None si va en serie, worker)."""
+    worker = BLOQUES_WORKER
+    if worker == "proceso" and len(texto_completo_pdf or "") < MIN_CHARS_PROCESO:
+        worker = "hilo"
+    if worker == "serie":
+        return None, worker
+    ex = ProcessPoolExecutor(max_workers=1) if worker == "proceso" else ThreadPoolExecutor(max_workers=1)
+    try:
+        return ex.submit(_bloques_cronometrados, texto_completo_pdf), worker
+    finally:
+        ex.shutdown(wait=False)  # el worker termina solo al acabar su única tarea
+
+def _recoger_bloques(fut: Optional[Future], texto_completo_pdf: str) -> Tuple[Dict[str, str], float, float]:
+    """(bloques, segundos de extracción, segundos esperando tras el LLM)."""
+    t0 = time.perf_counter()
+    if fut is not None:
+        try:
+            bloques, segundos = fut.result()
+            return bloques, segundos, time.perf_counter() - t0
+        except (BrokenProcessPool, OSError) as e:
+            print(f"Bloques en segundo plano no disponibles ({e}); se extraen en serie")
+    bloques, segundos = _bloques_cronometrados(texto_completo_pdf)
+    return bloques, segundos, time.perf_counter() - t0
+
 # --- núcleo principal ---
 def build_global_placeholders(
     texto_relevante: str,
@@ -106,15 +178,61 @@ def build_global_placeholders(
     """
     Devuelve un dict {placeholder: valor} limpio y coherente con la plantilla.
     """
-    from core.extraccion.llm_utils import build_prompt, call_llm_extract_json, merge_min
-    from core.extraccion.bloques_textuales import extraer_bloques_literal
+    from core.extraccion.llm_utils import (
+        build_prompt, call_llm_extract_json, merge_min, esquema_extraccion, seccion_llm
+    )
+    from core.extraccion.registro_llm import informe_llm
+    from core.extraccion.confianza import (
+        CAMPOS_REQUERIDOS, evaluar_confianza, campos_dudosos, datos_desde_regex
+    )
+
+    # 0) Bloques literales en un worker: no dependen del LLM y así corren mientras se le espera
+    t_inicio = time.perf_counter()
+    texto_completo_pdf = normalizar_documento(texto_completo_pdf)  # ya normalizado si viene de pdf_reader
+    fut_bloques, worker_bloques = _lanzar_bloques(texto_completo_pdf)
 
-    # 1) LLM estructurado
-    prompt = build_prompt(texto_relevante)
-    datos_llm = call_llm_extract_json(prompt, model=model, texto_relevante=texto_relevante)
+    # 1) LLM estructurado, solo para lo que la regex no resuelve con confianza
+    confianza = evaluar_confianza(texto_relevante)
+    dudosos = campos_dudosos(confianza)
+    ventanas = None
+    t_llm = 0.0
+    if not dudosos:
+        modo = "omitido"
+        datos_llm = datos_desde_regex(confianza)
+    else:
+        modo = "reducido" if len(dudosos) < len(CAMPOS_REQUERIDOS) else "completo"
+        campos = dudosos if modo == "reducido" else None
+        texto_llm, ventanas = _texto_para_llm(texto_relevante, campos)
+        t_llm = time.perf_counter()
+        with informe_llm(save_to), seccion_llm("extraccion"):
+            datos_llm = call_llm_extract_json(build_prompt(texto_llm, campos=campos), model=model,
+                                              texto_relevante=texto_relevante,
+                                              esquema=esquema_extraccion(campos))
+        t_llm = time.perf_counter() - t_llm
+        if modo == "reducido":
+            for seccion, valores in datos_desde_regex(confianza).items():
+                for k, v in valores.items():
+                    if f"{seccion}.{k}" not in dudosos:
+                        datos_llm.setdefault(seccion, {})[k] = v
+    datos_llm["extraccion_llm"] = {
+        "modo": modo,
+        "campos_llm": dudosos,
+        "confianza_regex": {r: c["confianza"] for r, c in confianza.items()},
+    }
+    if ventanas:
+        datos_llm["extraccion_llm"]["ventanas"] = ventanas
+        print(f"Extracción por ventanas: {ventanas['tokens_ventanas']} de {ventanas['tokens_texto']} tokens "
+              f"(ahorro {ventanas['ahorro_pct']} %)")
 
-    # 2) Bloques literales
-    bloques = extraer_bloques_literal(texto_completo_pdf)
+    # 2) Bloques literales (normalmente ya terminados)
+    bloques, t_bloques, t_espera = _recoger_bloques(fut_bloques, texto_completo_pdf)
+    datos_llm["extraccion_llm"]["tiempos"] = {
+        "llm_s": round(t_llm, 3),
+        "bloques_s": round(t_bloques, 3),
+        "espera_bloques_s": round(t_espera, 3),
+        "total_s": round(time.perf_counter() - t_inicio, 3),
+        "worker_bloques": worker_bloques,
+    }
 
     # 3) Merge LLM + regex
     merged = merge_min(datos_llm, datos_regex_min)
@@ -176,15 +294,10 @@ def build_global_placeholders(
 
     }
 
-    # 7) Aplanado completo para depuración
-    flat_all = _flatten(merged)
-
-    # 8) Guardado limpio
+    # 7) Guardado compacto: placeholders + datos anidados (una sola vez) + origen de cada valor
     if save_to:
-        os.makedirs(os.path.dirname(save_to), exist_ok=True) if os.path.dirname(save_to) else None
-        clean_out = {**placeholders, **flat_all}
-        with open(save_to, "w", encoding="utf-8") as f:
-            json.dump(clean_out, f, ensure_ascii=False, indent=2)
+        guardar_json(save_to, {**placeholders, **merged,
+                               CLAVE_ORIGEN: _origenes(placeholders, merged, datos_regex_min, modo, dudosos)})
 
     return placeholders
 
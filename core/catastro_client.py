@@ -1,4 +1,4 @@
-import sys, time, json
+import sys, time
 from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -6,6 +6,12 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.modelo_placeholders import actualizar_json, cargar_json
+
 
 def step(msg): print(f"CATA_STEP: {msg}", flush=True)
 def warn(msg): print(f"CATA_WARN: {msg}", flush=True)
@@ -130,7 +136,7 @@ def main():
         print(f"❌ No existe JSON: {json_path}", flush=True)
         sys.exit(1)
 
-    data = json.loads(json_path.read_text(encoding="utf-8"))
+    data = cargar_json(json_path)
     utm_x = str(data.get("utm_x_principal", "")).replace(",", ".")
     utm_y = str(data.get("utm_y_principal", "")).replace(",", ".")
 
@@ -161,8 +167,7 @@ def main():
         info = extract_catastro_info(driver)
 
         if info:
-            data["catastro_info"] = info
-            json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            actualizar_json(json_path, {"catastro_info": info})
             done("Información catastral guardada correctamente.")
         else:
             warn("No se obtuvo información textual.")
@@ -6,11 +6,10 @@ from pathlib import Path
 import regex as re
 import subprocess
 from core.sintesis.alternativas_llm import generar_alternativas_llm
-import json
+from core.extraccion.registro_llm import informe_llm
+from core.extraccion.normalizacion import limpiar_caracteres
+from core.modelo_placeholders import actualizar_json, vista_plana
 
-NBSP = "\u00A0"
-ZWSP = "\u200B"
-SOFT = "\u00AD"
 
 # =====================
 # Utilidades básicas
@@ -18,7 +17,7 @@ SOFT = "\u00AD"
 
 def _clean(s: str) -> str:
     """Limpia caracteres invisibles y no imprimibles."""
-    return (s or "").replace(NBSP, " ").replace(ZWSP, "").replace(SOFT, "")
+    return limpiar_caracteres(s)
 
 def _chunks(s: str, n: int = 3000):
     """Divide un texto largo en fragmentos pequeños para evitar errores de Word."""
@@ -240,20 +239,18 @@ def export_docx_from_placeholder_map(
                    if not placeholder_map.get(k)]
         if missing:
             print(f"🤖 Generando automáticamente las secciones de alternativas: {', '.join(missing)}")
-            alt_dict = generar_alternativas_llm(placeholder_map)
-            placeholder_map.update(alt_dict)
-
-            # Guardar en el JSON más reciente para persistir los cambios
+            # Se guardan en el JSON más reciente para persistir los cambios
             output_dir = Path("outputs")
             json_files = sorted(output_dir.glob("*.json"), key=lambda f: f.stat().st_mtime, reverse=True)
+            with informe_llm(json_files[0] if json_files else None):
+                alt_dict = generar_alternativas_llm(placeholder_map)
+            if alt_dict.get("_error"):
+                print(f"⚠️ Alternativas incompletas: {alt_dict.pop('_error')}")
+            placeholder_map.update(alt_dict)
+
             if json_files:
                 latest_json = json_files[0]
-                with open(latest_json, "r+", encoding="utf-8") as f:
-                    data = json.load(f)
-                    data.update(alt_dict)
-                    f.seek(0)
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                    f.truncate()
+                actualizar_json(latest_json, alt_dict)
                 print(f"💾 Alternativas añadidas al JSON {latest_json.name}")
     except Exception as e:
         print(f"⚠️ Error generando alternativas automáticas: {e}")
@@ -261,10 +258,12 @@ def export_docx_from_placeholder_map(
 
     # 2️⃣ Procesar documento
     doc = Document(plantilla_path)
-    replacements = {str(k): str(v or "") for k, v in (placeholder_map or {}).items()}
+    # Los datos van anidados en el JSON; la plantilla los pide con punto ({{parametros.x}})
+    plano = vista_plana(placeholder_map or {})
+    replacements = {str(k): str(v or "") for k, v in plano.items()}
 
     _replace_placeholders(doc, replacements)
-    _fill_tables_by_labels(doc, label_values or placeholder_map)
+    _fill_tables_by_labels(doc, label_values or plano)
 
     doc.save(out_path)
     print(f"📄 Documento exportado correctamente: {out_path}")
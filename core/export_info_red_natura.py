@@ -1,4 +1,4 @@
-import json, time, re, sys
+import time, re, sys
 from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -7,6 +7,12 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver import ActionChains
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.modelo_placeholders import actualizar_json, cargar_json
+
 
 def step(msg): 
     print(f"RN_STEP: {msg}", flush=True)
@@ -41,7 +47,7 @@ def main():
     if not json_path.exists():
         raise FileNotFoundError(f"No existe: {json_path}")
 
-    data = json.loads(json_path.read_text(encoding="utf-8"))
+    data = cargar_json(json_path)
     utm_x = str(data["utm_x_principal"]).replace(".", ",")
     utm_y = str(data["utm_y_principal"]).replace(".", ",")
     step(f"Coordenadas UTM => X={utm_x}, Y={utm_y}")
@@ -223,7 +229,9 @@ def main():
         warn(f"Error inesperado: {e}")
 
     finally:
-        json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        # Solo lo de Red Natura: el resto del JSON puede haber cambiado durante la consulta
+        actualizar_json(json_path, {k: data[k] for k in ("codigos_red_natura", "estado_red_natura", "red_natura")
+                                    if k in data})
         step("JSON actualizado con información de Red Natura.")
         driver.quit()
 
@@ -1,7 +1,89 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import re
 
-def extraer_bloques_literal(texto_completo: str) -> Dict[str, str]:
+from core.extraccion.indice_titulos import IndiceTitulos, Titulo
+from core.extraccion.normalizacion import aplanar, normalizar_documento
+
+# Títulos con los que puede empezar cada bloque, en orden de preferencia:
+# (número del título o None = cualquier título que sea ese apartado, claves de indice_titulos)
+INICIOS_BLOQUE: Dict[str, List[Tuple[Optional[str], Tuple[str, ...]]]] = {
+    "PH_Antecedentes": [
+        ("1.1", ("antecedentes",)),
+        ("1", ("introduccion",)),
+        (None, ("antecedentes",)),
+    ],
+    "PH_Localizacion": [
+        ("1.3", ("situacion",)),
+        ("2.1", ("situacion",)),
+        (None, ("situacion",)),
+        (None, ("emplazamiento",)),
+        (None, ("ubicacion",)),
+    ],
+    "PH_Consumo": [
+        ("3.1", ("consumo", "caudal_necesario", "demanda")),
+        (None, ("consumo", "caudal_necesario", "demanda")),
+    ],
+    "geologia": [
+        (None, ("geologia", "hidrogeologia")),
+    ],
+}
+
+# Dónde acaba cada bloque: siguiente título de nivel <= n, siguiente apartado de esas claves
+# o, dentro de la sección, la primera frase de corte (las coordenadas van en otro placeholder)
+FINES_BLOQUE: Dict[str, Tuple[int, Tuple[str, ...], List[str]]] = {
+    "PH_Antecedentes": (2, ("objeto", "situacion", "emplazamiento"), [r"Se\s+justifica"]),
+    "PH_Localizacion": (2, ("geologia",), [
+        r"Las\s+coordenadas",
+        r"\bU\.?\s*T\.?\s*M\.?\b",
+        r"\bX\s*=\s*\d",
+        r"\bLatitud\s*=",
+        r"\bLongitud\s*=",
+        r"Coordenadas\s+ETRS",
+        r"El\s+sondeo\s+(existente|nuevo)",
+    ]),
+    "PH_Consumo": (2, ("realizacion", "instalacion"), []),
+    "geologia": (1, ("caracteristicas", "realizacion", "valores_ambientales"), []),
+}
+_CORTES_RX = {b: re.compile("|".join(f"(?:{p})" for p in cortes), re.IGNORECASE) if cortes else None
+              for b, (_, _, cortes) in FINES_BLOQUE.items()}
+
+
+def titulo_inicio(indice: IndiceTitulos, bloque: str) -> Optional[Titulo]:
+    """Título con el que empieza `bloque` en el esquema (o None)."""
+    for numero, claves in INICIOS_BLOQUE[bloque]:
+        encontrados = [t for t in (indice.buscar(c, numero) for c in claves) if t is not None]
+        if encontrados:
+            return min(encontrados, key=lambda t: t.inicio)
+    return None
+
+
+def tramo_bloque(indice: IndiceTitulos, bloque: str) -> Optional[Tuple[int, int]]:
+    """(inicio, fin) de `bloque` en el texto del índice, o None si no aparece."""
+    titulo = titulo_inicio(indice, bloque)
+    if titulo is None:
+        return None
+    nivel, claves, _ = FINES_BLOQUE[bloque]
+    fin = indice.fin_hasta(titulo, nivel, claves)
+    cortes = _CORTES_RX[bloque]
+    m = cortes.search(indice.texto, titulo.inicio, fin) if cortes else None
+    return titulo.inicio, (m.start() if m else fin)
+
+# Líneas del índice del documento ("1.1 Antecedentes ....... 12", "Índice:"), en una sola regex
+_LINEAS_INDICE = re.compile(
+    r"^[^\n]*\.{3,}[ \t]*\d{1,4}[ \t]*(?:\n|$)|^[ \t]*(?:Contenido|Índice)[ \t]*:?[ \t]*(?:\n|$)",
+    re.MULTILINE | re.IGNORECASE,
+)
+# Pies de la ingeniería y marcadores de página que pueda traer el texto
+_RUIDO_PDF = re.compile(r"Pl\.\s*San\s*Crist[oó]bal[^\n]+ipsaingenieros\.com|---\s*P[aá]gina\s*\d+\s*---",
+                        re.IGNORECASE)
+_SALTO_SIMPLE = re.compile(r"(?<!\n)\n(?!\n)")
+_ESPACIOS = re.compile(r"[ \t]+")
+_SALTOS_DE_MAS = re.compile(r"\n\n\n+")
+
+def _quitar_lineas_indice(t: str) -> str:
+    return _LINEAS_INDICE.sub("", t)
+
+def extraer_bloques_literal(texto_completo: str, normalizado: bool = False) -> Dict[str, str]:
     """
     Devuelve SOLO bloques textuales largos:
     - PH_Antecedentes
@@ -10,39 +92,22 @@ def extraer_bloques_literal(texto_completo: str) -> Dict[str, str]:
     - geologia
 
     Conserva párrafos reales (doble salto), aplana saltos simples.
+    Con `normalizado=True` el texto ya viene de normalizacion.normalizar_documento.
     """
-    NBSP = "\u00A0"
-    SOFT_HYPHEN = "\u00AD"
-
     def _sanitize_pdf_text(s: str) -> str:
         if not s:
             return ""
-        s = s.replace("\r", "\n").replace(NBSP, " ").replace(SOFT_HYPHEN, "")
-        s = re.sub(r"(?<=\w)-\n(?=\w)", "", s)
-        s = re.sub(r"Pl\.\s*San\s*Crist[oó]bal[^\n]+ipsaingenieros\.com", "", s, flags=re.I)
-        s = re.sub(r"---\s*P[aá]gina\s*\d+\s*---", "", s, flags=re.I)
-        s = re.sub(r"[ \t]+", " ", s)
-        s = re.sub(r"\n{3,}", "\n\n", s)
-        return s.strip()
-
-    def _quitar_lineas_indice(t: str) -> str:
-        out = []
-        for line in t.splitlines():
-            L = line.strip()
-            if re.search(r"\.{3,}\s*\d{1,4}\s*$", L):  # “..... 12”
-                continue
-            if re.search(r"^\s*(Contenido|Índice)\s*:?\s*$", L, re.IGNORECASE):
-                continue
-            out.append(line)
-        return "\n".join(out)
+        if not normalizado:
+            s = normalizar_documento(s)
+        # Los huecos que deje se colapsan al recortar cada bloque
+        return _RUIDO_PDF.sub("", s)
 
     def _keep_paragraphs_drop_linebreaks(s: str) -> str:
         s = (s or "").replace("<br />", "\n").replace("<br/>", "\n").replace("<br>", "\n")
-        s = s.replace("\r", "\n")
-        s = re.sub(r"\n{3,}", "\n\n", s)
-        s = re.sub(r'(?<!\n)\n(?!\n)', ' ', s)   # salto simple -> espacio
-        s = re.sub(r"[ \t]+", " ", s)
-        s = re.sub(r"\n{3,}", "\n\n", s)
+        s = _SALTOS_DE_MAS.sub("\n\n", s)
+        s = _SALTO_SIMPLE.sub(" ", s)   # salto simple -> espacio
+        s = _ESPACIOS.sub(" ", s)
+        s = _SALTOS_DE_MAS.sub("\n\n", s)
         return s.strip()
 
     def _strip_heading(s: str, palabras: List[str]) -> str:
@@ -51,95 +116,29 @@ def extraer_bloques_literal(texto_completo: str) -> Dict[str, str]:
         pat = rf"^\s*(?:\d+\s*[.,)]?\s*\d*\s*[.)]?\s*)?(?:{'|'.join(map(re.escape, palabras))})\s*[:.\-–—]?\s*"
         return re.sub(pat, "", s, count=1, flags=re.IGNORECASE).strip()
 
-    def _find_first(text: str, patterns: List[str], start: int) -> int:
-        end = len(text)
-        for p in patterns:
-            m = re.search(p, text[start:], flags=re.IGNORECASE)
-            if m:
-                end = min(end, start + m.start())
-        return end
-
-    # ---- Limpieza base
+    # ---- Limpieza base y esquema de títulos (una pasada; cada bloque es una consulta)
     t = _sanitize_pdf_text(texto_completo or "")
     t = _quitar_lineas_indice(t)
+    indice = IndiceTitulos(t)
+
+    def _tramo(bloque: str) -> str:
+        tramo = tramo_bloque(indice, bloque)
+        return t[tramo[0]:tramo[1]] if tramo else ""
 
     # ---- ANTECEDENTES
-    antecedentes = ""
-    for p in [
-        r"(?m)^\s*1[.,]?\s*1\b.*Antecedentes",
-        r"(?m)^\s*1[.,]?\s*Introducci[oó]n\b",
-        r"(?m)^\s*Cap[ií]tulo\s*1\b.*Introducci[oó]n",
-        r"(?m)^\s*Antecedentes\b",
-    ]:
-        m = re.search(p, t, flags=re.IGNORECASE | re.MULTILINE)
-        if m:
-            start = m.start()
-            end = _find_first(t, [
-                r"Se\s+justifica",
-                r"(?m)^\s*1[.,]?\s*2\b", r"(?m)^\s*Objeto\b",
-                r"(?m)^\s*2[.,]?\s*0?\b", r"(?m)^\s*Situaci[oó]n\b",
-                r"(?m)^\s*Emplazamiento\b",
-            ], start)
-            antecedentes = _keep_paragraphs_drop_linebreaks(
-                _strip_heading(t[start:end].strip(), ["Antecedentes", "Introducción"])
-            )
-            break
+    antecedentes = _keep_paragraphs_drop_linebreaks(
+        _strip_heading(_tramo("PH_Antecedentes").strip(), ["Antecedentes", "Introducción"])
+    )
 
     # ---- SITUACIÓN  (PH_Situacion con S mayúscula, sin duplicados)
-    situacion = ""
-    for p in [
-        r"(?m)^\s*1[.,]?\s*3\b.*Situaci[oó]n",
-        r"(?m)^\s*2[.,]?\s*1\b.*Situaci[oó]n",
-        r"(?m)^\s*Situaci[oó]n\b",
-        r"(?m)^\s*Emplazamiento\b",
-        r"(?m)^\s*Ubicaci[oó]n\b",
-    ]:
-        m = re.search(p, t, flags=re.IGNORECASE | re.MULTILINE)
-        if m:
-            start = m.start()
-            end = _find_first(t, [
-                r"Las\s+coordenadas",
-                r"\bU\.?\s*T\.?\s*M\.?\b",
-                r"\bX\s*=\s*\d",
-                r"\bLatitud\s*=",
-                r"\bLongitud\s*=",
-                r"Coordenadas\s+ETRS",
-                r"El\s+sondeo\s+(existente|nuevo)",
-                r"(?m)^\s*1[.,]?\s*4\b",
-                r"(?m)^\s*GEOLOG",
-            ], start)
-            situacion = _keep_paragraphs_drop_linebreaks(
-                _strip_heading(t[start:end].strip(), ["Situación del sondeo", "Situación", "Ubicación", "Emplazamiento"])
-            )
-            break
-
-    # ---- CONSUMO
-    def _planito(s: str) -> str:
-        return re.sub(r"\s+", " ", (s or "")).strip()
-
-    consumo = ""
-    m = re.search(r"(?m)^\s*3[.,]?\s*1\b.*(Consumo|Caudal\s+necesario|Demanda)\b", t, re.I)
-    if not m:
-        m = re.search(r"(?m)^\s*(Consumo|Caudal\s+necesario|Demanda)\b", t, re.I)
-    if m:
-        start = m.start()
-        end = _find_first(t, [
-            r"(?m)^\s*3[.,]?\s*2\b", r"(?m)^\s*4[.,]?\s*\b",
-            r"(?m)^\s*REALIZACI[ÓO]N\b", r"(?m)^\s*Instalaci[oó]n"
-        ], start)
-        consumo = _planito(t[start:end])
-
-    # ---- GEOLOGÍA
-    geologia = ""
-    m = re.search(r"(?m)^\s*(GEOLOG[ÍI]A\s*E?\s*HIDROGEOLOG[ÍI]A|Geolog[ií]a|Hidrogeolog[ií]a)\b", t, re.I)
-    if m:
-        start = m.start()
-        end = _find_first(t, [
-            r"(?m)^\s*3[.,]?\s*\b", r"(?m)^\s*CARACTER[ÍI]STICAS\b",
-            r"(?m)^\s*REALIZACI[ÓO]N\b", r"(?m)^\s*4[.,]?\s*\b",
-            r"(?m)^\s*Valores\s+ambientales\b"
-        ], start)
-        geologia = _planito(t[start:end])
+    situacion = _keep_paragraphs_drop_linebreaks(
+        _strip_heading(_tramo("PH_Localizacion").strip(),
+                       ["Situación del sondeo", "Situación", "Ubicación", "Emplazamiento"])
+    )
+
+    # ---- CONSUMO y GEOLOGÍA
+    consumo = aplanar(_tramo("PH_Consumo"))
+    geologia = aplanar(_tramo("geologia"))
 
     # ---- SALIDA (sin alternativas, sin municipio/provincia aquí)
     return {
@@ -0,0 +1,152 @@
+# core/extraccion/confianza.py
+"""
+Confianza de la extracción regex para decidir si hace falta llamar al LLM.
+
+Para cada campo que pide el prompt de extracción se puntúa el valor regex con:
+- fuerza del patrón: lo específico que es el contexto que lo ha capturado;
+- consistencia: fracción de candidatos del texto que coinciden con el valor elegido
+  (dos parcelas distintas en el mismo texto = dudoso);
+- respaldo: un valor que aparece una sola vez, sin otro candidato que lo confirme, no
+  llega al umbral por sí solo.
+
+Si todos los campos requeridos superan el umbral no se llama al LLM; si solo fallan
+algunos, se le piden únicamente esos (prompt reducido). El uso previsto se puntúa igual a
+partir de reglas de palabras clave (USOS): "abastecimiento de la población" -> "abastecimiento
+municipal"; detalles_de_uso es la frase del texto que lo dice. Si el documento nombra usos
+distintos, el uso queda dudoso y va al LLM.
+"""
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from core.extraccion.regex_extract import regex_extract_candidates
+
+# Por debajo de este valor el campo se pide al LLM (>1 desactiva el atajo)
+UMBRAL_CONFIANZA = float(os.getenv("EIA_REGEX_CONFIANZA", "0.75"))
+
+# Ruta en el JSON del LLM -> (campo del motor regex, fuerza del patrón)
+CAMPOS_LLM: Dict[str, tuple] = {
+    "localizacion.municipio": ("municipio", 0.9),
+    "localizacion.provincia": ("provincia", 0.95),
+    "localizacion.poligono": ("poligono", 0.95),
+    "localizacion.parcela": ("parcela", 0.95),
+    "localizacion.referencia_catastral": ("referencia_catastral", 0.95),
+    "parametros.caudal_max_instantaneo_l_s": ("caudal_max_instantaneo_l_s", 0.9),
+    "parametros.caudal_minimo_l_s": ("caudal_minimo_l_s", 0.9),
+}
+
+# Campos que se usan en los placeholders: solo si TODOS pasan se omite el LLM
+CAMPOS_REQUERIDOS: List[str] = [
+    "localizacion.municipio",
+    "localizacion.provincia",
+    "localizacion.poligono",
+    "localizacion.parcela",
+    "localizacion.referencia_catastral",
+    "parametros.caudal_max_instantaneo_l_s",
+    "parametros.uso_previsto",
+    "parametros.detalles_de_uso",
+]
+# Uso previsto (del que parten alternativas e instalación eléctrica): valor -> regla del texto
+USOS: Dict[str, str] = {
+    "abastecimiento municipal": r"abastecimiento\s+(?:de\s+agua\s+)?(?:(?:a|de)\s+(?:la\s+)?(?:poblaci[oó]n|localidad|"
+                                r"municipio|n[uú]cleo)|municipal|urbano|p[uú]blico)",
+    "uso ganadero": r"uso\s+ganadero|explotaci[oó]n\s+ganadera|abrevadero|abastecimiento\s+(?:de|al|del)\s+ganado",
+    "riego agrícola": r"riego\s+(?:agr[ií]cola|de\s+(?:cultivos?|parcelas?|fincas?|la\s+finca)|por\s+(?:goteo|"
+                      r"aspersi[oó]n|inundaci[oó]n))|regad[ií]o",
+    "uso industrial": r"uso\s+industrial|procesos?\s+industrial(?:es)?",
+}
+_USOS_RX = re.compile("|".join(f"(?P<u{i}>{rx})" for i, rx in enumerate(USOS.values())), re.IGNORECASE)
+# Contexto que indica que la frase habla del destino del agua (pesa más)
+_USO_CONTEXTO = re.compile(r"(?:fin|uso|destin\w*|finalidad|objeto|para)\W+(?:\w+\W+){0,6}$", re.IGNORECASE)
+_FUERZA_USO, _FUERZA_USO_CONTEXTO = 0.8, 0.9
+
+# "Vega de Tera (Zamora)": confirma la provincia una vez conocido el municipio
+_FUERZA_MUNICIPIO_PROVINCIA = 0.85
+# Con la fuerza máxima (0.95) un valor sin confirmar queda en 0.71, por debajo del umbral
+_RESPALDO_UNICO = 0.75
+# Referencia catastral con la longitud canónica (20 caracteres)
+_RC_CANONICA = re.compile(r"^\d{5}[A-Z]\d{8}[0-9A-Z]{4}[A-Z]{2}$|^\d{7}[A-Z]{2}\d{4}[A-Z]\d{4}[A-Z]{2}$")
+
+
+def _puntuar(valores: List[tuple]) -> Dict[str, Any]:
+    """valores: [(valor, fuerza)] en orden de aparición -> valor elegido y su confianza."""
+    if not valores:
+        return {"valor": None, "confianza": 0.0, "apariciones": 0, "alternativas": []}
+    cuenta = Counter(v for v, _ in valores)
+    # El más repetido; a igualdad, el primero que aparece
+    elegido = max(cuenta, key=lambda v: (cuenta[v], -[x for x, _ in valores].index(v)))
+    fuerza = max(f for v, f in valores if v == elegido)
+    consistencia = cuenta[elegido] / len(valores)
+    respaldo = 1.0 if cuenta[elegido] >= 2 else _RESPALDO_UNICO
+    return {
+        "valor": elegido,
+        "confianza": round(fuerza * consistencia * respaldo, 3),
+        "apariciones": cuenta[elegido],
+        "alternativas": [v for v in cuenta if v != elegido],
+    }
+
+
+def _candidatos_uso(texto: str) -> List[tuple]:
+    """[(uso, fuerza, frase)] en orden de aparición; frase: desde la mención hasta el fin de la oración."""
+    out = []
+    for m in _USOS_RX.finditer(texto):
+        uso = list(USOS)[int(m.lastgroup[1:])]
+        fuerza = _FUERZA_USO_CONTEXTO if _USO_CONTEXTO.search(texto, max(0, m.start() - 60), m.start()) \
+            else _FUERZA_USO
+        frase = re.split(r"[.;,\n]", texto[m.start():m.start() + 200], maxsplit=1)[0].strip()
+        out.append((uso, fuerza, frase[:1].upper() + frase[1:]))
+    return out
+
+
+def evaluar_confianza(texto: str, candidatos: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Ruta LLM -> {"valor", "confianza", "apariciones", "alternativas"} a partir de los
+    candidatos del motor regex (se calculan si no se pasan).
+    """
+    if candidatos is None:
+        candidatos = regex_extract_candidates(texto)
+    por_campo: Dict[str, List[tuple]] = {}
+    for ruta, (campo, fuerza) in CAMPOS_LLM.items():
+        valores = []
+        for c in candidatos:
+            if c["campo"] != campo or c["valor"] is None:
+                continue
+            f = fuerza
+            if campo == "referencia_catastral" and not _RC_CANONICA.match(c["valor"]):
+                f *= 0.8
+            valores.append((c["valor"], f))
+        por_campo[ruta] = valores
+
+    out = {ruta: _puntuar(v) for ruta, v in por_campo.items()}
+
+    # Uso previsto y su frase (la primera que respalda el uso elegido)
+    usos = _candidatos_uso(texto or "")
+    uso = out["parametros.uso_previsto"] = _puntuar([(u, f) for u, f, _ in usos])
+    frase = next((d for u, _, d in usos if u == uso["valor"]), None)
+    out["parametros.detalles_de_uso"] = {**uso, "valor": frase, "alternativas": []}
+
+    # Consistencia cruzada: "Municipio (Provincia)" aporta candidatos de provincia
+    muni = out["localizacion.municipio"]["valor"]
+    if muni:
+        extra = [(m.group(1), _FUERZA_MUNICIPIO_PROVINCIA) for m in
+                 re.finditer(rf"{re.escape(muni)}\s*\(\s*([A-ZÁÉÍÓÚÑ][a-záéíóúñ]+)\s*\)", texto or "")]
+        if extra:
+            out["localizacion.provincia"] = _puntuar(por_campo["localizacion.provincia"] + extra)
+    return out
+
+
+def campos_dudosos(confianza: Dict[str, Dict[str, Any]], umbral: float = UMBRAL_CONFIANZA,
+                   requeridos: Optional[List[str]] = None) -> List[str]:
+    """Campos requeridos cuya confianza no llega al umbral (los que hay que pedir al LLM)."""
+    return [r for r in (requeridos or CAMPOS_REQUERIDOS) if confianza[r]["confianza"] < umbral]
+
+
+def datos_desde_regex(confianza: Dict[str, Dict[str, Any]], umbral: float = UMBRAL_CONFIANZA) -> Dict[str, Any]:
+    """JSON con la forma de la salida del LLM, relleno solo con los valores que superan el umbral."""
+    out: Dict[str, Any] = {"localizacion": {}, "parametros": {}}
+    for ruta, info in confianza.items():
+        if info["valor"] is not None and info["confianza"] >= umbral:
+            seccion, campo = ruta.split(".", 1)
+            out.setdefault(seccion, {})[campo] = info["valor"]
+    return out
@@ -0,0 +1,169 @@
+# core/extraccion/indice_titulos.py
+"""
+Índice de títulos de un texto de proyecto (esquema numerado con offsets de carácter).
+
+El texto se recorre una sola vez con una regex de títulos: líneas numeradas ("3.1 Consumo",
+"2. SITUACIÓN", "Capítulo 1 Introducción") y líneas que empiezan por una palabra clave de
+título ("GEOLOGÍA", "Antecedentes"). Con una pila se arma el árbol: cada título sabe su
+padre, sus hijos y dónde acaba su sección (el siguiente título de nivel igual o superior).
+Localizar un apartado es una consulta a un dict (por clave o por número), no una búsqueda
+sobre todo el texto; lo usan bloques_textuales y rastreo_campos.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Palabras clave de título -> regex (sin distinguir mayúsculas)
+TITULOS: Dict[str, str] = {
+    "antecedentes": r"Antecedentes\b",
+    "introduccion": r"Introducci[oó]n\b",
+    "objeto": r"Objeto\b",
+    "situacion": r"Situaci[oó]n\b",
+    "emplazamiento": r"Emplazamiento\b",
+    "ubicacion": r"Ubicaci[oó]n\b",
+    "consumo": r"Consumo\b",
+    "caudal_necesario": r"Caudal\s+necesario\b",
+    "demanda": r"Demanda\b",
+    "geologia": r"\bGeolog[ií]a\b",
+    "hidrogeologia": r"Hidrogeolog[ií]a\b",
+    "caracteristicas": r"Caracter[ií]sticas\b",
+    "realizacion": r"Realizaci[oó]n\b",
+    "instalacion": r"Instalaci[oó]n",
+    "valores_ambientales": r"Valores\s+ambientales\b",
+}
+# Títulos sin número que abren capítulo (nivel 1); el resto de títulos sin número no tienen nivel
+NIVEL_CLAVE: Dict[str, int] = {"geologia": 1, "caracteristicas": 1, "realizacion": 1, "valores_ambientales": 1}
+# Un título sin número más largo que esto es en realidad un párrafo que empieza por la palabra clave
+MAX_CHARS_TITULO = 80
+
+_CLAVES_RX = re.compile("|".join(f"(?P<{c}>{p})" for c, p in TITULOS.items()), re.IGNORECASE)
+_CLAVE_RX = {c: re.compile(p, re.IGNORECASE) for c, p in TITULOS.items()}
+_ALT_CLAVES = "|".join(f"(?:{p})" for p in TITULOS.values())
+_TITULO_RX = re.compile(
+    r"^[ \t]*(?:"
+    # "3.1 Consumo", "1,1. ANTECEDENTES", "Capítulo 1 Introducción": número corto y texto que
+    # empieza en mayúscula o por palabra clave ("2.500 m3" o "4.512.345" no son títulos)
+    r"(?:Cap[ií]tulo[ \t]*)?(?P<num>\d{1,2}(?:[.,] ?\d{1,2}){0,3})[.,)\-–]?[ \t]*"
+    rf"(?=(?-i:[A-ZÁÉÍÓÚÑ])|{_ALT_CLAVES})(?P<texto_num>[^\n]{{1,150}})"
+    rf"|(?P<texto>(?:{_ALT_CLAVES})[^\n]*)"
+    r")$",
+    re.MULTILINE | re.IGNORECASE,
+)
+
+
+def _numero(crudo: str) -> str:
+    """"1,1" -> "1.1"; "2.0" -> "2" (mismo capítulo)."""
+    partes = re.split(r"[.,] ?", crudo)
+    while len(partes) > 1 and partes[-1] == "0":
+        partes.pop()
+    return ".".join(str(int(p)) for p in partes)
+
+
+class Titulo:
+    """Un título del esquema: número y nivel (si los tiene), clave, offsets y árbol."""
+
+    __slots__ = ("posicion", "numero", "nivel", "texto", "clave", "inicio", "fin_linea", "fin", "padre", "hijos")
+
+    def __init__(self, posicion: int, numero: Optional[str], nivel: Optional[int], texto: str,
+                 inicio: int, fin_linea: int):
+        self.posicion = posicion
+        self.numero = numero
+        self.nivel = nivel
+        self.texto = texto
+        m = _CLAVES_RX.match(texto)
+        # El título ES ese apartado (la palabra clave va al principio)
+        self.clave = m.lastgroup if m else None
+        self.inicio = inicio
+        self.fin_linea = fin_linea
+        self.fin = fin_linea
+        self.padre: Optional["Titulo"] = None
+        self.hijos: List["Titulo"] = []
+
+    def menciona(self, clave: str) -> bool:
+        """La clave aparece en cualquier parte del título ("Introducción y antecedentes")."""
+        return clave == self.clave or _CLAVE_RX[clave].search(self.texto) is not None
+
+    def __repr__(self) -> str:
+        return f"Titulo({self.numero or '-'} {self.texto[:40]!r} @{self.inicio}-{self.fin})"
+
+
+class IndiceTitulos:
+    """Esquema de títulos de `texto`, construido en una pasada."""
+
+    __slots__ = ("texto", "titulos", "raiz", "_por_clave", "_por_numero")
+
+    def __init__(self, texto: str):
+        self.texto = texto
+        self.titulos: List[Titulo] = []
+        self.raiz: List[Titulo] = []
+        self._por_clave: Dict[str, List[Titulo]] = {}
+        self._por_numero: Dict[str, List[Titulo]] = {}
+
+        pila: List[Titulo] = []
+        for m in _TITULO_RX.finditer(texto):
+            if m.group("num") is not None:
+                numero = _numero(m.group("num"))
+                t = Titulo(len(self.titulos), numero, numero.count(".") + 1,
+                           m.group("texto_num").strip(), m.start(), m.end())
+                self._por_numero.setdefault(numero, []).append(t)
+            else:
+                linea = m.group("texto").strip()
+                t = Titulo(len(self.titulos), None, None, linea, m.start(), m.end())
+                if len(linea) <= MAX_CHARS_TITULO:
+                    t.nivel = NIVEL_CLAVE.get(t.clave)
+            if t.clave:
+                self._por_clave.setdefault(t.clave, []).append(t)
+
+            # El anterior sin nivel (subtítulo) acaba donde empieza cualquier título
+            if self.titulos and self.titulos[-1].nivel is None:
+                self.titulos[-1].fin = t.inicio
+            if t.nivel is not None:
+                while pila and pila[-1].nivel >= t.nivel:
+                    pila.pop().fin = t.inicio
+            t.padre = pila[-1] if pila else None
+            (t.padre.hijos if t.padre else self.raiz).append(t)
+            if t.nivel is not None:
+                pila.append(t)
+            self.titulos.append(t)
+
+        for t in pila:
+            t.fin = len(texto)
+        if self.titulos and self.titulos[-1].nivel is None:
+            self.titulos[-1].fin = len(texto)
+
+    def buscar(self, clave: str, numero: Optional[str] = None) -> Optional[Titulo]:
+        """
+        Primer título que es el apartado `clave` o, con `numero`, primer título con ese número
+        que menciona `clave` ("1.1 Introducción y antecedentes" vale para ("antecedentes", "1.1")).
+        """
+        if numero is not None:
+            return next((t for t in self._por_numero.get(numero, ()) if t.menciona(clave)), None)
+        candidatos = self._por_clave.get(clave)
+        return candidatos[0] if candidatos else None
+
+    def fin_hasta(self, titulo: Titulo, nivel: Optional[int] = None, claves: Iterable[str] = ()) -> int:
+        """
+        Offset donde acaba la sección de `titulo` cortando en el siguiente título de nivel <= `nivel`
+        (por defecto el del propio título) o en el siguiente apartado de `claves`.
+        """
+        umbral = max(titulo.nivel or 0, nivel or 0)
+        claves = set(claves)
+        for t in self.titulos[titulo.posicion + 1:]:
+            if (t.nivel is not None and t.nivel <= umbral) or t.clave in claves:
+                return t.inicio
+        return len(self.texto)
+
+    def seccion(self, titulo: Titulo) -> str:
+        """Texto de la sección completa (título incluido)."""
+        return self.texto[titulo.inicio:titulo.fin]
+
+    def esquema(self) -> str:
+        """Esquema indentado, para depuración."""
+        lineas = []
+
+        def _pintar(nodos: List[Titulo], sangria: int):
+            for t in nodos:
+                lineas.append(f"{'  ' * sangria}{t.numero or '·'} {t.texto[:60]}  [{t.inicio}:{t.fin}]")
+                _pintar(t.hijos, sangria + 1)
+
+        _pintar(self.raiz, 0)
+        return "\n".join(lineas)
@@ -0,0 +1,263 @@
+# core/extraccion/limite_llm.py
+"""
+Límite de ritmo de llamadas al LLM compartido por todos los procesos (app y subprocesos).
+
+Cada modelo tiene dos cubos de fichas (token bucket) en SQLite: peticiones por minuto y
+tokens por minuto. Antes de cada llamada se reservan 1 petición y los tokens estimados; la
+reserva se hace dentro de una transacción BEGIN IMMEDIATE, que es el cerrojo entre procesos.
+Si no hay fichas, se espera lo justo para que se rellenen (más un poco de jitter para que los
+procesos no despierten a la vez). Ante un 429, el modelo vacía sus cubos para todos y quien
+lo recibió reintenta con backoff exponencial con jitter (igual que ante timeouts y 5xx).
+
+Límites: EIA_LLM_RPM / EIA_LLM_TPM (todos los modelos) y, por modelo,
+EIA_LLM_LIMITES='{"gpt-4.1-mini": [500, 200000]}'.
+
+Métricas de espera en cola: estadisticas() (este proceso) y metricas() (todos, última hora):
+    python core/extraccion/limite_llm.py
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.extraccion.relevancia import estimar_tokens
+
+DB_PATH = Path(os.getenv("EIA_CACHE_DIR") or PROJECT_ROOT / ".cache") / "limites.sqlite"
+ACTIVO = os.getenv("EIA_LLM_LIMITE", "1") != "0"
+RPM = float(os.getenv("EIA_LLM_RPM") or 500)
+TPM = float(os.getenv("EIA_LLM_TPM") or 200_000)
+LIMITES_MODELO: Dict[str, Tuple[float, float]] = {
+    m: (float(rpm), float(tpm)) for m, (rpm, tpm) in json.loads(os.getenv("EIA_LLM_LIMITES") or "{}").items()
+}
+# Tokens de salida que se reservan por llamada (la respuesta aún no se conoce)
+TOKENS_SALIDA = int(os.getenv("EIA_LLM_TOKENS_SALIDA") or 1000)
+# Backoff ante 429: espera aleatoria en [0, min(MAX, BASE·2^n)] ("full jitter")
+BACKOFF_BASE_S = float(os.getenv("EIA_LLM_BACKOFF_S") or 1)
+BACKOFF_MAX_S = float(os.getenv("EIA_LLM_BACKOFF_MAX_S") or 30)
+REINTENTOS_429 = int(os.getenv("EIA_LLM_REINTENTOS_429") or 5)
+# Las esperas registradas se conservan este tiempo
+HISTORIAL_S = 24 * 3600
+
+_ESTADISTICAS = {"llamadas": 0, "esperas": 0, "espera_total_s": 0.0, "espera_max_s": 0.0, "rechazos_429": 0,
+                "reintentos": 0}
+_ESTADISTICAS_LOCK = threading.Lock()
+
+T = TypeVar("T")
+
+
+def limites(model: str) -> Tuple[float, float]:
+    """(peticiones/min, tokens/min) del modelo."""
+    return LIMITES_MODELO.get(model, (RPM, TPM))
+
+
+@contextmanager
+def _conectar():
+    """Conexión con la transacción ya abierta en exclusiva de escritura (cerrojo entre procesos)."""
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS cubos ("
+            " modelo TEXT, tipo TEXT, fichas REAL, actualizado REAL, PRIMARY KEY (modelo, tipo))"
+        )
+        con.execute("CREATE TABLE IF NOT EXISTS esperas (ts REAL, modelo TEXT, espera_s REAL, pid INTEGER)")
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            yield con
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.close()
+
+
+def _rellenar(con: sqlite3.Connection, model: str, tipo: str, capacidad: float, ahora: float) -> float:
+    fila = con.execute("SELECT fichas, actualizado FROM cubos WHERE modelo = ? AND tipo = ?",
+                       (model, tipo)).fetchone()
+    if fila is None:
+        return capacidad
+    return min(capacidad, fila[0] + (ahora - fila[1]) * capacidad / 60)
+
+
+def _guardar(con: sqlite3.Connection, model: str, tipo: str, fichas: float, ahora: float):
+    con.execute("INSERT OR REPLACE INTO cubos VALUES (?, ?, ?, ?)", (model, tipo, fichas, ahora))
+
+
+def _intentar(model: str, tokens: int) -> float:
+    """Reserva si hay fichas (devuelve 0) o devuelve los segundos que faltan para que las haya."""
+    rpm, tpm = limites(model)
+    tokens = min(tokens, tpm)  # una petición mayor que el cubo entero esperaría para siempre
+    ahora = time.time()
+    with _conectar() as con:
+        peticiones = _rellenar(con, model, "rpm", rpm, ahora)
+        fichas = _rellenar(con, model, "tpm", tpm, ahora)
+        if peticiones >= 1 and fichas >= tokens:
+            _guardar(con, model, "rpm", peticiones - 1, ahora)
+            _guardar(con, model, "tpm", fichas - tokens, ahora)
+            return 0.0
+        _guardar(con, model, "rpm", peticiones, ahora)
+        _guardar(con, model, "tpm", fichas, ahora)
+    return max((1 - peticiones) * 60 / rpm, (tokens - fichas) * 60 / tpm, 0.01)
+
+
+def _registrar_espera(model: str, espera: float):
+    with _ESTADISTICAS_LOCK:
+        _ESTADISTICAS["llamadas"] += 1
+        if espera > 0:
+            _ESTADISTICAS["esperas"] += 1
+            _ESTADISTICAS["espera_total_s"] += espera
+            _ESTADISTICAS["espera_max_s"] = max(_ESTADISTICAS["espera_max_s"], espera)
+    try:
+        with _conectar() as con:
+            con.execute("INSERT INTO esperas VALUES (?, ?, ?, ?)", (time.time(), model, espera, os.getpid()))
+            con.execute("DELETE FROM esperas WHERE ts < ?", (time.time() - HISTORIAL_S,))
+    except sqlite3.Error:
+        pass
+
+
+def reservar(model: str, prompt: str = "", tokens: Optional[int] = None) -> float:
+    """
+    Bloquea hasta que el modelo tenga cupo para una petición de `tokens` (por defecto, los del
+    prompt más TOKENS_SALIDA) y lo consume. Devuelve los segundos esperados en cola.
+    """
+    if not ACTIVO:
+        return 0.0
+    if tokens is None:
+        tokens = estimar_tokens(prompt) + TOKENS_SALIDA
+    t0, espera = time.perf_counter(), 0.0
+    while True:
+        try:
+            falta = _intentar(model, tokens)
+        except sqlite3.Error as e:
+            print(f"Límite LLM no disponible: {e}")
+            return 0.0
+        if not falta:
+            break
+        time.sleep(falta * random.uniform(1.0, 1.25))
+        espera = time.perf_counter() - t0
+    _registrar_espera(model, espera)
+    return espera
+
+
+def penalizar(model: str):
+    """Tras un 429: vacía los cubos del modelo para que todos los procesos frenen a la vez."""
+    with _ESTADISTICAS_LOCK:
+        _ESTADISTICAS["rechazos_429"] += 1
+    if not ACTIVO:
+        return
+    try:
+        with _conectar() as con:
+            ahora = time.time()
+            _guardar(con, model, "rpm", 0.0, ahora)
+            _guardar(con, model, "tpm", 0.0, ahora)
+    except sqlite3.Error:
+        pass
+
+
+def _codigo(e: Exception) -> Optional[int]:
+    return getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+
+
+def es_429(e: Exception) -> bool:
+    return _codigo(e) == 429
+
+
+def es_transitorio(e: Exception) -> bool:
+    """Fallos que merece la pena reintentar además del 429: timeouts, conexión, 408/409/5xx."""
+    codigo = _codigo(e)
+    if codigo is not None:
+        return codigo in (408, 409) or codigo >= 500
+    return type(e).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout")
+
+
+def con_limite(model: str, prompt: str, llamada: Callable[[], T], reintentos: int = 2,
+               info: Optional[Dict[str, float]] = None) -> T:
+    """
+    Ejecuta `llamada` respetando el límite del modelo. Ante 429 frena a todos los procesos y
+    reintenta (hasta REINTENTOS_429); ante fallos transitorios reintenta hasta `reintentos`.
+    Ambos con backoff exponencial con jitter. Es la única capa de reintentos: el cliente
+    del SDK se crea sin los suyos para que los 429 lleguen aquí.
+    En `info` deja los reintentos y la espera en cola de esta llamada (para el registro).
+    """
+    info = {} if info is None else info
+    info.update(reintentos=0, espera_cola_s=0.0)
+    n_429 = n_otros = 0
+    while True:
+        info["espera_cola_s"] += reservar(model, prompt)
+        try:
+            return llamada()
+        except Exception as e:
+            if es_429(e) and n_429 < REINTENTOS_429:
+                penalizar(model)
+                n_429 += 1
+            elif es_transitorio(e) and n_otros < reintentos:
+                n_otros += 1
+            else:
+                raise
+        with _ESTADISTICAS_LOCK:
+            _ESTADISTICAS["reintentos"] += 1
+        info["reintentos"] += 1
+        intento = n_429 + n_otros - 1
+        time.sleep(random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** intento)))
+
+
+def estadisticas() -> Dict[str, float]:
+    """Llamadas, esperas en cola y 429 de este proceso."""
+    with _ESTADISTICAS_LOCK:
+        return dict(_ESTADISTICAS)
+
+
+def resumen() -> str:
+    e = estadisticas()
+    return (f"cola LLM: {e['esperas']}/{e['llamadas']} llamadas esperaron "
+            f"({e['espera_total_s']:.1f} s, máx {e['espera_max_s']:.1f} s), {e['rechazos_429']} rechazos 429, "
+            f"{e['reintentos']} reintentos")
+
+
+def _percentil(valores, p: float) -> float:
+    if not valores:
+        return 0.0
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+
+def metricas(ventana_s: float = 3600) -> Dict[str, Dict[str, float]]:
+    """Espera en cola por modelo de todos los procesos en la última `ventana_s`."""
+    try:
+        with _conectar() as con:
+            filas = con.execute("SELECT modelo, espera_s FROM esperas WHERE ts >= ?",
+                                (time.time() - ventana_s,)).fetchall()
+    except sqlite3.Error:
+        return {}
+    por_modelo: Dict[str, list] = {}
+    for modelo, espera in filas:
+        por_modelo.setdefault(modelo, []).append(espera)
+    return {
+        m: {
+            "llamadas": len(v),
+            "esperaron": sum(1 for x in v if x > 0),
+            "p50_s": round(_percentil(v, 0.5), 3),
+            "p95_s": round(_percentil(v, 0.95), 3),
+            "max_s": round(max(v), 3),
+        }
+        for m, v in por_modelo.items()
+    }
+
+
+if __name__ == "__main__":
+    for modelo, m in sorted(metricas().items()):
+        rpm, tpm = limites(modelo)
+        print(f"{modelo:16s} {m['llamadas']:5d} llamadas, {m['esperaron']} en cola · espera p50 {m['p50_s']:.2f} s, "
+              f"p95 {m['p95_s']:.2f} s, máx {m['max_s']:.2f} s · límite {rpm:.0f} RPM / {tpm:.0f} TPM")
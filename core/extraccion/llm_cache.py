@@ -0,0 +1,114 @@
+# core/extraccion/llm_cache.py
+"""
+Caché persistente (SQLite) de respuestas del LLM, compartida por todos los módulos y procesos.
+
+Clave = SHA-256 de (modelo, temperatura, prompt y, si no es el API real, servidor). Las
+entradas caducan a las EIA_LLM_CACHE_TTL_H horas y, si la base supera EIA_LLM_CACHE_MAX_MB,
+se expulsan por LRU (fecha de último uso). Cada proceso lleva la cuenta de aciertos/fallos de su ejecución.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DB_PATH = Path(os.getenv("EIA_CACHE_DIR") or PROJECT_ROOT / ".cache") / "llm.sqlite"
+TTL_S = float(os.getenv("EIA_LLM_CACHE_TTL_H") or 24 * 30) * 3600
+MAX_BYTES = int(float(os.getenv("EIA_LLM_CACHE_MAX_MB") or 50) * 1024 * 1024)
+ACTIVA = os.getenv("EIA_LLM_CACHE", "1") != "0"
+
+_ESTADISTICAS = {"aciertos": 0, "fallos": 0}
+
+
+def clave(model: str, temperature: float, prompt: str) -> str:
+    base = f"{model}\0{float(temperature)}\0{prompt}"
+    # Las respuestas de otro servidor (p.ej. el local de pruebas) no se mezclan con las del API real
+    origen = os.getenv("EIA_LLM_BASE_URL") or os.getenv("OPENAI_BASE_URL")
+    if origen:
+        base += f"\0{origen}"
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _conectar():
+    """Conexión en transacción (commit al salir) que se cierra siempre."""
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            " clave TEXT PRIMARY KEY, modelo TEXT, temperatura REAL,"
+            " creado REAL, usado REAL, bytes INTEGER, respuesta TEXT)"
+        )
+        with con:
+            yield con
+    finally:
+        con.close()
+
+
+def get(model: str, temperature: float, prompt: str) -> Optional[str]:
+    """Respuesta guardada (y vigente) para el prompt, o None. Cuenta acierto/fallo."""
+    k = clave(model, temperature, prompt)
+    ahora = time.time()
+    try:
+        with _conectar() as con:
+            fila = con.execute("SELECT respuesta, creado FROM respuestas WHERE clave = ?", (k,)).fetchone()
+            if fila and ahora - fila[1] > TTL_S:
+                con.execute("DELETE FROM respuestas WHERE clave = ?", (k,))
+                fila = None
+            if fila:
+                con.execute("UPDATE respuestas SET usado = ? WHERE clave = ?", (ahora, k))
+    except sqlite3.Error as e:
+        print(f"Caché LLM no disponible: {e}")
+        fila = None
+    _ESTADISTICAS["aciertos" if fila else "fallos"] += 1
+    return fila[0] if fila else None
+
+
+def put(model: str, temperature: float, prompt: str, respuesta: str):
+    ahora = time.time()
+    try:
+        with _conectar() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (clave(model, temperature, prompt), model, float(temperature), ahora, ahora,
+                 len(respuesta.encode("utf-8")), respuesta),
+            )
+            _evict(con, MAX_BYTES)
+    except sqlite3.Error as e:
+        print(f"Caché LLM no disponible: {e}")
+
+
+def descartar(model: str, temperature: float, prompt: str):
+    """Borra la entrada (p.ej. una respuesta guardada que luego resultó inservible)."""
+    try:
+        with _conectar() as con:
+            con.execute("DELETE FROM respuestas WHERE clave = ?", (clave(model, temperature, prompt),))
+    except sqlite3.Error:
+        pass
+
+
+def _evict(con: sqlite3.Connection, max_bytes: int):
+    con.execute("DELETE FROM respuestas WHERE creado < ?", (time.time() - TTL_S,))
+    total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM respuestas").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for k, size in con.execute("SELECT clave, bytes FROM respuestas ORDER BY usado").fetchall():
+        if total <= max_bytes:
+            break
+        con.execute("DELETE FROM respuestas WHERE clave = ?", (k,))
+        total -= size
+
+
+def estadisticas() -> Dict[str, int]:
+    """Aciertos/fallos de la caché en este proceso."""
+    return dict(_ESTADISTICAS)
+
+
+def resumen() -> str:
+    e = _ESTADISTICAS
+    return f"caché LLM: {e['aciertos']} aciertos, {e['fallos']} fallos"
@@ -1,23 +1,439 @@
 # core/llm_utils.py
-import os, json, re
-from typing import Dict, Any, Tuple, Optional
+import os, json, re, time, atexit, threading, contextvars
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Tuple, Optional
+import httpx
 from openai import OpenAI
 
+from core.extraccion import llm_cache, limite_llm, registro_llm, respaldo_llm
+
 # ================== Cliente ==================
+# Un cliente (y su pool HTTP keep-alive) por proceso y clave; se reutiliza en todas las llamadas
+LLM_TIMEOUT_S = float(os.getenv("EIA_LLM_TIMEOUT_S") or 120)
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("EIA_LLM_CONNECT_TIMEOUT_S") or 10)
+LLM_MAX_CONNECTIONS = int(os.getenv("EIA_LLM_MAX_CONNECTIONS") or 10)
+LLM_MAX_KEEPALIVE = int(os.getenv("EIA_LLM_MAX_KEEPALIVE") or 5)
+LLM_KEEPALIVE_EXPIRY_S = float(os.getenv("EIA_LLM_KEEPALIVE_EXPIRY_S") or 60)
+# Reintentos ante timeouts/conexión/5xx. Los hace limite_llm.con_limite (el SDK no reintenta),
+# que además coordina los 429 entre procesos.
+LLM_MAX_RETRIES = int(os.getenv("EIA_LLM_MAX_RETRIES") or 2)
+
+_CLIENTES: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+_CLIENTES_LOCK = threading.Lock()
+
+
+def llm_base_url() -> Optional[str]:
+    """
+    Servidor compatible con OpenAI al que apuntar en lugar del API real, p.ej. el servidor local
+    de pruebas (benchmarks/servidor_llm_local.py): EIA_LLM_BASE_URL=http://127.0.0.1:8765/v1.
+    Se lee en cada llamada porque el .env se carga después de importar este módulo.
+    """
+    return os.getenv("EIA_LLM_BASE_URL") or os.getenv("OPENAI_BASE_URL") or None
+
+
+def _nuevo_cliente(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    timeout = httpx.Timeout(LLM_TIMEOUT_S, connect=LLM_CONNECT_TIMEOUT_S)
+    http_client = httpx.Client(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY_S,
+        ),
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, timeout=timeout, max_retries=0)
+
+
 def get_client():
-    api_key = os.getenv("OPENAI_API_KEY")
+    base_url = llm_base_url()
+    # Un servidor local no pide clave; el SDK sí exige una cualquiera
+    api_key = os.getenv("OPENAI_API_KEY") or ("local" if base_url else None)
     if not api_key:
         raise EnvironmentError("❌ Falta OPENAI_API_KEY. Crea un .env con la clave.")
-    return OpenAI(api_key=api_key)
+    clave = (api_key, base_url)
+    cliente = _CLIENTES.get(clave)
+    if cliente is None:
+        with _CLIENTES_LOCK:
+            cliente = _CLIENTES.get(clave)
+            if cliente is None:
+                cliente = _CLIENTES[clave] = _nuevo_cliente(api_key, base_url)
+    return cliente
 
-def llm_chat(prompt: str, model="gpt-4o-mini", temperature=0.3) -> str:
-    client = get_client()
-    completion = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature
+
+@atexit.register
+def cerrar_clientes():
+    """Cierra los pools HTTP (al salir del proceso o para forzar conexiones nuevas)."""
+    with _CLIENTES_LOCK:
+        for cliente in _CLIENTES.values():
+            try:
+                cliente.close()
+            except Exception:
+                pass
+        _CLIENTES.clear()
+
+# ================== Contador de llamadas por sección ==================
+# Llamadas reales al API (no cuentan los aciertos de caché), por sección que las origina.
+# La sección va en una ContextVar: asyncio.to_thread la hereda, así que vale en paralelo.
+_SECCION = contextvars.ContextVar("seccion_llm", default="general")
+_LLAMADAS: Counter = Counter()
+_LLAMADAS_LOCK = threading.Lock()
+
+
+@contextmanager
+def seccion_llm(nombre: str):
+    """Atribuye a `nombre` las llamadas al modelo hechas dentro del bloque."""
+    token = _SECCION.set(nombre)
+    try:
+        yield
+    finally:
+        _SECCION.reset(token)
+
+
+def llamadas_por_seccion() -> Dict[str, int]:
+    with _LLAMADAS_LOCK:
+        return dict(_LLAMADAS)
+
+
+def resumen_llamadas() -> str:
+    return ", ".join(f"{k}: {v}" for k, v in sorted(llamadas_por_seccion().items())) or "ninguna"
+
+
+def _anotar(model: str, prompt: str, t0: float, info: Dict[str, Any], usage: Any = None, **kw):
+    registro_llm.anotar(
+        model, prompt, _SECCION.get(),
+        tokens_prompt=getattr(usage, "prompt_tokens", None),
+        tokens_respuesta=getattr(usage, "completion_tokens", None),
+        duracion_s=time.perf_counter() - t0,
+        espera_cola_s=info.get("espera_cola_s", 0.0),
+        reintentos=info.get("reintentos", 0),
+        **kw
     )
-    return completion.choices[0].message.content.strip()
+
+
+def _esquema_de(extra: Dict[str, Any]) -> Optional[str]:
+    return ((extra.get("response_format") or {}).get("json_schema") or {}).get("name")
+
+
+def _completar(prompt: str, model: str, temperature: float, intento: int = 0, **extra) -> str:
+    client = get_client()
+    esquema = _esquema_de(extra)
+    # Aquí, antes de pasar a los hilos de respaldo_llm: allí la pila ya no llega al que llama
+    modulo = registro_llm.modulo_origen()
+
+    def una(es_respaldo: bool) -> str:
+        with _LLAMADAS_LOCK:
+            _LLAMADAS[_SECCION.get()] += 1
+        info: Dict[str, Any] = {}
+        t0 = time.perf_counter()
+        try:
+            completion = limite_llm.con_limite(model, prompt, lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                **extra
+            ), reintentos=LLM_MAX_RETRIES, info=info)
+        except Exception as e:
+            _anotar(model, prompt, t0, info, error=f"{type(e).__name__}: {e}", modulo=modulo,
+                    esquema=esquema, intento_esquema=intento, respaldo=es_respaldo)
+            raise
+        out = (completion.choices[0].message.content or "").strip()
+        _anotar(model, prompt, t0, info, getattr(completion, "usage", None), respuesta=out,
+                modulo=modulo, esquema=esquema, intento_esquema=intento, respaldo=es_respaldo)
+        return out
+
+    # Si tarda más que el p95 de su familia, respaldo_llm lanza una copia (modo opcional)
+    return respaldo_llm.ejecutar(f"{esquema or _SECCION.get()}:{model}", una)
+
+
+def _completar_stream(prompt: str, model: str, temperature: float, intento: int = 0,
+                      **extra) -> Iterator[str]:
+    """Como _completar, pero devuelve los trozos de texto según los emite el modelo."""
+    client = get_client()
+    with _LLAMADAS_LOCK:
+        _LLAMADAS[_SECCION.get()] += 1
+    info: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    try:
+        stream = limite_llm.con_limite(model, prompt, lambda: client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True},  # último trozo con los tokens, para el registro
+            **extra
+        ), reintentos=LLM_MAX_RETRIES, info=info)
+    except Exception as e:
+        _anotar(model, prompt, t0, info, error=f"{type(e).__name__}: {e}", esquema=_esquema_de(extra),
+                intento_esquema=intento)
+        raise
+    partes: List[str] = []
+    usage, primer_token, error = None, None, None
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if primer_token is None:
+                    primer_token = time.perf_counter() - t0
+                partes.append(delta)
+                yield delta
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stream.close()  # si el consumidor corta antes, libera la conexión
+        _anotar(model, prompt, t0, info, usage, respuesta="".join(partes), error=error,
+                esquema=_esquema_de(extra), intento_esquema=intento,
+                primer_token_s=round(primer_token, 3) if primer_token is not None else None)
+
+
+def llm_chat(prompt: str, model="gpt-4o-mini", temperature=0.3,
+             use_cache: bool = True, refrescar: bool = False) -> str:
+    """
+    Única puerta de salida al modelo. Con `use_cache` consulta/guarda en la caché SQLite;
+    `refrescar=True` ignora lo guardado (p.ej. al reintentar) pero guarda la nueva respuesta.
+    """
+    use_cache = use_cache and llm_cache.ACTIVA
+    if use_cache and not refrescar:
+        cached = llm_cache.get(model, temperature, prompt)
+        if cached is not None:
+            registro_llm.anotar(model, prompt, _SECCION.get(), cache=True)
+            return cached
+
+    out = _completar(prompt, model, temperature)
+    if use_cache and out:
+        llm_cache.put(model, temperature, prompt, out)
+    return out
+
+
+# ================== JSON incremental ==================
+_ESCAPES_JSON = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class ExtractorJSONIncremental:
+    """
+    Lee un objeto JSON a trozos (tal como llega en streaming) y va exponiendo el texto parcial
+    de sus campos de texto de primer nivel: {"4.3": "El ámbito...  <- aún sin cerrar
+    Los valores anidados, números, etc. se saltan. `texto` acumula la respuesta bruta completa.
+    """
+
+    def __init__(self):
+        self._partes: List[str] = []
+        self._valores: Dict[str, List[str]] = {}
+        self._prof = 0             # profundidad de {} / []
+        self._en_cadena = False
+        self._escape: Optional[str] = None  # None, "" tras "\\", o "uXXXX" en curso
+        self._alto: Optional[str] = None    # mitad alta de un par suplente \ud83d\ude00
+        self._es_clave = True
+        self._buf: List[str] = []
+        self._clave: Optional[str] = None
+
+    @property
+    def texto(self) -> str:
+        return "".join(self._partes)
+
+    @property
+    def valores(self) -> Dict[str, str]:
+        return {k: "".join(v) for k, v in self._valores.items()}
+
+    def _destino(self) -> Optional[List[str]]:
+        if self._prof == 1 and not self._es_clave and self._clave is not None:
+            return self._valores[self._clave]
+        return None
+
+    def feed(self, delta: str) -> Dict[str, str]:
+        """Procesa un trozo y devuelve {campo: texto parcial} de los campos que han cambiado."""
+        self._partes.append(delta)
+        cambiados = set()
+        for ch in delta:
+            if not self._en_cadena:
+                if ch == '"':
+                    self._en_cadena, self._buf = True, []
+                    if self._prof == 1 and not self._es_clave and self._clave is not None:
+                        self._valores[self._clave] = []
+                        cambiados.add(self._clave)
+                elif ch in "{[":
+                    self._prof += 1
+                    if self._prof == 1:
+                        self._es_clave = True
+                elif ch in "}]":
+                    self._prof -= 1
+                elif ch == ":" and self._prof == 1:
+                    self._es_clave = False
+                elif ch == "," and self._prof == 1:
+                    self._es_clave, self._clave = True, None
+                continue
+
+            if self._escape is not None:
+                self._escape += ch
+                if self._escape[0] == "u":
+                    if len(self._escape) < 5:
+                        continue
+                    try:
+                        ch = chr(int(self._escape[1:], 16))
+                    except ValueError:
+                        ch = ""
+                    self._escape = None
+                    if "\ud800" <= ch <= "\udbff":
+                        self._alto = ch
+                        continue
+                    if self._alto and "\udc00" <= ch <= "\udfff":
+                        ch = (self._alto + ch).encode("utf-16", "surrogatepass").decode("utf-16")
+                    self._alto = None
+                else:
+                    ch = _ESCAPES_JSON.get(self._escape, self._escape)
+                    self._escape = None
+            elif ch == "\\":
+                self._escape = ""
+                continue
+            elif ch == '"':
+                self._en_cadena = False
+                if self._prof == 1 and self._es_clave:
+                    self._clave = "".join(self._buf)
+                continue
+
+            if self._prof == 1 and self._es_clave:
+                self._buf.append(ch)
+            else:
+                destino = self._destino()
+                if destino is not None:
+                    destino.append(ch)
+                    cambiados.add(self._clave)
+        return {k: "".join(self._valores[k]) for k in cambiados}
+
+# ================== Salida estructurada (JSON Schema) ==================
+class ErrorEsquema(ValueError):
+    """La respuesta no cumple el esquema tras agotar los intentos; `datos` es el último JSON recibido."""
+
+    def __init__(self, errores: List[str], datos: Optional[dict]):
+        super().__init__("Respuesta fuera de esquema: " + "; ".join(errores[:5]))
+        self.errores = errores
+        self.datos = datos
+
+
+def esquema_desde_prompt(schema: Any) -> Dict[str, Any]:
+    """
+    Convierte los esquemas "de prompt" ({"campo": "string|null", ...}) en JSON Schema estricto:
+    todas las claves obligatorias y sin propiedades extra.
+    """
+    if isinstance(schema, dict):
+        return {
+            "type": "object",
+            "properties": {k: esquema_desde_prompt(v) for k, v in schema.items()},
+            "required": list(schema),
+            "additionalProperties": False,
+        }
+    tipos = [t.strip() for t in str(schema).split("|")]
+    return {"type": tipos[0] if len(tipos) == 1 else tipos}
+
+
+# Palabras clave que admite el modo estricto del API; el resto (minLength...) solo se valida aquí
+_CLAVES_API = {"type", "properties", "required", "additionalProperties", "items", "enum", "description"}
+
+
+def _esquema_api(esquema: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for k, v in esquema.items():
+        if k not in _CLAVES_API:
+            continue
+        if k == "properties":
+            v = {p: _esquema_api(sub) for p, sub in v.items()}
+        elif k == "items":
+            v = _esquema_api(v)
+        out[k] = v
+    return out
+
+
+_TIPOS = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+}
+
+
+def validar_esquema(dato: Any, esquema: Dict[str, Any], ruta: str = "$") -> List[str]:
+    """Errores de `dato` frente al subconjunto de JSON Schema que usamos (lista vacía = válido)."""
+    tipos = esquema.get("type")
+    if tipos:
+        tipos = [tipos] if isinstance(tipos, str) else tipos
+        if not any(_TIPOS[t](dato) for t in tipos):
+            return [f"{ruta}: se esperaba {'|'.join(tipos)}"]
+    errores: List[str] = []
+    if isinstance(dato, dict):
+        props = esquema.get("properties") or {}
+        errores += [f"{ruta}.{k}: falta" for k in esquema.get("required", []) if k not in dato]
+        if esquema.get("additionalProperties") is False:
+            errores += [f"{ruta}.{k}: clave no prevista" for k in dato if k not in props]
+        for k, sub in props.items():
+            if k in dato:
+                errores += validar_esquema(dato[k], sub, f"{ruta}.{k}")
+    elif isinstance(dato, list) and "items" in esquema:
+        for i, v in enumerate(dato):
+            errores += validar_esquema(v, esquema["items"], f"{ruta}[{i}]")
+    elif isinstance(dato, str) and len(dato.strip()) < esquema.get("minLength", 0):
+        errores.append(f"{ruta}: {len(dato.strip())} caracteres, mínimo {esquema['minLength']}")
+    if "enum" in esquema and dato not in esquema["enum"]:
+        errores.append(f"{ruta}: valor fuera de {esquema['enum']}")
+    return errores
+
+
+def _clave_json(prompt: str, esquema: Dict[str, Any]) -> str:
+    """Prompt con el que llm_chat_json guarda la respuesta en caché (prompt + esquema del API)."""
+    return f"{prompt}\0{json.dumps(_esquema_api(esquema), sort_keys=True)}"
+
+
+def descartar_json(prompt: str, esquema: Dict[str, Any], model: str = "gpt-4.1-mini", temperature: float = 0):
+    """Borra de la caché la respuesta de llm_chat_json (válida según el esquema pero inservible)."""
+    llm_cache.descartar(model, temperature, _clave_json(prompt, esquema))
+
+
+def llm_chat_json(prompt: str, esquema: Dict[str, Any], model: str = "gpt-4.1-mini",
+                  temperature: float = 0, nombre: str = "respuesta", max_intentos: int = 3,
+                  use_cache: bool = True,
+                  on_campo: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+    """
+    Pide al API una respuesta restringida a `esquema` (response_format json_schema estricto) y la
+    valida en local (incluidas restricciones que el API no admite, como minLength). Solo se
+    reintenta si la respuesta viola el esquema, indicando al modelo qué corregir. Solo se guardan
+    en caché respuestas válidas. Lanza ErrorEsquema si no se consigue.
+    Con `on_campo(campo, texto_parcial)` la respuesta se pide en streaming y se avisa cada vez
+    que crece un campo de texto de primer nivel (un acierto de caché avisa una vez por campo).
+    """
+    use_cache = use_cache and llm_cache.ACTIVA
+    api_schema = _esquema_api(esquema)
+    clave_cache = _clave_json(prompt, esquema)
+    formato = {"type": "json_schema", "json_schema": {"name": nombre, "schema": api_schema, "strict": True}}
+
+    p, datos, errores = prompt, None, []
+    for intento in range(max_intentos):
+        raw = llm_cache.get(model, temperature, clave_cache) if use_cache and intento == 0 else None
+        if raw is not None:
+            registro_llm.anotar(model, prompt, _SECCION.get(), cache=True, esquema=nombre)
+        if raw is None and on_campo is not None:
+            extractor = ExtractorJSONIncremental()
+            for delta in _completar_stream(p, model, temperature, intento=intento, response_format=formato):
+                for campo, texto in extractor.feed(delta).items():
+                    on_campo(campo, texto)
+            raw = extractor.texto
+        elif raw is None:
+            raw = _completar(p, model, temperature, intento=intento, response_format=formato)
+        elif on_campo is not None:
+            for campo, texto in ExtractorJSONIncremental().feed(raw).items():
+                on_campo(campo, texto)
+        datos = parse_json_output(raw)
+        errores = validar_esquema(datos, esquema) if datos is not None else ["$: no es un objeto JSON"]
+        if not errores:
+            if use_cache:
+                llm_cache.put(model, temperature, clave_cache, raw)
+            return datos
+        p = (f"{prompt}\n\nTu respuesta anterior no cumplía el esquema ({'; '.join(errores[:5])}). "
+             f"Devuelve de nuevo el JSON completo corrigiéndolo.\n\nRespuesta anterior:\n{raw[:4000]}")
+    raise ErrorEsquema(errores, datos)
 
 def parse_json_output(raw_text: str):
     """
@@ -52,31 +468,44 @@ def parse_json_output(raw_text: str):
         return None
 
 # ================== Prompt mejorado ==================
-def build_prompt(texto_relevante: str) -> str:
+ESQUEMA_EXTRACCION = {
+    "id": "string|null",
+    "localizacion": {
+        "municipio": "string|null",
+        "provincia": "string|null",
+        "poligono": "string|number|null",
+        "parcela": "string|number|null",
+        "referencia_catastral": "string|null"
+    },
+    "parametros": {
+        "uso_previsto": "string|null",
+        "detalles_de_uso": "string|null",
+        "caudal_max_instantaneo_l_s": "number|null",
+        "caudal_minimo_l_s": "number|null"
+    },
+    "particularidades": {
+        "numero_sondeos_previstos": "number|null",
+        "observaciones": "string|null"
+    }
+}
+
+
+def esquema_extraccion(campos: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Esquema (formato prompt) de la extracción; con `campos` ("seccion.campo") solo esos."""
+    if not campos:
+        return ESQUEMA_EXTRACCION
+    schema = {sec: {k: v for k, v in sub.items() if f"{sec}.{k}" in campos}
+              for sec, sub in ESQUEMA_EXTRACCION.items() if isinstance(sub, dict)}
+    return {sec: sub for sec, sub in schema.items() if sub}
+
+
+def build_prompt(texto_relevante: str, campos: Optional[List[str]] = None) -> str:
     """
     Extrae localizacion (municipio/provincia/polígono/parcela/RC), parámetros (uso/caudales) y particularidades.
     Regla extra: reconocer patrones 'Vega de Tera (Zamora)', 'término municipal de X', 'provincia de Y'.
+    Con `campos` (rutas "seccion.campo") el esquema se reduce a esos campos (prompt reducido).
     """
-    schema = {
-        "id": "string|null",
-        "localizacion": {
-            "municipio": "string|null",
-            "provincia": "string|null",
-            "poligono": "string|number|null",
-            "parcela": "string|number|null",
-            "referencia_catastral": "string|null"
-        },
-        "parametros": {
-            "uso_previsto": "string|null",
-            "detalles_de_uso": "string|null",
-            "caudal_max_instantaneo_l_s": "number|null",
-            "caudal_minimo_l_s": "number|null"
-        },
-        "particularidades": {
-            "numero_sondeos_previstos": "number|null",
-            "observaciones": "string|null"
-        }
-    }
+    schema = esquema_extraccion(campos)
     instrucciones = """
 Reglas:
 - Si un dato no aparece, usa null.
@@ -150,14 +579,25 @@ def _regex_localizacion(texto: str) -> Tuple[str, str]:
     return municipio, provincia
 
 # ================== Llamada con fallback ==================
-def call_llm_extract_json(prompt: str, model: str = "gpt-4.1-mini", texto_relevante: Optional[str] = None) -> Dict[str, Any]:
+def call_llm_extract_json(prompt: str, model: str = "gpt-4.1-mini", texto_relevante: Optional[str] = None,
+                          esquema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Ejecuta el prompt y devuelve dict.
+    Con `esquema` (formato prompt, p.ej. esquema_extraccion()) usa la salida estructurada validada.
     Si 'municipio' o 'provincia' vienen vacíos, intenta inferirlos por regex usando 'texto_relevante'.
     """
-    raw = llm_chat(prompt, model=model, temperature=0)
-    data = parse_json_output(raw)
+    if esquema is not None:
+        esquema = esquema_desde_prompt(esquema)
+        data = llm_chat_json(prompt, esquema, model=model, nombre="extraccion")
+    else:
+        raw = llm_chat(prompt, model=model, temperature=0)
+        data = parse_json_output(raw)
     if not data:
+        # Que el reintento vuelva a preguntar (con esquema, la clave es la de llm_chat_json)
+        if esquema is not None:
+            descartar_json(prompt, esquema, model)
+        else:
+            llm_cache.descartar(model, 0, prompt)
         raise ValueError("La salida del modelo no es JSON válido. Revisa el prompt o el texto.")
 
     # Asegura estructuras
@@ -0,0 +1,103 @@
+# core/extraccion/normalizacion.py
+"""
+Normalización de texto común a todo el pipeline (lectura del PDF, bloques, consumo, DOCX).
+
+- Caracteres (tabla CARACTERES): NBSP y espacios finos -> espacio, tabulador -> espacio,
+  \\r -> \\n, guion blando / espacio de ancho cero / BOM fuera. Solo se reemplazan los que
+  aparecen: buscar un carácter es un memchr, mientras que str.translate sobre texto con
+  acentos va carácter a carácter (~100 ms por MB frente a ~2 ms).
+- Documento (normalizar_documento): caracteres + tres regex precompiladas que empiezan por un
+  literal, para que el motor salte directamente a los candidatos (palabras partidas a fin de
+  línea, espacios repetidos, líneas en blanco de más) + strip.
+
+normalizar_documento se hace una vez por documento: el resultado queda en una caché pequeña
+por contenido y el texto ya normalizado se reconoce a sí mismo, así que pdf_reader (que lo
+produce), build_global_json y bloques_textuales no repiten el trabajo.
+Pasadas sobre el texto completo: estadisticas() (ver benchmarks/bench_normalizacion.py).
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+NBSP = "\u00A0"
+SOFT_HYPHEN = "\u00AD"
+ZWSP = "\u200B"
+
+CARACTERES = {
+    NBSP: " ",
+    "\u2007": " ",  # espacio de cifra
+    "\u202F": " ",  # NBSP estrecho
+    "\t": " ",
+    "\r": "\n",
+    SOFT_HYPHEN: "",
+    ZWSP: "",
+    "\uFEFF": "",
+}
+
+# Equivalen a (?<=\w)-\n(?=\w), " {2,}" y \n{3,}, pero con el literal delante
+_PALABRA_PARTIDA = re.compile(r"-\n(?=\w)(?<=\w-\n)")
+_ESPACIOS = re.compile(r"  +")
+_SALTOS_DE_MAS = re.compile(r"\n\n\n+")
+_ESPACIOS_Y_SALTOS = re.compile(r"\s+")
+
+# Documentos que se guardan normalizados (pocos: uno por informe en curso)
+CACHE_DOCUMENTOS = 4
+
+_CACHE: "OrderedDict[str, str]" = OrderedDict()
+_ESTADISTICAS = {"documentos": 0, "aciertos": 0, "pasadas": 0}
+_LOCK = threading.Lock()
+
+
+def limpiar_caracteres(s: str) -> str:
+    """Caracteres invisibles y espacios raros fuera (solo se toca el texto si aparecen)."""
+    s = s or ""
+    for c, r in CARACTERES.items():
+        if c in s:
+            s = s.replace(c, r)
+    return s
+
+
+def colapsar_espacios(s: str) -> str:
+    """Espacios repetidos -> uno (tras limpiar_caracteres no quedan tabuladores ni NBSP)."""
+    return _ESPACIOS.sub(" ", s)
+
+
+def aplanar(s: str) -> str:
+    """Todo el espacio en blanco (saltos incluidos) -> un espacio."""
+    return _ESPACIOS_Y_SALTOS.sub(" ", s or "").strip()
+
+
+def normalizar_documento(texto: str) -> str:
+    """
+    Texto completo del documento normalizado: caracteres, palabras partidas con guion a fin de
+    línea unidas, espacios colapsados y como mucho una línea en blanco seguida. Idempotente.
+    """
+    if not texto:
+        return ""
+    with _LOCK:
+        if texto in _CACHE:
+            _CACHE.move_to_end(texto)
+            _ESTADISTICAS["aciertos"] += 1
+            return _CACHE[texto]
+
+    s = limpiar_caracteres(texto)
+    s = _PALABRA_PARTIDA.sub("", s)
+    s = _ESPACIOS.sub(" ", s)
+    s = _SALTOS_DE_MAS.sub("\n\n", s).strip()
+
+    with _LOCK:
+        _ESTADISTICAS["documentos"] += 1
+        _ESTADISTICAS["pasadas"] += 5
+        # El resultado también es clave de sí mismo: normalizar lo ya normalizado es un acierto
+        _CACHE[texto] = s
+        _CACHE[s] = s
+        while len(_CACHE) > 2 * CACHE_DOCUMENTOS:
+            _CACHE.popitem(last=False)
+    return s
+
+
+def estadisticas() -> Dict[str, int]:
+    """Documentos normalizados, aciertos de caché y pasadas sobre el texto completo (este proceso)."""
+    with _LOCK:
+        return dict(_ESTADISTICAS)
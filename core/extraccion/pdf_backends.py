@@ -0,0 +1,154 @@
+# core/extraccion/pdf_backends.py
+"""
+Backends de extracción de texto PDF intercambiables.
+
+- pdfplumber: análisis de layout con x_tolerance/y_tolerance (el de siempre, el más fiable).
+- pymupdf: lectura directa de la capa de texto con PyMuPDF, mucho más rápida en páginas de texto.
+
+Todos devuelven un str por página con líneas separadas por "\\n", así que la salida entra tal cual
+en la limpieza de pdf_reader. `calibrar()` cronometra los disponibles sobre las primeras páginas
+y elige el más rápido que no pierda texto.
+"""
+import os
+import time
+import hashlib
+from io import BufferedReader, BytesIO
+from typing import Dict, List, Optional
+
+import pdfplumber
+from pdfminer.pdftypes import resolve1
+
+# Páginas cronometradas al calibrar
+CALIBRATION_PAGES = 5
+# Un backend ligero solo se acepta si saca al menos esta fracción del texto de pdfplumber
+MIN_TEXT_RATIO = 0.8
+
+
+def _as_source(fuente):
+    if isinstance(fuente, (bytes, bytearray)):
+        return BytesIO(fuente)
+    if isinstance(fuente, (str, os.PathLike)):
+        return fuente
+    fuente.seek(0)
+    return fuente
+
+
+def _safe_extract_text(page) -> str:
+    try:
+        return page.extract_text(x_tolerance=2, y_tolerance=2) or ""
+    except Exception:
+        try:
+            return page.extract_text() or ""
+        except Exception:
+            return ""
+
+
+def _release_page(page):
+    # pdfplumber guarda objetos y layout de cada página; se sueltan al terminar con ella
+    close = getattr(page, "close", None) or getattr(page, "flush_cache", None)
+    if close:
+        close()
+
+
+class BackendPdfplumber:
+    nombre = "pdfplumber"
+
+    def abrir(self, fuente):
+        return pdfplumber.open(_as_source(fuente))
+
+    def n_paginas(self, doc) -> int:
+        return len(doc.pages)
+
+    def texto(self, doc, i: int) -> str:
+        page = doc.pages[i]
+        txt = _safe_extract_text(page)
+        _release_page(page)
+        return txt
+
+    def hash_contenido(self, doc, i: int) -> str:
+        """Hash del content stream (ya descomprimido): cambia solo si cambia lo dibujado."""
+        h = hashlib.sha256()
+        for ref in getattr(doc.pages[i].page_obj, "contents", None) or []:
+            try:
+                h.update(resolve1(ref).get_data())
+            except Exception:
+                h.update(repr(ref).encode())
+        return h.hexdigest()
+
+
+class BackendPyMuPDF:
+    nombre = "pymupdf"
+
+    def abrir(self, fuente):
+        import fitz
+        # Con ruta (o fichero abierto de disco) se abre desde disco, sin leerlo entero a memoria
+        ruta = fuente.name if isinstance(fuente, BufferedReader) else fuente
+        if isinstance(ruta, (str, os.PathLike)):
+            return fitz.open(ruta, filetype="pdf")
+        data = fuente if isinstance(fuente, (bytes, bytearray)) else _as_source(fuente).read()
+        return fitz.open(stream=data, filetype="pdf")
+
+    def n_paginas(self, doc) -> int:
+        return doc.page_count
+
+    def texto(self, doc, i: int) -> str:
+        try:
+            return doc[i].get_text("text", sort=True) or ""
+        except Exception:
+            return ""
+
+    def hash_contenido(self, doc, i: int) -> str:
+        return hashlib.sha256(doc[i].read_contents() or b"").hexdigest()
+
+
+BACKENDS = {b.nombre: b for b in (BackendPdfplumber(), BackendPyMuPDF())}
+DEFAULT_BACKEND = "pdfplumber"
+
+
+def get_backend(nombre: Optional[str]):
+    try:
+        return BACKENDS[nombre or DEFAULT_BACKEND]
+    except KeyError:
+        raise ValueError(f"Backend PDF desconocido: {nombre!r} (disponibles: {', '.join(BACKENDS)})")
+
+
+def disponibles() -> List[str]:
+    out = [DEFAULT_BACKEND]
+    try:
+        import fitz  # noqa: F401
+        out.append("pymupdf")
+    except ImportError:
+        pass
+    return out
+
+
+def _cronometrar(backend, fuente, n: int):
+    t0 = time.perf_counter()
+    with backend.abrir(fuente) as doc:
+        textos = [backend.texto(doc, i) for i in range(min(n, backend.n_paginas(doc)))]
+    return time.perf_counter() - t0, sum(len(t.strip()) for t in textos)
+
+
+def calibrar(fuente, n_paginas: int = CALIBRATION_PAGES, verbose: bool = False) -> str:
+    """
+    Cronometra cada backend disponible sobre las primeras `n_paginas` páginas del documento y
+    devuelve el nombre del más rápido entre los que extraen al menos MIN_TEXT_RATIO del texto de
+    pdfplumber (si el PDF no tiene buena capa de texto, se queda pdfplumber).
+    """
+    medidas: Dict[str, tuple] = {}
+    for nombre in disponibles():
+        try:
+            medidas[nombre] = _cronometrar(BACKENDS[nombre], fuente, n_paginas)
+        except Exception as e:
+            if verbose:
+                print(f"Backend {nombre} descartado en la calibración: {e}")
+    if DEFAULT_BACKEND not in medidas:
+        return DEFAULT_BACKEND
+
+    _, ref_chars = medidas[DEFAULT_BACKEND]
+    aptos = {n: t for n, (t, chars) in medidas.items() if chars >= MIN_TEXT_RATIO * ref_chars}
+    elegido = min(aptos, key=aptos.get) if aptos else DEFAULT_BACKEND
+    if verbose:
+        resumen = ", ".join(f"{n}: {t:.2f}s/{c} car." for n, (t, c) in medidas.items())
+        print(f"Calibración PDF ({resumen}) -> {elegido}")
+    return elegido
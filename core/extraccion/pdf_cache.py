@@ -0,0 +1,114 @@
+# core/extraccion/pdf_cache.py
+"""
+Caché en disco del texto limpio por páginas, direccionada por contenido:
+clave = SHA-256 de los bytes del PDF + versión del extractor.
+Cada entrada es la lista de páginas en JSON comprimido con zlib; se expulsa por LRU
+(fecha de último uso) cuando el directorio supera EIA_PDF_CACHE_MAX_MB.
+
+Para versiones revisadas del mismo proyecto hay además un almacén por página
+(clave = hash del content stream de la página), de modo que solo se extraen
+las páginas que han cambiado.
+"""
+import os
+import json
+import zlib
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+CACHE_DIR = Path(os.getenv("EIA_CACHE_DIR") or PROJECT_ROOT / ".cache") / "pdf_text"
+PAGES_DIR = CACHE_DIR.parent / "pdf_pages"
+MAX_BYTES = int(float(os.getenv("EIA_PDF_CACHE_MAX_MB") or 200) * 1024 * 1024)
+_SUFFIX = ".json.z"
+
+
+def hash_upload(uploaded_file, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 de la subida leyendo por bloques; deja el puntero al inicio."""
+    h = hashlib.sha256()
+    for block in iter(lambda: uploaded_file.read(chunk_size), b""):
+        h.update(block)
+    uploaded_file.seek(0)
+    return h.hexdigest()
+
+
+def _entry_path(pdf_sha: str, version: str) -> Path:
+    return CACHE_DIR / f"{pdf_sha}-{version}{_SUFFIX}"
+
+
+def get_cached_pages(pdf_sha: str, version: str) -> Optional[List[str]]:
+    path = _entry_path(pdf_sha, version)
+    try:
+        pages = json.loads(zlib.decompress(path.read_bytes()).decode("utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Entrada de caché corrupta ({path.name}): {e}")
+        path.unlink(missing_ok=True)
+        return None
+    os.utime(path)  # marca de uso para el LRU
+    return pages
+
+
+def _write_atomic(path: Path, data) -> None:
+    blob = zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(blob)
+    os.replace(tmp, path)
+
+
+def store_pages(pdf_sha: str, version: str, pages: List[str]):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _write_atomic(_entry_path(pdf_sha, version), pages)
+    _evict(CACHE_DIR, MAX_BYTES)
+
+
+# ----------------- Almacén por página -----------------
+def _page_path(key: str) -> Path:
+    return PAGES_DIR / key[:2] / f"{key}{_SUFFIX}"
+
+
+def page_keys_present(keys: Iterable[str]) -> Set[str]:
+    """Claves que están en el almacén por página (sin leerlas ni marcar su uso)."""
+    return {key for key in keys if _page_path(key).exists()}
+
+
+def get_page_texts(keys: Iterable[str]) -> Dict[str, str]:
+    """Devuelve {clave: texto} para las claves presentes en el almacén por página."""
+    found: Dict[str, str] = {}
+    for key in keys:
+        path = _page_path(key)
+        try:
+            found[key] = json.loads(zlib.decompress(path.read_bytes()).decode("utf-8"))
+        except FileNotFoundError:
+            continue
+        except Exception:
+            path.unlink(missing_ok=True)
+            continue
+        os.utime(path)
+    return found
+
+
+def store_page_texts(texts: Dict[str, str]):
+    for key, txt in texts.items():
+        path = _page_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_atomic(path, txt)
+    if texts:
+        _evict(PAGES_DIR, MAX_BYTES)
+
+
+def _evict(directory: Path, max_bytes: int):
+    entries = []
+    for p in directory.rglob(f"*{_SUFFIX}"):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+    total = sum(size for _, size, _ in entries)
+    for _, size, p in sorted(entries):
+        if total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
@@ -1,25 +1,48 @@
+from typing import Tuple, List, Optional, Set, Iterator, Dict, Any
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from io import BytesIO
-from typing import Tuple, List
-import re
-import pdfplumber
-
-# Palabras clave para seleccionar páginas "ricas"
-KEYWORDS = [
-    "Objeto", "Resumen", "Localización", "Situación", "Emplazamiento", "Coordenadas", "UTM", "Geodésicas",
-    "Polígono", "Parcela", "Referencia catastral", "Uso previsto", "abastecimiento", "riego",
-    "Profundidad", "Longitud", "Caudal", "Instalaciones", "bomba", "perforación", "tubería",
-    "filtros", "instalación eléctrica", "características del sondeo", "diámetro", "entubación",
-    "impulsión", "C.V.", "kW", "caudal máximo", "máximo instantáneo", "QMi", "Q M i",
-    "Qmax", "Q máx", "Caudal necesario", "Geología", "Hidrogeología", "acuífero",
-    "Nivel freático", "permeabilidad", "porosidad", "vulnerabilidad", "Alternativas",
-    "Justificación", "Valoración", "Comparativa"
-]
+from itertools import islice
+import os
+import hashlib
+import shutil
+import tempfile
+
+from core.extraccion import pdf_cache
+from core.extraccion.normalizacion import normalizar_documento
+from core.extraccion.pdf_backends import BACKENDS, calibrar, get_backend
+from core.extraccion.purga import MotorPurga, cargar_firmas_proyecto, norm_line
+from core.extraccion.rastreo_campos import MARGEN_PAGINAS, RastreadorCampos
+from core.extraccion.relevancia import KEYWORD_WEIGHTS, empaquetar_paginas
+
+# Subir al cambiar la extracción o la limpieza: invalida la caché de texto en disco
+EXTRACTOR_VERSION = "2"
+
+# Nº de procesos para extraer texto por páginas (EIA_PDF_WORKERS; 0 ó 1 = en serie)
+PDF_WORKERS = int(os.getenv("EIA_PDF_WORKERS") or min(4, os.cpu_count() or 1))
+# Por debajo de este nº de páginas no compensa arrancar procesos
+MIN_PAGES_PARALLEL = 24
+# Lectura perezosa en paralelo: páginas por tarea (se piden unas pocas tareas por delante)
+PAGINAS_POR_LOTE = 8
+# Backend de texto: "auto" (calibra por documento), "pdfplumber" o "pymupdf"
+PDF_BACKEND = os.getenv("EIA_PDF_BACKEND", "auto")
+# Lectura en streaming: hasta este tamaño el PDF se queda en memoria, a partir de ahí va a disco
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+# Páginas muestreadas (repartidas por todo el documento) para aprender cabeceras/pies repetidos
+HEADER_SAMPLE_PAGES = 40
+# Lectura perezosa: la muestra de cabeceras/pies se toma solo de las primeras páginas (memoria, no planos)
+LAZY_SAMPLE_SPAN = 30
+LAZY_SAMPLE_PAGES = 12
+# Almacén por página: páginas recién extraídas/limpias que se acumulan antes de escribirlas
+PAGINAS_POR_ESCRITURA = 64
 
-# Firmas típicas a purgar (cabeceras/pies/leyendas de planos…)
+# Palabras clave para seleccionar páginas "ricas" (pesos y matcher en relevancia.py)
+KEYWORDS = list(KEYWORD_WEIGHTS)
+
+# Firmas genéricas a purgar (cabeceras/pies/leyendas de planos…);
+# las propias de cada proyecto/ingeniería van en config/firmas_pdf.yaml
 HEADER_FOOTER_PATTERNS = [
-    r"ipsaingenieros\.com",
-    r"Pl\.\s*San\s*Crist[oó]bal\s*n[ºo]\s*6.*Salamanca",
-    r"SONDEO\s+DE\s+APOYO.*VEGA\s+DE\s+TERA.*ZAMORA",
     r"---\s*P[aá]gina\b.+",
     r"^\s*Fdo:\s+.+$",
     r"^\s*Escala\s*:\s*.+$",
@@ -32,31 +55,26 @@ HEADER_FOOTER_PATTERNS = [
     r"^\s*Localización\s*[0-9/]*\s*$",
 ]
 
-def _safe_extract_text(page) -> str:
-    try:
-        return page.extract_text(x_tolerance=2, y_tolerance=2) or ""
-    except Exception:
-        try:
-            return page.extract_text() or ""
-        except Exception:
-            return ""
+_MOTOR = MotorPurga(HEADER_FOOTER_PATTERNS + cargar_firmas_proyecto())
+# Versión efectiva para la caché: cambia con el código o con las firmas configuradas
+_CACHE_VERSION = f"{EXTRACTOR_VERSION}.{_MOTOR.firma}"
 
-def _norm_line(s: str) -> str:
-    s = s.replace("\r", "").replace("\t", " ").strip()
-    s = re.sub(r"[ \u00A0]{2,}", " ", s)
-    return s
+_norm_line = norm_line
 
 def _purge_explicit_patterns(lines: List[str]) -> List[str]:
-    out = []
-    for ln in lines:
-        L = ln.strip()
-        if any(re.search(pat, L, re.IGNORECASE) for pat in HEADER_FOOTER_PATTERNS):
-            continue
-        out.append(ln)
-    return out
+    return _MOTOR.filtrar_lineas(lines)
+
+def _count_edge_lines(L: List[str], firsts, lasts, head_k: int, foot_k: int):
+    for l in L[:min(head_k, len(L))]:
+        if len(l) > 6: firsts[l] += 1
+    for l in L[-min(foot_k, len(L)):] if L else []:
+        if len(l) > 6: lasts[l] += 1
+
+def _common_lines(firsts, lasts, total: int) -> Set[str]:
+    thr = max(2, int(0.4 * total))
+    return set([l for l, c in firsts.items() if c >= thr] + [l for l, c in lasts.items() if c >= thr])
 
 def _strip_common_headers_footers(pages_lines: List[List[str]], head_k: int = 5, foot_k: int = 5) -> List[List[str]]:
-    from collections import Counter
     firsts, lasts = Counter(), Counter()
     total = len(pages_lines)
 
@@ -64,65 +82,432 @@ def _strip_common_headers_footers(pages_lines: List[List[str]], head_k: int = 5,
     for lines in pages_lines:
         L = [_norm_line(x) for x in lines]
         norm_pages.append(L)
-        for l in L[:min(head_k, len(L))]:
-            if len(l) > 6: firsts[l] += 1
-        for l in L[-min(foot_k, len(L)):] if L else []:
-            if len(l) > 6: lasts[l] += 1
+        _count_edge_lines(L, firsts, lasts, head_k, foot_k)
 
-    thr = max(2, int(0.4 * total))
-    common = set([l for l, c in firsts.items() if c >= thr] + [l for l, c in lasts.items() if c >= thr])
+    common = _common_lines(firsts, lasts, total)
 
-    cleaned_pages = []
-    for L in norm_pages:
-        L2 = [x for x in L if x not in common]
-        L3 = _purge_explicit_patterns(L2)
-        cleaned_pages.append(L3)
-    return cleaned_pages
+    motor = _MOTOR.con_repetidas(common)
+    return [motor.filtrar_lineas(L) for L in norm_pages]
 
-def _read_all_pages(uploaded_file) -> List[str]:
-    raw = uploaded_file.read()
-    uploaded_file.seek(0)
+def _extract_page_indices(fuente, indices: List[int], backend: str = "pdfplumber") -> List[str]:
+    """Extrae las páginas indicadas abriendo el PDF (bytes o ruta) en el propio proceso."""
+    be = get_backend(backend)
+    with be.abrir(fuente) as doc:
+        return [be.texto(doc, i) for i in indices]
+
+def _extract_page_range(fuente, start: int, end: int, backend: str = "pdfplumber") -> List[str]:
+    """Extrae las páginas [start, end) abriendo el PDF (bytes o ruta) en el propio proceso."""
+    return _extract_page_indices(fuente, list(range(start, end)), backend)
+
+def _split_ranges(n_pages: int, n_chunks: int) -> List[Tuple[int, int]]:
+    n_chunks = max(1, min(n_chunks, n_pages))
+    size, rest = divmod(n_pages, n_chunks)
+    ranges, start = [], 0
+    for i in range(n_chunks):
+        end = start + size + (1 if i < rest else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def _pdf_en_disco(raw: bytes) -> str:
+    """Copia el PDF a un temporal: a los procesos se les pasa la ruta, no los bytes en cada tarea."""
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(raw)
+    return tmp.name
+
+def _read_pages_parallel(raw: bytes, n_pages: int, workers: int, backend: str = "pdfplumber") -> List[str]:
+    # Más tramos que procesos: los planos/anexos pesan mucho más que el texto y así se reparte mejor
+    ranges = _split_ranges(n_pages, workers * 2)
     out: List[str] = []
-    with pdfplumber.open(BytesIO(raw)) as pdf:
-        for p in pdf.pages:
-            out.append(_safe_extract_text(p))
+    ruta = _pdf_en_disco(raw)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = [ex.submit(_extract_page_range, ruta, a, b, backend) for a, b in ranges]
+            for fut in futures:  # en orden de envío -> páginas en orden
+                out.extend(fut.result())
+    finally:
+        os.unlink(ruta)
     return out
 
+def _resolve_backend(fuente, backend: Optional[str] = None) -> str:
+    """Nombre del backend a usar; con "auto" se calibra sobre las primeras páginas del documento."""
+    backend = backend or PDF_BACKEND
+    if backend != "auto":
+        return get_backend(backend).nombre
+    return calibrar(fuente)
+
+def _read_all_pages(uploaded_file, workers: Optional[int] = None, backend: Optional[str] = None) -> List[str]:
+    raw = uploaded_file.read()
+    uploaded_file.seek(0)
+    workers = PDF_WORKERS if workers is None else workers
+    backend = _resolve_backend(raw, backend)
+    be = get_backend(backend)
+    with be.abrir(raw) as doc:
+        n_pages = be.n_paginas(doc)
+        if workers <= 1 or n_pages < MIN_PAGES_PARALLEL:
+            return [be.texto(doc, i) for i in range(n_pages)]
+    try:
+        return _read_pages_parallel(raw, n_pages, workers, backend)
+    except Exception as e:
+        print(f"Extracción en paralelo fallida ({e}); se repite en serie.")
+        return _extract_page_range(raw, 0, n_pages, backend)
+
 def _page_text_to_lines(txt: str) -> List[str]:
     if not txt: return []
     return txt.replace("\r", "\n").split("\n")
 
 def _compose_text_from_lines(lines: List[str]) -> str:
-    lines = [ln for ln in lines if not re.search(r"---\s*P[aá]gina\b.+", ln, flags=re.IGNORECASE)]
+    # El marcador "--- Página N ---" ya lo elimina el motor de purga
     return "\n".join(lines)
 
 def _clean_pages_texts(pages_texts: List[str]) -> List[str]:
     pages_lines = [_page_text_to_lines(t) for t in pages_texts]
     pages_lines = _strip_common_headers_footers(pages_lines, head_k=5, foot_k=5)
-    cleaned = []
-    for L in pages_lines:
-        L2 = [re.sub(r"[ \t]+$", "", x) for x in L]
-        cleaned.append(_compose_text_from_lines(L2))
-    return cleaned
-
-def leer_paginas_relevantes_from_upload(uploaded_file, max_pages: int = 40, max_chars: int = 15000) -> Tuple[str, List[int]]:
-    pages_texts = _read_all_pages(uploaded_file)
-    cleaned_texts = _clean_pages_texts(pages_texts)
-
-    seleccion = []
-    for idx, txt in enumerate(cleaned_texts, start=1):
-        if any(kw.lower() in txt.lower() for kw in KEYWORDS):
-            seleccion.append((idx, txt))
-    if not seleccion:
-        seleccion = [(i + 1, t) for i, t in enumerate(cleaned_texts[:max_pages])]
-
-    usadas = [i for i, _ in seleccion]
-    texto = "\n\n".join(txt for _, txt in seleccion)
-    if max_chars and max_chars > 0:
-        texto = texto[:max_chars]
-    return texto, usadas
-
-def leer_pdf_texto_completo(uploaded_file) -> str:
-    pages_texts = _read_all_pages(uploaded_file)
-    cleaned_texts = _clean_pages_texts(pages_texts)
-    return "\n\n".join(cleaned_texts)
+    return [_compose_text_from_lines(L) for L in pages_lines]
+
+@contextmanager
+def _spool_upload(uploaded_file):
+    """
+    Copia la subida por bloques, sin materializar el PDF entero como bytes: hasta SPOOL_MAX_MEMORY
+    queda en memoria (BytesIO); si es mayor va a un fichero temporal y se entrega su ruta, para que
+    los backends lo abran desde disco (PyMuPDF leería un flujo entero a memoria).
+    """
+    inicio = uploaded_file.read(SPOOL_MAX_MEMORY + 1)
+    if len(inicio) <= SPOOL_MAX_MEMORY:
+        uploaded_file.seek(0)
+        yield BytesIO(inicio)
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(inicio)
+        del inicio
+        shutil.copyfileobj(uploaded_file, tmp, 1024 * 1024)
+    uploaded_file.seek(0)
+    try:
+        yield tmp.name
+    finally:
+        os.unlink(tmp.name)
+
+def _sample_indices(n_pages: int, k: int) -> List[int]:
+    if n_pages <= k:
+        return list(range(n_pages))
+    step = n_pages / k
+    return sorted({int(i * step) for i in range(k)})
+
+def _iter_textos_paralelo(fuente, indices: List[int], workers: int, backend: str) -> Iterator[str]:
+    """
+    Texto bruto de las páginas `indices`, en orden, extraído por lotes de PAGINAS_POR_LOTE en `workers`
+    procesos con como mucho 2*workers lotes en vuelo: si se deja de consumir (lectura que se
+    detiene al localizar los campos), los lotes pendientes se cancelan.
+    """
+    ruta = fuente if isinstance(fuente, (str, os.PathLike)) else _pdf_en_disco(fuente.getvalue())
+    lotes = iter([indices[a:a + PAGINAS_POR_LOTE] for a in range(0, len(indices), PAGINAS_POR_LOTE)])
+    ex = ProcessPoolExecutor(max_workers=workers)
+    try:
+        en_vuelo = deque(ex.submit(_extract_page_indices, ruta, lote, backend)
+                         for lote in islice(lotes, workers * 2))
+        while en_vuelo:
+            textos = en_vuelo.popleft().result()
+            for lote in islice(lotes, 1):
+                en_vuelo.append(ex.submit(_extract_page_indices, ruta, lote, backend))
+            yield from textos
+    finally:
+        ex.shutdown(wait=True, cancel_futures=True)
+        if ruta is not fuente:
+            os.unlink(ruta)
+
+def _textos_brutos(fuente, be, doc, indices: List[int], workers: int) -> Iterator[str]:
+    """
+    Texto bruto de las páginas `indices`, en orden: en procesos si son muchas (con vuelta a la
+    extracción en serie desde la primera que falte si el pool falla) o en serie con `doc`.
+    """
+    hechas = 0
+    if workers > 1 and len(indices) >= MIN_PAGES_PARALLEL:
+        lector = _iter_textos_paralelo(fuente, indices, workers, be.nombre)
+        try:
+            for txt in lector:
+                hechas += 1
+                yield txt
+        except Exception as e:
+            print(f"Extracción en paralelo fallida ({e}); se sigue en serie desde la página {indices[hechas] + 1}.")
+        finally:
+            lector.close()
+    for i in indices[hechas:]:
+        yield be.texto(doc, i)
+
+def _claves_paginas(be, doc, n_pages: int) -> List[str]:
+    """Clave de cada página en el almacén por página: hash de su content stream + versión + backend."""
+    return [f"{be.hash_contenido(doc, i)}-{EXTRACTOR_VERSION}.{be.nombre}" for i in range(n_pages)]
+
+def _sufijo_limpia(common: Set[str]) -> str:
+    """Sufijo de la clave del texto limpio: firmas de purga + cabeceras/pies aprendidos del documento."""
+    return f"-c{_MOTOR.firma}" + hashlib.sha256("\n".join(sorted(common)).encode("utf-8")).hexdigest()[:16]
+
+def _guardar_paginas(nuevas: Dict[str, str]):
+    try:
+        pdf_cache.store_page_texts(nuevas)
+    except OSError as e:
+        print(f"No se pudo guardar el texto por página en caché: {e}")
+    nuevas.clear()
+
+def iter_paginas_limpias(uploaded_file, sample_pages: int = HEADER_SAMPLE_PAGES,
+                         head_k: int = 5, foot_k: int = 5, backend: Optional[str] = None,
+                         sample_span: Optional[int] = None, workers: Optional[int] = None,
+                         por_pagina: bool = False,
+                         informe: Optional[Dict[str, List[int]]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Generador (nº de página, texto limpio) con memoria acotada, en dos pasadas:
+    1) muestrea hasta `sample_pages` páginas repartidas (entre las `sample_span` primeras, si se indica)
+       para aprender cabeceras/pies repetidos;
+    2) recorre el documento página a página limpiando y liberando cada una (en documentos grandes
+       el texto bruto lo extraen `workers` procesos por lotes, unas páginas por delante).
+    El texto bruto de la muestra se reutiliza en la 2ª pasada (como mucho `sample_pages` páginas).
+    Es perezoso: si se deja de consumir, no se extraen más páginas.
+    Con `por_pagina` usa el almacén por página de pdf_cache (clave = hash del content stream): las
+    páginas ya vistas en otra versión del documento no se extraen y, si las cabeceras/pies aprendidos
+    no han cambiado, tampoco se vuelven a limpiar. En `informe` anota los nº de página
+    "reutilizadas" y "reextraidas".
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    informe = {} if informe is None else informe
+    reutilizadas, reextraidas = informe.setdefault("reutilizadas", []), informe.setdefault("reextraidas", [])
+    with _spool_upload(uploaded_file) as tmp:
+        be = get_backend(_resolve_backend(tmp, backend))
+        with be.abrir(tmp) as doc:
+            n_pages = be.n_paginas(doc)
+            claves = _claves_paginas(be, doc, n_pages) if por_pagina else []
+            guardadas = pdf_cache.page_keys_present(claves)
+            nuevas: Dict[str, str] = {}
+
+            def bruto_guardado(i: int) -> Optional[str]:
+                if not claves or claves[i] not in guardadas:
+                    return None
+                return pdf_cache.get_page_texts([claves[i]]).get(claves[i])
+
+            firsts, lasts = Counter(), Counter()
+            sample, extraidas = {}, set()
+            for i in _sample_indices(min(n_pages, sample_span or n_pages), sample_pages):
+                sample[i] = bruto_guardado(i)
+                if sample[i] is None:
+                    sample[i] = be.texto(doc, i)
+                    extraidas.add(i)
+                L = [_norm_line(x) for x in _page_text_to_lines(sample[i])]
+                _count_edge_lines(L, firsts, lasts, head_k, foot_k)
+            common = _common_lines(firsts, lasts, len(sample))
+            motor = _MOTOR.con_repetidas(common)
+            limpias = [k + _sufijo_limpia(common) for k in claves]
+            guardadas |= pdf_cache.page_keys_present(limpias)
+
+            # Solo se extraen las páginas que no están en la muestra ni en el almacén
+            extraer = [i for i in range(n_pages) if i not in sample
+                       and not (claves and (claves[i] in guardadas or limpias[i] in guardadas))]
+            textos = _textos_brutos(tmp, be, doc, extraer, workers)
+            pendientes = set(extraer)
+            try:
+                for i in range(n_pages):
+                    limpio = pdf_cache.get_page_texts([limpias[i]]).get(limpias[i]) \
+                        if claves and limpias[i] in guardadas else None
+                    if limpio is None:
+                        txt = sample.pop(i, None)
+                        if txt is None and i in pendientes:
+                            txt = next(textos)
+                            extraidas.add(i)
+                        if txt is None:
+                            txt = bruto_guardado(i)
+                        if txt is None:  # expulsada del almacén entre la comprobación y la lectura
+                            txt = be.texto(doc, i)
+                            extraidas.add(i)
+                        limpio = motor.limpiar_pagina(txt)
+                        if claves:
+                            if i in extraidas:
+                                nuevas[claves[i]] = txt
+                            nuevas[limpias[i]] = limpio
+                            if len(nuevas) >= PAGINAS_POR_ESCRITURA:
+                                _guardar_paginas(nuevas)
+                    sample.pop(i, None)
+                    (reextraidas if i in extraidas else reutilizadas).append(i + 1)
+                    yield i + 1, limpio
+            finally:
+                textos.close()
+                if nuevas:
+                    _guardar_paginas(nuevas)
+
+def leer_pdf_incremental(uploaded_file, workers: Optional[int] = None, backend: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extracción incremental para versiones revisadas de un mismo proyecto.
+    Cada página se identifica por el hash de su content stream; las ya vistas reutilizan el texto
+    bruto y el texto limpio en caché. La limpieza solo se repite en las páginas nuevas, salvo que
+    cambien las cabeceras/pies aprendidos, en cuyo caso se rehace en todas (el texto bruto se reutiliza igual).
+    Las cabeceras/pies se aprenden de todas las páginas, como en la lectura completa.
+    Devuelve {"paginas": [texto limpio], "reutilizadas": [nº], "reextraidas": [nº], "backend": nombre}.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    with _spool_upload(uploaded_file) as fuente:
+        be = get_backend(_resolve_backend(fuente, backend))
+        with be.abrir(fuente) as doc:
+            page_keys = _claves_paginas(be, doc, be.n_paginas(doc))
+            raw_texts = pdf_cache.get_page_texts(set(page_keys))
+            missing = [i for i, k in enumerate(page_keys) if k not in raw_texts]
+            fresh = {page_keys[i]: t for i, t in zip(missing, _textos_brutos(fuente, be, doc, missing, workers))}
+    raw_texts.update(fresh)
+
+    # Cabeceras/pies sobre todo el documento (solo texto, barato); su firma forma parte de la clave limpia
+    firsts, lasts = Counter(), Counter()
+    for k in page_keys:
+        _count_edge_lines([_norm_line(x) for x in _page_text_to_lines(raw_texts[k])], firsts, lasts, 5, 5)
+    common = _common_lines(firsts, lasts, len(page_keys))
+
+    clean_keys = [k + _sufijo_limpia(common) for k in page_keys]
+    cleaned = pdf_cache.get_page_texts(set(clean_keys))
+    motor = _MOTOR.con_repetidas(common)
+    for k, ck in zip(page_keys, clean_keys):
+        if ck not in cleaned:
+            cleaned[ck] = fresh[ck] = motor.limpiar_pagina(raw_texts[k])
+    if fresh:
+        _guardar_paginas(fresh)
+
+    missing_set = set(missing)
+    return {
+        "paginas": [cleaned[ck] for ck in clean_keys],
+        "reutilizadas": [i + 1 for i in range(len(page_keys)) if i not in missing_set],
+        "reextraidas": [i + 1 for i in missing],
+        "backend": be.nombre,
+    }
+
+def _leer_paginas_limpias(uploaded_file, workers: Optional[int] = None, streaming: bool = False,
+                          use_cache: bool = True, backend: Optional[str] = None) -> List[str]:
+    """Texto limpio por páginas; si el mismo PDF ya se procesó, sale de la caché sin extraer."""
+    pdf_sha = pdf_cache.hash_upload(uploaded_file) if use_cache else None
+    if pdf_sha:
+        # Con "auto" vale cualquier backend con el que ya se extrajo este PDF
+        candidatos = [backend or PDF_BACKEND]
+        if candidatos[0] == "auto":
+            candidatos = list(BACKENDS)
+        for nombre in candidatos:
+            cached = pdf_cache.get_cached_pages(pdf_sha, f"{_CACHE_VERSION}.{nombre}")
+            if cached is not None:
+                return cached
+
+    backend = _resolve_backend(uploaded_file, backend)
+    uploaded_file.seek(0)
+    # Con caché, las páginas que no cambian respecto a otra versión del documento no se extraen
+    if streaming:
+        cleaned_texts = [txt for _, txt in iter_paginas_limpias(uploaded_file, backend=backend, workers=workers,
+                                                                por_pagina=bool(pdf_sha))]
+    elif pdf_sha:
+        cleaned_texts = leer_pdf_incremental(uploaded_file, workers=workers, backend=backend)["paginas"]
+    else:
+        cleaned_texts = _clean_pages_texts(_read_all_pages(uploaded_file, workers=workers, backend=backend))
+
+    if pdf_sha:
+        try:
+            pdf_cache.store_pages(pdf_sha, f"{_CACHE_VERSION}.{backend}", cleaned_texts)
+        except OSError as e:
+            print(f"No se pudo guardar el texto en caché: {e}")
+    return cleaned_texts
+
+def _observar(paginas: List[str], campos, bloques, margen: int) -> RastreadorCampos:
+    rastreador = RastreadorCampos(campos, bloques, margen)
+    for n, txt in enumerate(paginas, start=1):
+        rastreador.observar(n, txt)
+    return rastreador
+
+def leer_pdf_hasta_campos(uploaded_file, campos: Optional[List[str]] = None, bloques: Optional[List[str]] = None,
+                          margen: int = MARGEN_PAGINAS, backend: Optional[str] = None,
+                          use_cache: bool = True, workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Lectura perezosa guiada por campos: extrae páginas en orden y se detiene en cuanto el
+    rastreador ha localizado todos los campos requeridos y los inicios de todos los bloques
+    textuales (más `margen` páginas para que el último bloque quede completo). Si falta algo,
+    sigue hasta el final del documento (en documentos grandes, con `workers` procesos).
+    Caché: una lectura completa se guarda como la del documento entero (la misma que usa
+    leer_pdf_paginas); una detenida antes, aparte ("parcial"), y solo vale si en sus páginas
+    siguen estando todos los campos pedidos. Si el documento no está en caché pero es una versión
+    revisada de otro ya leído, solo se extraen y limpian las páginas que han cambiado.
+    Devuelve {"paginas": [texto limpio leído], "leidas": n, "total": n_total|None,
+              "completo": bool, "faltan": [...], "localizados": {nombre: nº página},
+              "reutilizadas": [nº], "reextraidas": [nº]}.
+    """
+    pdf_sha = pdf_cache.hash_upload(uploaded_file) if use_cache else None
+    if pdf_sha:
+        candidatos = list(BACKENDS) if (backend or PDF_BACKEND) == "auto" else [backend or PDF_BACKEND]
+        for nombre in candidatos:
+            cached = pdf_cache.get_cached_pages(pdf_sha, f"{_CACHE_VERSION}.{nombre}")
+            if cached is not None:
+                rastreador = _observar(cached, campos, bloques, margen)
+                return {"paginas": cached, "leidas": len(cached), "total": len(cached),
+                        "completo": not rastreador.faltan, "faltan": rastreador.faltan,
+                        "localizados": rastreador.localizados,
+                        "reutilizadas": list(range(1, len(cached) + 1)), "reextraidas": []}
+        for nombre in candidatos:
+            cached = pdf_cache.get_cached_pages(pdf_sha, f"{_CACHE_VERSION}.{nombre}.parcial")
+            if cached is not None:
+                rastreador = _observar(cached, campos, bloques, margen)
+                if rastreador.completo:
+                    return {"paginas": cached, "leidas": len(cached), "total": None, "completo": True,
+                            "faltan": [], "localizados": rastreador.localizados,
+                            "reutilizadas": list(range(1, len(cached) + 1)), "reextraidas": []}
+
+    backend = _resolve_backend(uploaded_file, backend)
+    uploaded_file.seek(0)
+    rastreador = RastreadorCampos(campos, bloques, margen)
+    paginas: List[str] = []
+    informe: Dict[str, List[int]] = {}
+    gen = iter_paginas_limpias(uploaded_file, sample_pages=LAZY_SAMPLE_PAGES, backend=backend,
+                               sample_span=LAZY_SAMPLE_SPAN, workers=workers, por_pagina=bool(pdf_sha),
+                               informe=informe)
+    agotado = True
+    try:
+        for n, txt in gen:
+            paginas.append(txt)
+            rastreador.observar(n, txt)
+            if rastreador.completo:
+                agotado = False
+                break
+    finally:
+        gen.close()
+
+    if pdf_sha:
+        clave = f"{_CACHE_VERSION}.{backend}" + ("" if agotado else ".parcial")
+        try:
+            pdf_cache.store_pages(pdf_sha, clave, paginas)
+        except OSError as e:
+            print(f"No se pudo guardar el texto en caché: {e}")
+
+    return {
+        "paginas": paginas,
+        "leidas": len(paginas),
+        "total": len(paginas) if agotado else None,
+        "completo": not rastreador.faltan,
+        "faltan": rastreador.faltan,
+        "localizados": rastreador.localizados,
+        "reutilizadas": informe.get("reutilizadas", []),
+        "reextraidas": informe.get("reextraidas", []),
+    }
+
+def leer_pdf_paginas(uploaded_file, workers: Optional[int] = None, streaming: bool = False,
+                     use_cache: bool = True, backend: Optional[str] = None) -> List[str]:
+    """Texto limpio de cada página, en orden (para leer el PDF una vez y reutilizarlo)."""
+    return _leer_paginas_limpias(uploaded_file, workers=workers, streaming=streaming, use_cache=use_cache,
+                                 backend=backend)
+
+def seleccionar_paginas_relevantes(paginas: List[str], max_pages: int = 40, max_chars: int = 15000,
+                                   max_tokens: Optional[int] = None) -> Tuple[str, List[int]]:
+    """Páginas ordenadas por puntuación de palabras clave y empaquetadas hasta el presupuesto."""
+    return empaquetar_paginas(paginas, max_pages=max_pages, max_chars=max_chars, max_tokens=max_tokens)
+
+def leer_paginas_relevantes_from_upload(uploaded_file, max_pages: int = 40, max_chars: int = 15000,
+                                        workers: Optional[int] = None, use_cache: bool = True,
+                                        max_tokens: Optional[int] = None) -> Tuple[str, List[int]]:
+    cleaned_texts = _leer_paginas_limpias(uploaded_file, workers=workers, use_cache=use_cache)
+    return seleccionar_paginas_relevantes(cleaned_texts, max_pages=max_pages, max_chars=max_chars,
+                                          max_tokens=max_tokens)
+
+def texto_documento(paginas: List[str]) -> str:
+    """Páginas limpias -> texto completo normalizado (una vez por documento; el resto lo reutiliza)."""
+    return normalizar_documento("\n\n".join(paginas))
+
+def leer_pdf_texto_completo(uploaded_file, workers: Optional[int] = None, streaming: bool = False,
+                            use_cache: bool = True, backend: Optional[str] = None) -> str:
+    cleaned_texts = _leer_paginas_limpias(uploaded_file, workers=workers, streaming=streaming, use_cache=use_cache,
+                                          backend=backend)
+    return texto_documento(cleaned_texts)
@@ -0,0 +1,69 @@
+# core/extraccion/purga.py
+"""
+Motor compilado de purga de cabeceras/pies.
+
+Todas las firmas (genéricas + las del proyecto en config/firmas_pdf.yaml) se funden en una sola
+alternancia compilada, y las líneas repetidas aprendidas del documento se comprueban contra un
+set; cada página se filtra en una única pasada por línea.
+"""
+import os
+import re
+import hashlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+
+import yaml
+
+from core.extraccion.normalizacion import colapsar_espacios, limpiar_caracteres
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+FIRMAS_PATH = Path(os.getenv("EIA_FIRMAS_PDF") or PROJECT_ROOT / "config" / "firmas_pdf.yaml")
+
+
+def cargar_firmas_proyecto(path: Optional[Path] = None) -> List[str]:
+    """Lee la lista `firmas_proyecto` del YAML de configuración (vacía si no existe)."""
+    path = Path(path or FIRMAS_PATH)
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    return [str(p) for p in (cfg.get("firmas_proyecto") or []) if p]
+
+
+def norm_line(s: str) -> str:
+    return colapsar_espacios(limpiar_caracteres(s).strip())
+
+
+class MotorPurga:
+    """Filtra líneas de página contra firmas fijas (una regex) y líneas repetidas (un set)."""
+
+    __slots__ = ("patterns", "rx", "repetidas", "firma")
+
+    def __init__(self, patterns: Iterable[str], repetidas: Optional[Set[str]] = None, _rx=None):
+        self.patterns = list(patterns)
+        self.rx = _rx or re.compile("|".join(f"(?:{p})" for p in self.patterns), re.IGNORECASE)
+        self.repetidas = frozenset(repetidas or ())
+        # Identifica el conjunto de reglas (para las claves de caché)
+        self.firma = hashlib.sha256("\n".join(self.patterns).encode("utf-8")).hexdigest()[:12]
+
+    def con_repetidas(self, repetidas: Set[str]) -> "MotorPurga":
+        """Mismo motor (regex ya compilada) con otro set de líneas repetidas."""
+        return MotorPurga(self.patterns, repetidas, _rx=self.rx)
+
+    def descartar(self, linea_norm: str) -> bool:
+        return linea_norm in self.repetidas or self.rx.search(linea_norm) is not None
+
+    def filtrar_lineas(self, lines: Iterable[str]) -> List[str]:
+        """Líneas ya normalizadas -> las que sobreviven."""
+        return [ln for ln in lines if not self.descartar(ln.strip())]
+
+    def limpiar_pagina(self, txt: str) -> str:
+        """Texto bruto de una página -> texto limpio (normaliza, filtra y une en una pasada)."""
+        if not txt:
+            return ""
+        out = []
+        for raw in txt.replace("\r", "\n").split("\n"):
+            ln = norm_line(raw)
+            if not self.descartar(ln):
+                out.append(ln)
+        return "\n".join(out)
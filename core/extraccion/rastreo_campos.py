@@ -0,0 +1,82 @@
+# core/extraccion/rastreo_campos.py
+"""
+Seguimiento de qué campos y bloques del proyecto ya han aparecido mientras se leen páginas.
+
+Permite cortar la extracción del PDF en cuanto se han localizado todos los datos que
+necesitan `regex_extract_min_fields` y `extraer_bloques_literal` (suelen estar en las
+primeras 20-30 páginas; el resto son planos y anexos).
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.extraccion.regex_extract import regex_extract_min_fields
+from core.extraccion.bloques_textuales import INICIOS_BLOQUE, _quitar_lineas_indice, titulo_inicio
+from core.extraccion.indice_titulos import IndiceTitulos
+
+# Campo -> rutas dentro de la salida de regex_extract_min_fields; basta con que se cumpla una alternativa
+# (cada alternativa es una tupla de rutas que deben estar todas rellenas)
+CAMPOS_REQUERIDOS: Dict[str, List[Tuple[Tuple[str, ...], ...]]] = {
+    "coordenadas": [
+        (("coordenadas", "utm", "x"), ("coordenadas", "utm", "y")),
+        (("coordenadas", "geo", "lat"), ("coordenadas", "geo", "lon")),
+    ],
+    "profundidad": [(("parametros", "profundidad_proyectada_m"),)],
+    "diametro_inicial": [(("parametros", "diametro_perforacion_inicial_mm"),)],
+    "diametro_definitivo": [(("parametros", "diametro_perforacion_definitivo_mm"),)],
+    "caudal_maximo": [(("parametros", "caudal_max_instantaneo_l_s"),)],
+    "potencia": [(("parametros", "potencia_bombeo_kw"),)],
+}
+
+# Páginas que se siguen leyendo tras localizar el último inicio de bloque (el bloque continúa)
+MARGEN_PAGINAS = 2
+# Cola de la página anterior que se pega a la siguiente para no perder datos partidos entre páginas
+_COLA_CHARS = 600
+
+
+def _valor(d: dict, ruta: Tuple[str, ...]):
+    for k in ruta:
+        if not isinstance(d, dict):
+            return None
+        d = d.get(k)
+    return d
+
+
+class RastreadorCampos:
+    """Anota en qué página aparece por primera vez cada campo requerido y cada bloque textual."""
+
+    def __init__(self, campos: Optional[Iterable[str]] = None, bloques: Optional[Iterable[str]] = None,
+                 margen: int = MARGEN_PAGINAS):
+        self.campos = list(campos) if campos is not None else list(CAMPOS_REQUERIDOS)
+        self.bloques = list(bloques) if bloques is not None else list(INICIOS_BLOQUE)
+        self.margen = margen
+        self.localizados: Dict[str, int] = {}
+        self._ultima_pagina = 0
+        self._ultimo_bloque = 0
+        self._cola = ""
+
+    @property
+    def faltan(self) -> List[str]:
+        return [n for n in self.campos + self.bloques if n not in self.localizados]
+
+    @property
+    def completo(self) -> bool:
+        return not self.faltan and self._ultima_pagina - self._ultimo_bloque >= self.margen
+
+    def observar(self, num_pagina: int, texto: str):
+        self._ultima_pagina = num_pagina
+        ventana = f"{self._cola}\n\n{texto}" if self._cola else texto
+        self._cola = texto[-_COLA_CHARS:]
+
+        campos_pend = [c for c in self.campos if c not in self.localizados]
+        if campos_pend:
+            datos = regex_extract_min_fields(ventana)
+            for c in campos_pend:
+                if any(all(_valor(datos, r) not in (None, "") for r in alt) for alt in CAMPOS_REQUERIDOS[c]):
+                    self.localizados[c] = num_pagina
+
+        bloques_pend = [b for b in self.bloques if b not in self.localizados]
+        if bloques_pend:
+            indice = IndiceTitulos(_quitar_lineas_indice(ventana))
+            for b in bloques_pend:
+                if titulo_inicio(indice, b) is not None:
+                    self.localizados[b] = num_pagina
+                    self._ultimo_bloque = num_pagina
@@ -1,6 +1,7 @@
 # core/regex_extract.py
 import re
-from typing import Dict, Any, Optional
+from bisect import bisect_right
+from typing import Dict, Any, List, Optional
 
 # ----------------- Helpers -----------------
 def _to_float_safe(s: str) -> Optional[float]:
@@ -23,13 +24,152 @@ def _to_float_thousands(s: str) -> Optional[float]:
     except Exception:
         return None
 
-# ----------------- Extractor principal -----------------
-def regex_extract_min_fields(text: str) -> Dict[str, Any]:
+# ----------------- Motor de campos -----------------
+# Cada campo: (nombre, patrón completo, grupo con el valor, conversión). Son los mismos patrones que
+# antes se lanzaban uno a uno con re.search; ahora solo se prueban (re.match) donde aparece su ancla.
+_I = re.IGNORECASE
+
+def _strip(s: str) -> str:
+    return (s or "").strip()
+
+def _datum(s: str) -> str:
+    return s.upper().replace(" ", "")
+
+# Nombre propio de lugar: palabras con mayúscula unidas por partículas ("Vega de Tera", "La Bañeza")
+_NOMBRE_PROPIO = (r"([A-ZÁÉÍÓÚÑ][\wáéíóúñ'’\-]*"
+                  r"(?:\s+(?:(?:de|del|la|las|los|el)\s+)*[A-ZÁÉÍÓÚÑ][\wáéíóúñ'’\-]*)*)")
+
+_CAMPOS = {c[0]: c for c in [
+    ("utm_x", re.compile(r'\bX\s*=\s*([\d\.,]+)'), 1, _to_float_thousands),
+    ("utm_y", re.compile(r'\bY\s*=\s*([\d\.,]+)'), 1, _to_float_thousands),
+    ("huso", re.compile(r'\bHuso\s*(\d{1,2})\b', _I), 1, str),
+    ("datum", re.compile(r'(ETRS[- ]?89|ED50|WGS[- ]?84)', _I), 1, _datum),
+    ("lat", re.compile(r"Latitud\s*=\s*([^\n;]+)", _I), 1, _strip),
+    ("lon", re.compile(r"Longitud\s*=\s*([^\n;]+)", _I), 1, _strip),
+    ("profundidad_proyectada_m",
+     re.compile(r'(profundidad\s+(proyectada|prevista)|longitud\s+(del\s+)?sondeo)[\s\S]{0,160}?'
+                r'(\d{1,4}(?:[.,]\d+)?)\s*m(?!m)\b', _I), 4, _to_float_safe),
+    ("diametro_perforacion_definitivo_mm",
+     re.compile(r'definitivo\s+de\s+la\s+entubaci[oó]n[\s\S]{0,240}?ser[aá]\s+de\s+(\d{2,3}(?:[.,]\d+)?)\s*mm', _I),
+     1, _to_float_safe),
+    ("diametro_perforacion_inicial_mm",
+     re.compile(r'di[aá]metro\s+inicial[\s\S]{0,240}?ser[aá]\s+(?:como\s+)?m[ií]nimo\s+de\s+(\d{2,3}(?:[.,]\d+)?)\s*mm', _I),
+     1, _to_float_safe),
+    ("diametro_tuberia_impulsion_mm",
+     re.compile(r'tuber[ií]a\s+de\s+impulsi[oó]n[\s\S]{0,100}?(\d+[.,]?\d*)\s*mm', _I), 1, _to_float_safe),
+    ("caudal_max_instantaneo_l_s",
+     re.compile(r'caudal[^.\n]{0,80}?(m[aá]x(?:imo)?|instant[aá]neo)[^.\n]{0,40}?(\d{1,3}(?:[.,]\d+)?)\s*l/?s', _I),
+     2, _to_float_safe),
+    ("caudal_minimo_l_s",
+     re.compile(r'caudal[^.\n]{0,80}?m[ií]nimo[^.\n]{0,40}?(\d{1,3}(?:[.,]\d+)?)\s*l/?s', _I), 1, _to_float_safe),
+    ("potencia_cv_kw", re.compile(r'(\d+[.,]?\d*)\s*C\.?\s*V\.?\s*\(\s*(\d+[.,]?\d*)\s*kW\s*\)', _I), 2, _to_float_safe),
+    ("potencia_kw", re.compile(r'\b(\d+[.,]?\d*)\s*kW\b', _I), 1, _to_float_safe),
+    ("potencia_cv", re.compile(r'\b(\d+[.,]?\d*)\s*C\.?\s*V\.?\b', _I), 1, _to_float_safe),
+    # Localización: solo candidatos (no rellenan la salida de regex_extract_min_fields; ver confianza.py)
+    ("municipio", re.compile(r'(?i:t[eé]rmino\s+municipal\s+de|municipio\s+de)\s+' + _NOMBRE_PROPIO), 1, _strip),
+    ("provincia", re.compile(r'(?i:provincia\s+de)\s+' + _NOMBRE_PROPIO), 1, _strip),
+    ("poligono", re.compile(r'pol[ií]gono\s*(?:n[º°o]\.?\s*)?(\d{1,4})\b', _I), 1, str),
+    ("parcela", re.compile(r'parcela\s*(?:n[º°o]\.?\s*)?(\d{1,5})\b', _I), 1, str),
+    ("referencia_catastral",
+     re.compile(r'(?i:ref(?:erencia)?\.?\s*catastral)[^\n]{0,40}?\b(\d{5}[0-9A-Z]{13,15})\b'), 1, str),
+]}
+
+# Anclas (en minúsculas, cada una empieza por un literal) -> campos cuyo patrón completo se prueba
+# en esa posición. Las de potencia son la unidad: el número se busca justo antes.
+_ANCLAS = [
+    (r"x\s*=", ["utm_x"]),
+    (r"y\s*=", ["utm_y"]),
+    (r"huso", ["huso"]),
+    (r"etrs", ["datum"]), (r"ed50", ["datum"]), (r"wgs", ["datum"]),
+    (r"latitud\s*=", ["lat"]),
+    (r"longitud\s*=", ["lon"]),
+    (r"longitud\s+(?:del\s+)?sondeo", ["profundidad_proyectada_m"]),
+    (r"profundidad\s+(?:proyectada|prevista)", ["profundidad_proyectada_m"]),
+    (r"definitivo\s+de\s+la\s+entubaci[oó]n", ["diametro_perforacion_definitivo_mm"]),
+    (r"di[aá]metro\s+inicial", ["diametro_perforacion_inicial_mm"]),
+    (r"tuber[ií]a\s+de\s+impulsi[oó]n", ["diametro_tuberia_impulsion_mm"]),
+    (r"caudal", ["caudal_max_instantaneo_l_s", "caudal_minimo_l_s"]),
+    (r"kw", ["potencia_cv_kw", "potencia_kw", "potencia_cv"]),
+    (r"c\.?\s*v", ["potencia_cv_kw", "potencia_kw", "potencia_cv"]),
+    (r"t[eé]rmino\s+municipal\s+de", ["municipio"]),
+    (r"municipio\s+de", ["municipio"]),
+    (r"provincia\s+de", ["provincia"]),
+    (r"pol[ií]gono", ["poligono"]),
+    (r"parcela", ["parcela"]),
+    (r"ref(?:erencia)?\.?\s*catastral", ["referencia_catastral"]),
+]
+_ANCLA_UNIDAD = {"kw", r"c\.?\s*v"}
+_NUM_ANTES = re.compile(r'(\d+[.,]?\d*)\s*$')
+
+# Escáner único: anclas agrupadas por su primer carácter, para que `re` descarte cada posición
+# con una sola comparación (mucho más rápido que una alternancia plana)
+_POR_INICIAL: Dict[str, list] = {}
+for _ancla, _campos in _ANCLAS:
+    _POR_INICIAL.setdefault(_ancla[0], []).append((re.compile(_ancla, _I), _ancla in _ANCLA_UNIDAD, _campos))
+_SCANNER = re.compile("|".join(
+    re.escape(ch) + "(?:" + "|".join(a.pattern[1:] for a, _, _ in anclas) + ")"
+    for ch, anclas in _POR_INICIAL.items()
+))
+_SCANNER_I = re.compile(_SCANNER.pattern, _I)
+
+
+def regex_extract_candidates(text: str, page_starts: Optional[List[int]] = None) -> List[Dict[str, Any]]:
     """
-    Extrae parámetros y coordenadas (genéricas).
-    *Para este flujo* usaremos estas coordenadas como **principal (nuevo)**.
-    La detección de "sondeo existente" se hará fuera (llm_utils y/o una heurística).
+    Recorre el texto UNA vez (todas las anclas en una sola regex) y, en cada ancla, prueba los
+    patrones completos de sus campos. Devuelve TODOS los candidatos en orden de aparición:
+    {"campo", "valor", "inicio", "fin", "pagina", "fragmento"} (pagina es 1-based si se pasan
+    los offsets de página; si no, None). valor es None si el texto casa pero no se convierte.
     """
+    t = text or ""
+    low = t.lower()
+    scanner = _SCANNER
+    if len(low) != len(t):  # algún carácter cambia de longitud al bajar a minúsculas
+        low, scanner = t, _SCANNER_I
+
+    out: List[Dict[str, Any]] = []
+    vistos = set()
+    for a in scanner.finditer(low):
+        pos = a.start()
+        for ancla_rx, es_unidad, campos in _POR_INICIAL[low[pos].lower()]:
+            if not ancla_rx.match(low, pos):
+                continue
+            inicio = pos
+            if es_unidad:
+                n = _NUM_ANTES.search(t, max(0, pos - 32), pos)
+                if not n:
+                    break
+                inicio = n.start()
+            for campo in campos:
+                _, rx, grupo, conv = _CAMPOS[campo]
+                m = rx.match(t, inicio)
+                if not m or (campo, m.start()) in vistos:
+                    continue
+                # Si no se puede convertir se guarda con valor None: como el re.search de
+                # antes, el primer candidato del campo es el que cuenta (ver _primero)
+                vistos.add((campo, m.start()))
+                out.append({
+                    "campo": campo,
+                    "valor": conv(m.group(grupo)),
+                    "inicio": m.start(),
+                    "fin": m.end(),
+                    "pagina": bisect_right(page_starts, m.start()) if page_starts else None,
+                    "fragmento": m.group(0)[:200],
+                })
+            break
+    out.sort(key=lambda c: c["inicio"])
+    return out
+
+
+def _primero(candidatos: List[Dict[str, Any]], campo: str):
+    for c in candidatos:
+        if c["campo"] == campo:
+            return c["valor"]
+    return None
+
+
+# ----------------- Extractor principal -----------------
+def regex_extract_with_candidates(text: str, page_starts: Optional[List[int]] = None):
+    """Como regex_extract_min_fields, pero devuelve también la lista completa de candidatos."""
     out: Dict[str, Any] = {
         "parametros": {
             "superficie_parcela_m2": None,
@@ -54,75 +194,44 @@ def regex_extract_min_fields(text: str) -> Dict[str, Any]:
         }
     }
 
-    t = text or ""
+    cand = regex_extract_candidates(text, page_starts)
+    utm, geo, P = out["coordenadas"]["utm"], out["coordenadas"]["geo"], out["parametros"]
 
     # Coordenadas UTM
-    m = re.search(r'\bX\s*=\s*([\d\.,]+)', t)
-    if m: out["coordenadas"]["utm"]["x"] = _to_float_thousands(m.group(1))
-    m = re.search(r'\bY\s*=\s*([\d\.,]+)', t)
-    if m: out["coordenadas"]["utm"]["y"] = _to_float_thousands(m.group(1))
-    m = re.search(r'\bHuso\s*(\d{1,2})\b', t, re.I)
-    if m: out["coordenadas"]["utm"]["huso"] = m.group(1)
-    m = re.search(r'(ETRS[- ]?89|ED50|WGS[- ]?84)', t, re.I)
-    if m: out["coordenadas"]["utm"]["datum"] = m.group(1).upper().replace(" ", "")
+    utm["x"] = _primero(cand, "utm_x")
+    utm["y"] = _primero(cand, "utm_y")
+    utm["huso"] = _primero(cand, "huso")
+    datum = _primero(cand, "datum")
+    if datum:
+        utm["datum"] = datum
 
     # Geodésicas
-    mlat = re.search(r"Latitud\s*=\s*([^\n;]+)", t, re.I)
-    mlon = re.search(r"Longitud\s*=\s*([^\n;]+)", t, re.I)
-    if mlat: out["coordenadas"]["geo"]["lat"] = (mlat.group(1) or "").strip()
-    if mlon: out["coordenadas"]["geo"]["lon"] = (mlon.group(1) or "").strip()
-
-    # Profundidad
-    m = re.search(
-        r'(profundidad\s+(proyectada|prevista)|longitud\s+(del\s+)?sondeo)[\s\S]{0,160}?'
-        r'(\d{1,4}(?:[.,]\d+)?)\s*m(?!m)\b',
-        t, re.I
-    )
-    if m:
-        out["parametros"]["profundidad_proyectada_m"] = _to_float_safe(m.group(4))
-
-    # Diámetros
-    m_def = re.search(
-        r'definitivo\s+de\s+la\s+entubaci[oó]n[\s\S]{0,240}?ser[aá]\s+de\s+(\d{2,3}(?:[.,]\d+)?)\s*mm',
-        t, re.I
-    )
-    if m_def:
-        out["parametros"]["diametro_perforacion_definitivo_mm"] = _to_float_safe(m_def.group(1))
-
-    m_ini = re.search(
-        r'di[aá]metro\s+inicial[\s\S]{0,240}?ser[aá]\s+(?:como\s+)?m[ií]nimo\s+de\s+(\d{2,3}(?:[.,]\d+)?)\s*mm',
-        t, re.I
-    )
-    if m_ini:
-        out["parametros"]["diametro_perforacion_inicial_mm"] = _to_float_safe(m_ini.group(1))
-
-    # Tubería impulsión
-    m = re.search(r'tuber[ií]a\s+de\s+impulsi[oó]n[\s\S]{0,100}?(\d+[.,]?\d*)\s*mm', t, re.I)
-    if m:
-        out["parametros"]["diametro_tuberia_impulsion_mm"] = _to_float_safe(m.group(1))
-
-    # Caudales
-    m = re.search(r'caudal[^.\n]{0,80}?(m[aá]x(?:imo)?|instant[aá]neo)[^.\n]{0,40}?(\d{1,3}(?:[.,]\d+)?)\s*l/?s', t, re.I)
-    if m:
-        out["parametros"]["caudal_max_instantaneo_l_s"] = _to_float_safe(m.group(2))
-
-    m = re.search(r'caudal[^.\n]{0,80}?m[ií]nimo[^.\n]{0,40}?(\d{1,3}(?:[.,]\d+)?)\s*l/?s', t, re.I)
-    if m:
-        out["parametros"]["caudal_minimo_l_s"] = _to_float_safe(m.group(1))
-
-    # Potencia
-    m_combo = re.search(r'(\d+[.,]?\d*)\s*C\.?\s*V\.?\s*\(\s*(\d+[.,]?\d*)\s*kW\s*\)', t, re.I)
-    if m_combo:
-        out["parametros"]["potencia_bombeo_kw"] = _to_float_safe(m_combo.group(2))
-    else:
-        m_kw = re.search(r'\b(\d+[.,]?\d*)\s*kW\b', t, re.I)
-        if m_kw:
-            out["parametros"]["potencia_bombeo_kw"] = _to_float_safe(m_kw.group(1))
-        else:
-            m_cv = re.search(r'\b(\d+[.,]?\d*)\s*C\.?\s*V\.?\b', t, re.I)
-            if m_cv:
-                cv = _to_float_safe(m_cv.group(1))
-                if cv is not None:
-                    out["parametros"]["potencia_bombeo_kw"] = round(cv * 0.7355, 2)
+    if _primero(cand, "lat") is not None: geo["lat"] = _primero(cand, "lat")
+    if _primero(cand, "lon") is not None: geo["lon"] = _primero(cand, "lon")
 
-    return out
+    # Profundidad, diámetros, tubería y caudales
+    for campo in ("profundidad_proyectada_m", "diametro_perforacion_definitivo_mm",
+                  "diametro_perforacion_inicial_mm", "diametro_tuberia_impulsion_mm",
+                  "caudal_max_instantaneo_l_s", "caudal_minimo_l_s"):
+        P[campo] = _primero(cand, campo)
+
+    # Potencia: "X C.V. (Y kW)" > "Y kW" > "X C.V." convertido
+    kw = _primero(cand, "potencia_cv_kw")
+    if kw is None:
+        kw = _primero(cand, "potencia_kw")
+    if kw is None:
+        cv = _primero(cand, "potencia_cv")
+        if cv is not None:
+            kw = round(cv * 0.7355, 2)
+    P["potencia_bombeo_kw"] = kw
+
+    return out, cand
+
+
+def regex_extract_min_fields(text: str) -> Dict[str, Any]:
+    """
+    Extrae parámetros y coordenadas (genéricas).
+    *Para este flujo* usaremos estas coordenadas como **principal (nuevo)**.
+    La detección de "sondeo existente" se hará fuera (llm_utils y/o una heurística).
+    """
+    return regex_extract_with_candidates(text)[0]
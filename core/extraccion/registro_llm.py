@@ -0,0 +1,221 @@
+# core/extraccion/registro_llm.py
+"""
+Registro por llamada al LLM: modelo, tokens, tiempo, reintentos, caché, coste y quién la hizo.
+
+Cada llamada que pasa por llm_utils se anota (una línea JSON) en el registro del informe en
+curso, junto al JSON de placeholders:
+    outputs/placeholders_XXXX.json
+    outputs/placeholders_XXXX.llm/llamadas.jsonl   <- una línea por llamada (todos los procesos)
+    outputs/placeholders_XXXX.llm/resumen.json     <- agregado por sección, módulo y modelo
+(en carpeta aparte: varios módulos buscan "el *.json más reciente" de outputs/).
+
+El informe en curso se fija con `with informe_llm(json_path):` (ContextVar, vale en hilos de
+asyncio.to_thread); sin informe, las llamadas van a .cache/llm_sin_informe.jsonl.
+Precios (USD por millón de tokens entrada/salida) en PRECIOS, ampliables con
+EIA_LLM_PRECIOS='{"modelo": [entrada, salida]}'.
+
+Resumen de un informe ya generado:
+    python core/extraccion/registro_llm.py outputs/placeholders_XXXX.json
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+ACTIVO = os.getenv("EIA_LLM_REGISTRO", "1") != "0"
+SIN_INFORME = Path(os.getenv("EIA_CACHE_DIR") or PROJECT_ROOT / ".cache") / "llm_sin_informe.jsonl"
+
+# USD por millón de tokens (entrada, salida)
+PRECIOS: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1": (2.00, 8.00),
+    **{m: tuple(p) for m, p in json.loads(os.getenv("EIA_LLM_PRECIOS") or "{}").items()},
+}
+
+# Módulos que no cuentan como "origen" de la llamada
+_INTERNOS = {"llm_utils.py", "registro_llm.py", "limite_llm.py", "contextlib.py", "threading.py"}
+
+_INFORME: contextvars.ContextVar = contextvars.ContextVar("informe_llm", default=None)
+_ESCRITURA_LOCK = threading.Lock()
+
+
+def carpeta_registro(json_path) -> Path:
+    p = Path(json_path)
+    return p.with_name(p.stem + ".llm")
+
+
+@contextmanager
+def informe_llm(json_path):
+    """Anota en el registro de `json_path` las llamadas del bloque y al salir rehace su resumen."""
+    if not json_path:
+        yield
+        return
+    carpeta = carpeta_registro(json_path)
+    token = _INFORME.set(carpeta)
+    try:
+        yield
+    finally:
+        _INFORME.reset(token)
+        if (carpeta / "llamadas.jsonl").exists():
+            escribir_resumen(json_path)
+
+
+def coste_usd(model: str, tokens_prompt: int, tokens_respuesta: int) -> Optional[float]:
+    # "gpt-4.1-mini-2025-04-14" usa el precio de "gpt-4.1-mini"
+    nombre = max((m for m in PRECIOS if model.startswith(m)), key=len, default=None)
+    if nombre is None:
+        return None
+    entrada, salida = PRECIOS[nombre]
+    return round((tokens_prompt * entrada + tokens_respuesta * salida) / 1e6, 6)
+
+
+def modulo_origen() -> str:
+    """Primer módulo de la pila fuera de la capa LLM (p.ej. core.sintesis.alternativas_llm)."""
+    f = sys._getframe(1)
+    while f is not None:
+        fichero = f.f_code.co_filename
+        if Path(fichero).name not in _INTERNOS:
+            nombre = f.f_globals.get("__name__", "")
+            return Path(fichero).stem if nombre == "__main__" else nombre
+        f = f.f_back
+    return "desconocido"
+
+
+def anotar(model: str, prompt: str, seccion: str, *, modulo: Optional[str] = None,
+           tokens_prompt: Optional[int] = None, tokens_respuesta: Optional[int] = None,
+           respuesta: str = "", duracion_s: float = 0.0, espera_cola_s: float = 0.0,
+           reintentos: int = 0, cache: bool = False, error: Optional[str] = None, **extra):
+    """Añade una llamada al registro del informe en curso. Sin `usage` del API, estima tokens."""
+    if not ACTIVO:
+        return
+    if cache:
+        tokens_prompt = tokens_respuesta = 0  # no se factura
+    elif tokens_prompt is None or tokens_respuesta is None:
+        from core.extraccion.relevancia import estimar_tokens
+        tokens_prompt = estimar_tokens(prompt) if tokens_prompt is None else tokens_prompt
+        tokens_respuesta = estimar_tokens(respuesta) if tokens_respuesta is None else tokens_respuesta
+    fila = {
+        "ts": round(time.time(), 3),
+        "pid": os.getpid(),
+        "modelo": model,
+        "seccion": seccion,
+        "modulo": modulo or modulo_origen(),
+        "prompt_sha": hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12],
+        "prompt_chars": len(prompt),
+        "tokens_prompt": tokens_prompt,
+        "tokens_respuesta": tokens_respuesta,
+        "coste_usd": coste_usd(model, tokens_prompt, tokens_respuesta),
+        "duracion_s": round(duracion_s, 3),
+        "espera_cola_s": round(espera_cola_s, 3),
+        "reintentos": reintentos,
+        "cache": cache,
+        "error": error,
+        **extra,
+    }
+    carpeta = _INFORME.get()
+    destino = carpeta / "llamadas.jsonl" if carpeta else SIN_INFORME
+    linea = json.dumps(fila, ensure_ascii=False) + "\n"
+    try:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        # Una sola escritura en modo append: las líneas de varios procesos no se mezclan
+        with _ESCRITURA_LOCK, open(destino, "a", encoding="utf-8") as f:
+            f.write(linea)
+    except OSError as e:
+        print(f"Registro LLM no disponible: {e}")
+
+
+def leer(json_path) -> List[Dict[str, Any]]:
+    fichero = carpeta_registro(json_path) / "llamadas.jsonl"
+    if not fichero.exists():
+        return []
+    filas = []
+    for linea in fichero.read_text(encoding="utf-8").splitlines():
+        try:
+            filas.append(json.loads(linea))
+        except json.JSONDecodeError:
+            continue  # línea a medias de un proceso interrumpido
+    return filas
+
+
+def _sumar(filas: List[Dict[str, Any]]) -> Dict[str, Any]:
+    costes = [f["coste_usd"] for f in filas if f.get("coste_usd") is not None]
+    return {
+        "llamadas": sum(1 for f in filas if not f.get("cache")),
+        "aciertos_cache": sum(1 for f in filas if f.get("cache")),
+        "errores": sum(1 for f in filas if f.get("error")),
+        "reintentos": sum(f.get("reintentos", 0) for f in filas),
+        "respaldos": sum(1 for f in filas if f.get("respaldo")),
+        "tokens_prompt": sum(f.get("tokens_prompt", 0) for f in filas),
+        "tokens_respuesta": sum(f.get("tokens_respuesta", 0) for f in filas),
+        "coste_usd": round(sum(costes), 6),
+        "duracion_s": round(sum(f.get("duracion_s", 0) for f in filas), 2),
+        "espera_cola_s": round(sum(f.get("espera_cola_s", 0) for f in filas), 2),
+    }
+
+
+def resumir(filas: List[Dict[str, Any]], top: int = 5) -> Dict[str, Any]:
+    grupos: Dict[str, Dict[str, list]] = {"por_seccion": defaultdict(list), "por_modulo": defaultdict(list),
+                                          "por_modelo": defaultdict(list)}
+    prompts: Dict[str, list] = defaultdict(list)
+    for f in filas:
+        grupos["por_seccion"][f.get("seccion") or "general"].append(f)
+        grupos["por_modulo"][f.get("modulo") or "desconocido"].append(f)
+        grupos["por_modelo"][f.get("modelo") or "?"].append(f)
+        prompts[f.get("prompt_sha") or "?"].append(f)
+    caros = sorted(prompts.values(), key=lambda fs: (sum(f.get("coste_usd") or 0 for f in fs),
+                                                     sum(f.get("tokens_prompt", 0) for f in fs)), reverse=True)
+    return {
+        "total": _sumar(filas),
+        **{g: {k: _sumar(v) for k, v in sorted(d.items())} for g, d in grupos.items()},
+        # Prompts que más cuestan: candidatos a recortar
+        "prompts_caros": [
+            {"prompt_sha": fs[0].get("prompt_sha"), "modulo": fs[0].get("modulo"), "seccion": fs[0].get("seccion"),
+             "prompt_chars": fs[0].get("prompt_chars"), **_sumar(fs)}
+            for fs in caros[:top] if any(not f.get("cache") for f in fs)
+        ],
+    }
+
+
+def escribir_resumen(json_path) -> Dict[str, Any]:
+    resumen = resumir(leer(json_path))
+    destino = carpeta_registro(json_path) / "resumen.json"
+    try:
+        destino.write_text(json.dumps(resumen, ensure_ascii=False, indent=2), encoding="utf-8")
+    except OSError as e:
+        print(f"Registro LLM no disponible: {e}")
+    return resumen
+
+
+def texto_resumen(resumen: Dict[str, Any]) -> str:
+    t = resumen["total"]
+    return (f"{t['llamadas']} llamadas ({t['aciertos_cache']} de caché), "
+            f"{t['tokens_prompt']} + {t['tokens_respuesta']} tokens, {t['coste_usd']:.4f} USD, "
+            f"{t['duracion_s']:.1f} s, {t['reintentos']} reintentos")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python core/extraccion/registro_llm.py <placeholders.json>")
+        sys.exit(1)
+    res = escribir_resumen(sys.argv[1])
+    print("Total:", texto_resumen(res))
+    for seccion, t in res["por_seccion"].items():
+        print(f"  {seccion:24s} {t['llamadas']:3d} llamadas  {t['tokens_prompt']:7d} tok entrada  "
+              f"{t['coste_usd']:.4f} USD  {t['duracion_s']:6.1f} s")
+    for p in res["prompts_caros"]:
+        print(f"  caro: {p['modulo']} ({p['seccion']}) {p['prompt_chars']} caracteres -> "
+              f"{p['tokens_prompt']} tok, {p['coste_usd']:.4f} USD")
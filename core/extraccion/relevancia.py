@@ -0,0 +1,109 @@
+# core/extraccion/relevancia.py
+"""
+Puntuación de páginas por palabras clave en una sola pasada.
+
+Las palabras clave se compilan una vez (al importar) en una única expresión regular con forma
+de trie —equivalente al autómata de Aho–Corasick, pero recorrida por el motor de `re` en C—,
+de modo que cada página se baja a minúsculas una vez y se recorre una sola vez.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Peso de cada palabra clave: 3 = dato que buscamos, 2 = apartado técnico, 1 = contexto general
+KEYWORD_WEIGHTS: Dict[str, int] = {
+    "Objeto": 1, "Resumen": 1, "Localización": 2, "Situación": 2, "Emplazamiento": 2,
+    "Coordenadas": 3, "UTM": 3, "Geodésicas": 3,
+    "Polígono": 3, "Parcela": 3, "Referencia catastral": 3, "Uso previsto": 3, "abastecimiento": 2, "riego": 2,
+    "Profundidad": 3, "Longitud": 2, "Caudal": 2, "Instalaciones": 1, "bomba": 2, "perforación": 2, "tubería": 2,
+    "filtros": 1, "instalación eléctrica": 2, "características del sondeo": 3, "diámetro": 3, "entubación": 2,
+    "impulsión": 2, "C.V.": 2, "kW": 2, "caudal máximo": 3, "máximo instantáneo": 3, "QMi": 3, "Q M i": 3,
+    "Qmax": 3, "Q máx": 3, "Caudal necesario": 3, "Geología": 2, "Hidrogeología": 2, "acuífero": 2,
+    "Nivel freático": 2, "permeabilidad": 1, "porosidad": 1, "vulnerabilidad": 1, "Alternativas": 2,
+    "Justificación": 1, "Valoración": 1, "Comparativa": 1,
+}
+
+# A partir de aquí repetir la misma palabra en una página apenas suma
+_SATURACION = 4
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    trie: Dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def _node(n: Dict) -> str:
+        final = "" in n
+        branches = [re.escape(ch) + _node(child) for ch, child in sorted(n.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if final else body
+
+    return _node(trie)
+
+
+_WEIGHTS_LOWER = {k.lower(): w for k, w in KEYWORD_WEIGHTS.items()}
+_KEYWORDS_RX = re.compile(_trie_regex(_WEIGHTS_LOWER))
+
+
+def contar_palabras_clave(texto: str) -> Counter:
+    """Nº de apariciones (sin solapes, la más larga gana) de cada palabra clave en minúsculas."""
+    return Counter(m.group(0) for m in _KEYWORDS_RX.finditer(texto.lower()))
+
+
+def puntuar_pagina(texto: str) -> float:
+    score = 0.0
+    for kw, n in contar_palabras_clave(texto).items():
+        score += _WEIGHTS_LOWER.get(kw, 0) * (1 + math.log(min(n, _SATURACION)))
+    return score
+
+
+def estimar_tokens(texto: str) -> int:
+    """Tokens según tiktoken si está instalado; si no, ~4 caracteres por token."""
+    try:
+        import tiktoken
+        return len(tiktoken.get_encoding("cl100k_base").encode(texto))
+    except Exception:
+        return (len(texto) + 3) // 4
+
+
+def empaquetar_paginas(paginas: List[str], max_pages: int = 40, max_chars: Optional[int] = 15000,
+                       max_tokens: Optional[int] = None) -> Tuple[str, List[int]]:
+    """
+    Ordena las páginas por relevancia y mete las mejores hasta agotar el presupuesto
+    (caracteres y/o tokens), devolviéndolas en orden de documento.
+    Si ninguna página puntúa, se usan las `max_pages` primeras.
+    Devuelve (texto, nº de página usadas).
+    """
+    sep = "\n\n"
+    scored = [(puntuar_pagina(t), i) for i, t in enumerate(paginas) if t.strip()]
+    ranked = [i for s, i in sorted(scored, key=lambda x: (-x[0], x[1])) if s > 0]
+    if not ranked:
+        ranked = [i for _, i in scored][:max_pages]
+
+    elegidas: List[int] = []
+    chars = tokens = 0
+    for i in ranked:
+        t = paginas[i]
+        c = len(t) + (len(sep) if elegidas else 0)
+        k = estimar_tokens(t) if max_tokens else 0
+        if (max_chars and chars + c > max_chars) or (max_tokens and tokens + k > max_tokens):
+            continue  # no cabe entera; puede que quepa otra más corta
+        elegidas.append(i)
+        chars, tokens = chars + c, tokens + k
+
+    if not elegidas and ranked:
+        # Ni la mejor página cabe entera: se recorta solo esa
+        i = ranked[0]
+        t = paginas[i][:max_chars] if max_chars else paginas[i]
+        if max_tokens:
+            t = t[:max_tokens * 4]
+        return t, [i + 1]
+
+    elegidas.sort()
+    return sep.join(paginas[i] for i in elegidas), [i + 1 for i in elegidas]
@@ -0,0 +1,176 @@
+# core/extraccion/respaldo_llm.py
+"""
+Peticiones de respaldo (hedging) para las llamadas al LLM que se eternizan.
+
+Si una llamada supera el p95 de latencia observado para su familia (nombre del esquema o
+sección, y modelo), se lanza una copia y gana la primera que termine. La otra sigue hasta
+acabar en segundo plano (no se puede cortar a medias) y su resultado se descarta.
+
+Es opcional (EIA_LLM_RESPALDO=1) y tiene presupuesto: como mucho EIA_LLM_RESPALDO_PRESUPUESTO
+copias por llamada normal (0.1 = un 10 % más de llamadas). Hasta tener EIA_LLM_RESPALDO_MIN_MUESTRAS
+latencias de una familia se usa EIA_LLM_RESPALDO_UMBRAL_S como umbral, y nunca se lanza
+antes de EIA_LLM_RESPALDO_MIN_S. El historial de latencias se guarda en SQLite, compartido
+por todos los procesos, y se alimenta aunque el modo esté desactivado (al activarlo ya hay p95).
+Solo se aplica a llamadas sin streaming: en streaming ya se ve el texto según llega.
+
+Estadísticas: estadisticas() / resumen() (disparos, cuántos ganó la copia, tiempo ahorrado).
+"""
+import os
+import sys
+import time
+import sqlite3
+import threading
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, TypeVar
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+DB_PATH = Path(os.getenv("EIA_CACHE_DIR") or PROJECT_ROOT / ".cache") / "latencias.sqlite"
+ACTIVO = os.getenv("EIA_LLM_RESPALDO", "0") == "1"
+PERCENTIL = float(os.getenv("EIA_LLM_RESPALDO_PERCENTIL") or 0.95)
+PRESUPUESTO = float(os.getenv("EIA_LLM_RESPALDO_PRESUPUESTO") or 0.1)
+MIN_MUESTRAS = int(os.getenv("EIA_LLM_RESPALDO_MIN_MUESTRAS") or 20)
+UMBRAL_DEFECTO_S = float(os.getenv("EIA_LLM_RESPALDO_UMBRAL_S") or 30)
+MIN_UMBRAL_S = float(os.getenv("EIA_LLM_RESPALDO_MIN_S") or 2)
+# Latencias que se conservan por familia
+VENTANA = 200
+
+_ESTADISTICAS = {"llamadas": 0, "disparos": 0, "ganados": 0, "sin_presupuesto": 0, "ahorro_s": 0.0}
+_LOCK = threading.Lock()
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("EIA_LLM_RESPALDO_HILOS") or 8),
+                           thread_name_prefix="respaldo_llm")
+
+T = TypeVar("T")
+
+
+@contextmanager
+def _conectar():
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("CREATE TABLE IF NOT EXISTS latencias (familia TEXT, ts REAL, duracion_s REAL)")
+        con.execute("CREATE INDEX IF NOT EXISTS latencias_familia ON latencias (familia, ts)")
+        with con:
+            yield con
+    finally:
+        con.close()
+
+
+def registrar_latencia(familia: str, duracion_s: float):
+    try:
+        with _conectar() as con:
+            con.execute("INSERT INTO latencias VALUES (?, ?, ?)", (familia, time.time(), duracion_s))
+            con.execute(
+                "DELETE FROM latencias WHERE familia = ? AND ts < ("
+                " SELECT ts FROM latencias WHERE familia = ? ORDER BY ts DESC LIMIT 1 OFFSET ?)",
+                (familia, familia, VENTANA - 1),
+            )
+    except sqlite3.Error:
+        pass
+
+
+def umbral(familia: str) -> float:
+    """Segundos a partir de los cuales se lanza la copia: p95 de la familia (o el de defecto)."""
+    try:
+        with _conectar() as con:
+            lat = [r[0] for r in con.execute(
+                "SELECT duracion_s FROM latencias WHERE familia = ? ORDER BY ts DESC LIMIT ?",
+                (familia, VENTANA))]
+    except sqlite3.Error:
+        lat = []
+    if len(lat) < MIN_MUESTRAS:
+        return UMBRAL_DEFECTO_S
+    lat.sort()
+    return max(MIN_UMBRAL_S, lat[min(len(lat) - 1, int(PERCENTIL * len(lat)))])
+
+
+def _con_presupuesto() -> bool:
+    with _LOCK:
+        if _ESTADISTICAS["disparos"] + 1 > PRESUPUESTO * _ESTADISTICAS["llamadas"] + 1:
+            _ESTADISTICAS["sin_presupuesto"] += 1
+            return False
+        _ESTADISTICAS["disparos"] += 1
+        return True
+
+
+def _lanzar(llamada: Callable[[bool], T], familia: str, es_respaldo: bool,
+            empezada: Optional[threading.Event] = None) -> "Future[T]":
+    ctx = contextvars.copy_context()  # sección e informe del registro viajan con la copia
+
+    def medir():
+        t0 = time.perf_counter()
+        if empezada is not None:
+            empezada.set()
+        res = llamada(es_respaldo)
+        registrar_latencia(familia, time.perf_counter() - t0)
+        return res
+
+    return _POOL.submit(ctx.run, medir)
+
+
+def ejecutar(familia: str, llamada: Callable[[bool], T]) -> T:
+    """
+    Ejecuta `llamada(es_respaldo)` y, si tarda más que el umbral de su familia (y queda
+    presupuesto), lanza `llamada(True)` en paralelo. Devuelve el primer resultado correcto.
+    """
+    if not ACTIVO:
+        t0 = time.perf_counter()
+        res = llamada(False)
+        registrar_latencia(familia, time.perf_counter() - t0)
+        return res
+
+    with _LOCK:
+        _ESTADISTICAS["llamadas"] += 1
+    empezada = threading.Event()
+    principal = _lanzar(llamada, familia, False, empezada)
+    limite = umbral(familia)
+    # El umbral cuenta desde que la llamada arranca: lo que espera en la cola del pool
+    # (compartido) no es latencia del modelo y una copia no lo acortaría
+    empezada.wait()
+    hecho, _ = wait([principal], timeout=limite)
+    if hecho or not _con_presupuesto():
+        return principal.result()
+
+    copia = _lanzar(llamada, familia, True)
+    pendientes: List[Future] = [principal, copia]
+    error: Optional[BaseException] = None
+    while pendientes:
+        hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+        for fut in hechos:
+            pendientes.remove(fut)
+            if fut.exception() is not None:
+                error = fut.exception()
+                continue
+            if fut is copia:
+                t_fin = time.perf_counter()
+                with _LOCK:
+                    _ESTADISTICAS["ganados"] += 1
+                # Ahorro = lo que la principal tardó de más, medido cuando por fin acaba
+                principal.add_done_callback(
+                    lambda f: f.exception() is None and _sumar_ahorro(time.perf_counter() - t_fin))
+            return fut.result()
+    raise error
+
+
+def _sumar_ahorro(segundos: float):
+    with _LOCK:
+        _ESTADISTICAS["ahorro_s"] += segundos
+
+
+def estadisticas() -> Dict[str, float]:
+    with _LOCK:
+        return dict(_ESTADISTICAS)
+
+
+def resumen() -> str:
+    e = estadisticas()
+    if not ACTIVO:
+        return "respaldo LLM: desactivado"
+    return (f"respaldo LLM: {e['disparos']} copias en {e['llamadas']} llamadas, ganaron {e['ganados']} "
+            f"(ahorro {e['ahorro_s']:.1f} s), {e['sin_presupuesto']} sin presupuesto")
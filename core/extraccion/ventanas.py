@@ -0,0 +1,150 @@
+# core/extraccion/ventanas.py
+"""
+Ventanas de anclaje para prompts de extracción pequeños.
+
+En lugar de mandar al LLM todo el texto relevante, se buscan con regex baratas los puntos
+donde aparece cada grupo de campos (localización, caudales, uso, particularidades) y se envían
+solo unos cientos de caracteres alrededor de cada uno, agrupados y dentro de un presupuesto
+de tokens. Los candidatos del motor regex (regex_extract_candidates) también sirven de ancla.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from core.extraccion.regex_extract import regex_extract_candidates
+from core.extraccion.relevancia import estimar_tokens
+
+# Presupuesto total de las ventanas
+VENTANAS_MAX_TOKENS = int(os.getenv("EIA_VENTANAS_MAX_TOKENS") or 1500)
+# Caracteres antes/después de cada ancla
+VENTANA_ANTES = 200
+VENTANA_DESPUES = 350
+# Anclas seguidas se funden en una ventana, pero sin pasar de esta longitud
+VENTANA_MAX_CHARS = 900
+
+# Grupo -> (palabras clave, campos del motor regex que anclan el grupo)
+GRUPOS: Dict[str, Tuple[str, List[str]]] = {
+    "localizacion": (
+        r"t[eé]rmino\s+municipal|municipio|provincia|pol[ií]gono|parcela|ref(?:erencia)?\.?\s*catastral|paraje",
+        ["municipio", "provincia", "poligono", "parcela", "referencia_catastral"],
+    ),
+    "caudales": (
+        r"caudal\s+m[aá]x|m[aá]ximo\s+instant[aá]neo|q\s*m\s*i\b|qm[aá]x|q\s*m[aá]x|caudal\s+m[ií]nimo|qm[ií]n",
+        ["caudal_max_instantaneo_l_s", "caudal_minimo_l_s"],
+    ),
+    "uso": (
+        r"uso\s+previsto|destinad[oa]\s+a|abastecimiento|riego|finalidad|necesidades\s+h[ií]dricas",
+        [],
+    ),
+    "particularidades": (
+        r"sondeo\s+existente|sondeos?\s+previstos?|pozo\s+existente|n[uú]mero\s+de\s+sondeos",
+        [],
+    ),
+}
+_GRUPOS_RX = {g: re.compile(p, re.IGNORECASE) for g, (p, _) in GRUPOS.items()}
+
+# Ruta del JSON del LLM -> grupo de ventanas que la resuelve
+GRUPO_DE_CAMPO = {
+    "localizacion": "localizacion",
+    "parametros.caudal_max_instantaneo_l_s": "caudales",
+    "parametros.caudal_minimo_l_s": "caudales",
+    "parametros.uso_previsto": "uso",
+    "parametros.detalles_de_uso": "uso",
+    "particularidades": "particularidades",
+    "id": "localizacion",
+}
+
+
+def grupos_para(campos: Optional[List[str]] = None) -> List[str]:
+    """Grupos de ventanas necesarios para las rutas pedidas (todos si no se indican)."""
+    if not campos:
+        return list(GRUPOS)
+    out = []
+    for c in campos:
+        g = GRUPO_DE_CAMPO.get(c) or GRUPO_DE_CAMPO.get(c.split(".", 1)[0])
+        if g and g not in out:
+            out.append(g)
+    return out
+
+
+def _unir(intervalos: List[Tuple[int, int]], max_chars: int = VENTANA_MAX_CHARS) -> List[Tuple[int, int]]:
+    out: List[Tuple[int, int]] = []
+    for a, b in sorted(intervalos):
+        if out and a <= out[-1][1]:
+            if b - out[-1][0] <= max_chars:
+                out[-1] = (out[-1][0], max(out[-1][1], b))
+            elif b > out[-1][1]:
+                out.append((out[-1][1], b))  # sigue donde acabó la anterior, sin solapar
+        else:
+            out.append((a, b))
+    return out
+
+
+def _solape(a: int, b: int, tomados: List[Tuple[int, int]]) -> int:
+    return sum(max(0, min(b, y) - max(a, x)) for x, y in tomados)
+
+
+def ventanas_por_grupo(texto: str, grupos: Optional[List[str]] = None) -> Dict[str, List[Tuple[int, int]]]:
+    """Grupo -> intervalos (inicio, fin) de texto alrededor de sus anclas, ya fusionados."""
+    t = texto or ""
+    grupos = grupos or list(GRUPOS)
+    candidatos = regex_extract_candidates(t)
+    out = {}
+    for g in grupos:
+        anclas = [m.start() for m in _GRUPOS_RX[g].finditer(t)]
+        anclas += [c["inicio"] for c in candidatos if c["campo"] in GRUPOS[g][1]]
+        out[g] = _unir([(max(0, a - VENTANA_ANTES), min(len(t), a + VENTANA_DESPUES)) for a in anclas])
+    return out
+
+
+def _recortar(fragmento: str) -> str:
+    # Empieza y acaba en límite de palabra y sin espacios repetidos
+    fragmento = re.sub(r"^\S*\s", "", fragmento, count=1)
+    fragmento = re.sub(r"\s\S*$", "", fragmento, count=1)
+    return re.sub(r"[ \t]*\n[ \t\n]*", "\n", fragmento).strip()
+
+
+def componer_ventanas(texto: str, campos: Optional[List[str]] = None,
+                      max_tokens: int = VENTANAS_MAX_TOKENS) -> Tuple[str, Dict]:
+    """
+    Texto compacto con las ventanas de los grupos que necesitan `campos` y el informe de ahorro.
+    Las ventanas se reparten por turnos entre grupos (la 1ª de cada grupo, luego la 2ª...) hasta
+    agotar el presupuesto, para que ningún grupo se quede sin contexto.
+    Devuelve ("", informe) si no hay ninguna ancla.
+    """
+    t = texto or ""
+    grupos = grupos_para(campos)
+    por_grupo = ventanas_por_grupo(t, grupos)
+
+    elegidas: Dict[str, List[str]] = {g: [] for g in grupos}
+    tomados: List[Tuple[int, int]] = []
+    usados, ronda = 0, 0
+    pendientes = True
+    while pendientes:
+        pendientes = False
+        for g in grupos:
+            if ronda >= len(por_grupo[g]):
+                continue
+            pendientes = True
+            a, b = por_grupo[g][ronda]
+            if _solape(a, b, tomados) * 2 > b - a:
+                continue  # ya enviada casi entera por otro grupo
+            frag = _recortar(t[a:b])
+            coste = estimar_tokens(frag)
+            if frag and usados + coste <= max_tokens:
+                elegidas[g].append(frag)
+                tomados.append((a, b))
+                usados += coste
+        ronda += 1
+
+    partes = [f"[{g.upper()}]\n" + "\n…\n".join(frags) for g, frags in elegidas.items() if frags]
+    compacto = "\n\n".join(partes)
+    tokens_texto = estimar_tokens(t)
+    tokens_ventanas = estimar_tokens(compacto) if compacto else 0
+    informe = {
+        "grupos": {g: len(frags) for g, frags in elegidas.items()},
+        "tokens_texto": tokens_texto,
+        "tokens_ventanas": tokens_ventanas,
+        "ahorro_pct": round(100 * (1 - tokens_ventanas / tokens_texto), 1) if tokens_texto and compacto else 0.0,
+    }
+    return compacto, informe
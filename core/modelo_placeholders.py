@@ -0,0 +1,125 @@
+# core/modelo_placeholders.py
+"""
+JSON de placeholders del informe (outputs/placeholders_XXXX.json).
+
+Lleva los placeholders de la plantilla (texto ya formateado), los datos extraídos (LLM +
+regex) anidados por sección ("parametros": {...}), el origen de cada valor ("bloques",
+"regex", "llm", "ia:<sección>") y las claves que añaden las etapas posteriores
+(estado_red_natura, catastro_info, secciones_llm...).
+
+Las claves con punto que usa la plantilla ("parametros.profundidad_proyectada_m") no se
+guardan copiadas: salen de vista_plana(). Los datos extraídos se guardan siempre enteros,
+aparte del texto de los placeholders, que el usuario puede editar. El JSON se escribe
+compacto y de una vez (guardar_json, escritura atómica); cargar_json lee también los JSON
+antiguos, con las claves con punto duplicadas, y las pliega en sus secciones (anidar).
+
+Las etapas se pasan el JSON como dict: son scripts separados que añaden claves propias y lo
+leen con operaciones de dict (get anidado, {**data}, st.json), así que no hay un modelo tipado.
+"""
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Tuple
+
+# Secciones de los datos extraídos: se guardan anidadas, una vez
+SECCIONES_DATOS = ("id", "localizacion", "parametros", "particularidades", "coordenadas", "flags",
+                   "extraccion_llm")
+CLAVE_ORIGEN = "origen"
+# Placeholder -> dato(s) de los que sale (build_global_json lo usa para anotar el origen)
+FUENTES: Dict[str, Tuple[str, ...]] = {
+    "utm_x_principal": ("coordenadas.utm.x", "coordenadas.x"),
+    "utm_y_principal": ("coordenadas.utm.y", "coordenadas.y"),
+    "utm_huso_principal": ("coordenadas.utm.huso", "coordenadas.huso"),
+    "geo_lat_principal": ("coordenadas.geo.lat", "coordenadas.lat"),
+    "geo_lon_principal": ("coordenadas.geo.lon", "coordenadas.lon"),
+    "municipio": ("localizacion.municipio",),
+    "provincia": ("localizacion.provincia",),
+    "profundidad": ("parametros.profundidad", "parametros.profundidad_proyectada_m"),
+    "diametro_inicial": ("parametros.diametro_inicial",),
+    "diametro_perforacion_inicial_mm": ("parametros.diametro_perforacion_inicial_mm",),
+    "caudal_max_instantaneo_l_s": ("parametros.caudal_max_instantaneo_l_s",),
+    "instalacion_electrica": ("parametros.instalacion_electrica",),
+    "potencia_bombeo_kw": ("parametros.potencia_bombeo_kw",),
+    "aviso_existente": ("flags.hay_sondeo_existente",),
+}
+
+
+def _aplanar(d: Dict[str, Any], prefijo: str, out: Dict[str, Any]):
+    for k, v in d.items():
+        clave = f"{prefijo}.{k}"
+        if isinstance(v, dict):
+            _aplanar(v, clave, out)
+        else:
+            out[clave] = v
+
+
+def vista_plana(data: Dict[str, Any], secciones: Iterable[str] = SECCIONES_DATOS) -> Dict[str, Any]:
+    """
+    Vista (no se guarda) con las claves con punto de las secciones anidadas, como las que
+    pide la plantilla; las secciones anidadas en sí no aparecen.
+    """
+    out = {}
+    for k, v in data.items():
+        if k in secciones and isinstance(v, dict):
+            _aplanar(v, k, out)
+        elif k != CLAVE_ORIGEN:
+            out[k] = v
+    return out
+
+
+def anidar(data: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON antiguo: pliega las claves con punto ("localizacion.municipio") en su sección anidada."""
+    if not any("." in k and k.split(".", 1)[0] in SECCIONES_DATOS for k in data):
+        return data
+    out: Dict[str, Any] = {}
+    for k, v in data.items():
+        seccion = k.split(".", 1)[0]
+        if "." not in k or seccion not in SECCIONES_DATOS:
+            out[k] = v
+            continue
+        nodo = out.setdefault(seccion, {})
+        *ruta, hoja = k.split(".")[1:]
+        for parte in ruta:
+            nodo = nodo.setdefault(parte, {})
+        nodo[hoja] = v
+    return out
+
+
+def cargar_json(path) -> Dict[str, Any]:
+    """
+    JSON de placeholders como dict, con los datos anidados y completos (aunque el fichero sea
+    del formato antiguo, con claves con punto).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return anidar(json.load(f))
+
+
+def guardar_json(path, data: Dict[str, Any]) -> Path:
+    """
+    Escribe el JSON compacto (sin separadores de más) y de una vez: fichero temporal en la misma carpeta + os.replace,
+    para que otra etapa que lo lea a la vez nunca vea un JSON a medias.
+    """
+    path = Path(path)
+    if path.parent != Path(""):
+        path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+def actualizar_json(path, cambios: Dict[str, Any]) -> Dict[str, Any]:
+    """Lee, aplica `cambios` y guarda (una lectura y una escritura). Devuelve el JSON resultante."""
+    data = cargar_json(path)
+    data.update(cambios)
+    guardar_json(path, data)
+    return data
@@ -1,7 +1,7 @@
 # core/sintesis/alternativas_llm.py
 import json
 
-from core.extraccion.llm_utils import get_client
+from core.extraccion.llm_utils import llm_chat_json, esquema_desde_prompt, ErrorEsquema
 
 
 def redactar_alternativas_struct(datos_min: dict,
@@ -11,12 +11,10 @@ def redactar_alternativas_struct(datos_min: dict,
                                  min_just_chars: int = 300,
                                  max_retries: int = 3) -> dict:
     """
-    Genera Alternativas (cap. 3) con IA, validando JSON y longitud mínima.
-    Reintenta y hace una pasada de 'mejora' si queda corto.
+    Genera Alternativas (cap. 3) con IA, con salida estructurada y longitud mínima validada.
+    Si queda corto, el reintento pide ampliar los campos que no llegan.
     Devuelve SIEMPRE las 3 claves: desc_md, val, just.
     """
-    client = get_client()
-
     p   = (datos_min.get("parametros") or {})
     loc = (datos_min.get("localizacion") or {})
 
@@ -54,82 +52,26 @@ Estilo: español (España), formal, técnico-administrativo, sin florituras ni c
 No escribas nada fuera del JSON. Pon saltos de parrafo reales (\n) para que se vean en Word, todos los necesarios.
 """.strip()
 
-    def _safe_json(s: str) -> dict:
-        try:
-            return json.loads(s)
-        except json.JSONDecodeError:
-            b, e = s.find("{"), s.rfind("}")
-            if b != -1 and e != -1 and e > b:
-                return json.loads(s[b:e+1])
-            return {"desc_md":"", "val":"", "just":""}
-
-    def _ok_len(x: str, n: int) -> bool:
-        return bool(x) and len(x.strip()) >= n
+    # Mismo esquema que el prompt, con las longitudes mínimas (solo se validan en local)
+    esquema = esquema_desde_prompt(schema)
+    for campo, minimo in (("desc_md", min_desc_chars), ("val", min_val_chars), ("just", min_just_chars)):
+        esquema["properties"][campo]["minLength"] = minimo
 
-    best = {"desc_md":"", "val":"", "just":""}
     last_err = None
-
-    for _ in range(max_retries):
-        try:
-            resp = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": base_prompt}],
-                temperature=0.3,
-            )
-            raw = (resp.choices[0].message.content or "").strip()
-            data = _safe_json(raw)
-        except Exception as e:
-            last_err = str(e)
-            continue
-
-        desc = (data.get("desc_md") or "").strip()
-        val  = (data.get("val") or "").strip()
-        just = (data.get("just") or "").strip()
-
-        if _ok_len(desc, min_desc_chars) and _ok_len(val, min_val_chars) and _ok_len(just, min_just_chars):
-            return {"desc_md": desc, "val": val, "just": just}
-
-        if len(desc) + len(val) + len(just) > len(best["desc_md"]) + len(best["val"]) + len(best["just"]):
-            best = {"desc_md": desc, "val": val, "just": just}
-
-        need = []
-        if not _ok_len(desc, min_desc_chars): need.append("desc_md")
-        if not _ok_len(val,  min_val_chars):  need.append("val")
-        if not _ok_len(just, min_just_chars): need.append("just")
-
-        improve_prompt = f"""
-Mejora este JSON de alternativas para un EIA (sin cambiar claves ni estructura).
-Amplía y concreta con foco en el USO PREVISTO: {uso}.
-Campos a ampliar: {", ".join(need)}.
-Responde SOLO con JSON.
-
-JSON actual:
-{json.dumps({"desc_md": desc, "val": val, "just": just}, ensure_ascii=False)}
-""".strip()
-
-        try:
-            resp2 = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "user", "content": improve_prompt}],
-                temperature=0.2,
-            )
-            raw2 = (resp2.choices[0].message.content or "").strip()
-            data2 = _safe_json(raw2)
-            desc2 = (data2.get("desc_md") or desc).strip()
-            val2  = (data2.get("val")     or val).strip()
-            just2 = (data2.get("just")    or just).strip()
-            if _ok_len(desc2, min_desc_chars) and _ok_len(val2, min_val_chars) and _ok_len(just2, min_just_chars):
-                return {"desc_md": desc2, "val": val2, "just": just2}
-            if len(desc2) + len(val2) + len(just2) > len(best["desc_md"]) + len(best["val"]) + len(best["just"]):
-                best = {"desc_md": desc2, "val": val2, "just": just2}
-        except Exception as e:
-            last_err = str(e)
-            continue
+    try:
+        # Reintenta solo si la respuesta viola el esquema (p.ej. un apartado demasiado corto),
+        # diciéndole al modelo qué ampliar
+        data = llm_chat_json(base_prompt, esquema, model=model, temperature=0.3,
+                             nombre="alternativas", max_intentos=max_retries)
+    except ErrorEsquema as e:
+        data, last_err = (e.datos or {}), str(e)
+    except Exception as e:
+        data, last_err = {}, str(e)
 
     out = {
-        "desc_md": best["desc_md"].strip(),
-        "val":     best["val"].strip(),
-        "just":    best["just"].strip(),
+        "desc_md": (data.get("desc_md") or "").strip(),
+        "val":     (data.get("val") or "").strip(),
+        "just":    (data.get("just") or "").strip(),
     }
     if last_err:
         out["_error"] = last_err
@@ -137,10 +79,18 @@ JSON actual:
 
 
 def generar_alternativas_llm(datos_min: dict) -> dict:
-    """Devuelve los 3 placeholders listos para DOCX."""
+    """
+    Devuelve los 3 placeholders listos para DOCX. Si el modelo no devuelve nada utilizable lanza
+    RuntimeError; si devuelve algo pero con error (p.ej. apartados cortos), lo indica en "_error".
+    """
     s = redactar_alternativas_struct(datos_min)
-    return {
+    out = {
         "PH_Alternativas_Desc": (s.get("desc_md") or "").strip(),
         "PH_Alternativas_Val":  (s.get("val") or "").strip(),
         "PH_Alternativas_Just": (s.get("just") or "").strip(),
     }
+    if s.get("_error"):
+        if not any(out.values()):
+            raise RuntimeError(f"Alternativas sin contenido: {s['_error']}")
+        out["_error"] = s["_error"]
+    return out
@@ -236,7 +236,7 @@
 # if __name__ == "__main__":
 #     main()
 
-import sys, time, json
+import sys, time
 from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -245,6 +245,12 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from PIL import Image
 
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.modelo_placeholders import actualizar_json, cargar_json
+
 
 def step(msg):
     print(f"UA_STEP: {msg}", flush=True)
@@ -291,7 +297,7 @@ def main():
         print(f"❌ No existe JSON: {json_path}", flush=True)
         sys.exit(1)
 
-    data = json.loads(json_path.read_text(encoding="utf-8"))
+    data = cargar_json(json_path)
     utm_x = str(data.get("utm_x_principal", "")).replace(",", ".")
     utm_y = str(data.get("utm_y_principal", "")).replace(",", ".")
     step(f"Coordenadas UTM => X={utm_x}, Y={utm_y}")
@@ -437,8 +443,7 @@ def main():
         done(out_path)
 
         # === 7. Actualizar JSON ===
-        data["captura_usos_actuales"] = str(out_path)
-        json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        actualizar_json(json_path, {"captura_usos_actuales": str(out_path)})
         step("JSON actualizado con la ruta de la captura.")
 
     except Exception as e:
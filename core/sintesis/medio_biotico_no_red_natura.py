@@ -1,13 +1,16 @@
-import json
 import sys
 from pathlib import Path
+from typing import Callable, Dict, Optional
 
 # --- Asegurar que la raíz del proyecto está en sys.path ---
 PROJECT_ROOT = Path(__file__).resolve().parents[2]  # dos niveles arriba desde core/sintesis
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
-from core.extraccion.llm_utils import call_llm_extract_json
+from core.extraccion import llm_cache
+from core.extraccion.llm_utils import llm_chat_json, esquema_desde_prompt, ErrorEsquema, resumen_llamadas
+from core.extraccion.registro_llm import informe_llm
+from core.modelo_placeholders import cargar_json, guardar_json
 
 def step(msg: str):
     print(f"MB_STEP: {msg}", flush=True)
@@ -15,32 +18,13 @@ def step(msg: str):
 def warn(msg: str):
     print(f"MB_WARN: {msg}", flush=True)
 
-# 1. Verificar argumento de entrada
-if len(sys.argv) < 2:
-    print("Uso: python medio_biotico_no_red_natura.py <ruta_json>", flush=True)
-    sys.exit(1)
 
-json_path = Path(sys.argv[1])
-if not json_path.exists():
-    print(f"El archivo {json_path} no existe.", flush=True)
-    sys.exit(1)
+def construir_prompt(data: dict) -> str:
+    municipio = data.get("municipio", "municipio no especificado")
+    provincia = data.get("provincia", "")
+    coordenadas = f"UTM X={data.get('utm_x_principal')}, Y={data.get('utm_y_principal')}"
 
-step(f"Leyendo JSON: {json_path.name}")
-
-# 2. Cargar JSON existente
-try:
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-except Exception as e:
-    print(f"MB_ERR: No se pudo leer el JSON ({e})", flush=True)
-    sys.exit(1)
-
-municipio = data.get("municipio", "municipio no especificado")
-provincia = data.get("provincia", "")
-coordenadas = f"UTM X={data.get('utm_x_principal')}, Y={data.get('utm_y_principal')}"
-
-# 3. Construir prompt contextual
-prompt = f"""
+    return f"""
 Eres un redactor técnico especializado en medio ambiente.
 Redacta los tres apartados 4.3, 4.4 y 4.5 de un Estudio de Impacto Ambiental Simplificado
 para un sondeo de captación de agua subterránea ubicado en {municipio} ({provincia}), {coordenadas}.
@@ -56,32 +40,69 @@ Devuelve exclusivamente un JSON con este formato:
 }}
 """
 
-# 4. Llamada al modelo
-step("Llamando al modelo para redactar 4.3, 4.4 y 4.5...")
-try:
-    res = call_llm_extract_json(prompt, model="gpt-4.1-mini")
-    medio_biotico = res.get("4.3_Medio_biotico", "").strip()
-    medio_perceptual = res.get("4.4_Medio_perceptual", "").strip()
-    medio_socioeconomico = res.get("4.5_Medio_socioeconomico", "").strip()
-    step("Respuesta del modelo recibida y parseada correctamente.")
-except Exception as e:
-    warn(f"No se pudo obtener respuesta del modelo: {e}")
-    sys.exit(1)
-
-# 5. Validar contenido y actualizar el JSON
-if not (medio_biotico and medio_perceptual and medio_socioeconomico):
-    warn("Alguno de los apartados llegó vacío. No se modifica el JSON.")
-    sys.exit(1)
-
-data["4.3_Medio_biotico"] = medio_biotico
-data["4.4_Medio_perceptual"] = medio_perceptual
-data["4.5_Medio_socioeconomico"] = medio_socioeconomico
-
-# 6. Guardar cambios
-try:
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    step("JSON actualizado correctamente con los apartados 4.3, 4.4 y 4.5.")
-except Exception as e:
-    print(f"MB_ERR: No se pudo escribir en el JSON ({e})", flush=True)
-    sys.exit(1)
+
+def redactar_medio_no_red_natura(data: dict,
+                                 on_apartado: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+    """
+    Redacta 4.3, 4.4 y 4.5 (fuera de Red Natura). Lanza ValueError si algún apartado llega vacío.
+    Con `on_apartado(clave, texto_parcial)` se recibe cada apartado según se va generando.
+    """
+    claves = ("4.3_Medio_biotico", "4.4_Medio_perceptual", "4.5_Medio_socioeconomico")
+    esquema = esquema_desde_prompt({k: "string" for k in claves})
+    for k in claves:
+        esquema["properties"][k]["minLength"] = 1  # un apartado vacío cuenta como fallo de esquema
+    try:
+        res = llm_chat_json(construir_prompt(data), esquema, model="gpt-4.1-mini", nombre="medio_no_red_natura",
+                            on_campo=on_apartado)
+    except ErrorEsquema as e:
+        raise ValueError(f"Alguno de los apartados llegó vacío ({e}).")
+    return {k: res[k].strip() for k in claves}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    # 1. Verificar argumento de entrada
+    if len(argv) < 1:
+        print("Uso: python medio_biotico_no_red_natura.py <ruta_json>", flush=True)
+        sys.exit(1)
+
+    json_path = Path(argv[0])
+    if not json_path.exists():
+        print(f"El archivo {json_path} no existe.", flush=True)
+        sys.exit(1)
+
+    step(f"Leyendo JSON: {json_path.name}")
+
+    # 2. Cargar JSON existente
+    try:
+        data = cargar_json(json_path)
+    except Exception as e:
+        print(f"MB_ERR: No se pudo leer el JSON ({e})", flush=True)
+        sys.exit(1)
+
+    # 3. Llamada al modelo
+    step("Llamando al modelo para redactar 4.3, 4.4 y 4.5...")
+    try:
+        with informe_llm(json_path):
+            apartados = redactar_medio_no_red_natura(data)
+        step(f"Respuesta del modelo recibida y validada ({llm_cache.resumen()}; llamadas: {resumen_llamadas()}).")
+    except ValueError as e:
+        warn(f"{e} No se modifica el JSON.")
+        sys.exit(1)
+    except Exception as e:
+        warn(f"No se pudo obtener respuesta del modelo: {e}")
+        sys.exit(1)
+
+    # 4. Actualizar y guardar el JSON
+    data.update(apartados)
+    try:
+        guardar_json(json_path, data)
+        step("JSON actualizado correctamente con los apartados 4.3, 4.4 y 4.5.")
+    except Exception as e:
+        print(f"MB_ERR: No se pudo escribir en el JSON ({e})", flush=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,20 @@
 import sys
-import json
 import time
 from pathlib import Path
 import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
-from core.extraccion.llm_utils import call_llm_extract_json
+from core.extraccion import llm_cache
+from core.extraccion.llm_utils import llm_chat_json, esquema_desde_prompt, resumen_llamadas
+from core.extraccion.registro_llm import informe_llm
+from core.modelo_placeholders import cargar_json, guardar_json
 
 
 def fetch_sdf_data_api(es_code: str) -> Optional[Dict]:
@@ -56,11 +58,16 @@ def fetch_sdf_html(es_code: str) -> str:
         return "No se pudo extraer información del visor Natura 2000."
 
 
-def generar_medio_biotico_red_natura(json_path: str):
-    """Genera los apartados 4.3, 4.4 y 4.5 del EIA usando el texto del SDF."""
-    json_path = Path(json_path)
-    data = json.loads(json_path.read_text(encoding="utf-8"))
+# Clave del JSON del modelo -> placeholder
+APARTADOS = {"4.3": "4.3_Medio_biotico", "4.4": "4.4_Medio_perceptual", "4.5": "4.5_Medio_socioeconomico"}
+
 
+def redactar_medio_red_natura(data: dict,
+                              on_apartado: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+    """
+    Redacta 4.3, 4.4 y 4.5 a partir del SDF del espacio Natura 2000 del JSON (sin escribir nada).
+    Con `on_apartado(placeholder, texto_parcial)` se recibe cada apartado según se va generando.
+    """
     es_code = data.get("codigo_red_natura") or data.get("codigos_red_natura", [""])[0]
     if not es_code:
         raise ValueError("No se encontró código Red Natura en el JSON.")
@@ -117,37 +124,23 @@ def generar_medio_biotico_red_natura(json_path: str):
 
     print("RN_STEP: Enviando texto al modelo LLM para redacción…")
 
-    try:
-        texto_generado = call_llm_extract_json(prompt)
-    except Exception as e:
-        print(f"RN_WARN: El modelo no devolvió JSON válido ({e}). Reintentando en modo texto libre…")
-        texto_generado = call_llm_extract_json(prompt)
-
-    if isinstance(texto_generado, dict):
-        data["4.3_Medio_biotico"] = texto_generado.get("4.3", "")
-        data["4.4_Medio_perceptual"] = texto_generado.get("4.4", "")
-        data["4.5_Medio_socioeconomico"] = texto_generado.get("4.5", "")
-    else:
-        # Si viene como texto libre
-        secciones = {
-            "4.3_Medio_biotico": "",
-            "4.4_Medio_perceptual": "",
-            "4.5_Medio_socioeconomico": ""
-        }
-        partes = texto_generado.split("4.4")
-        if len(partes) > 1:
-            secciones["4.3_Medio_biotico"] = partes[0]
-            resto = partes[1].split("4.5")
-            if len(resto) > 1:
-                secciones["4.4_Medio_perceptual"] = resto[0]
-                secciones["4.5_Medio_socioeconomico"] = resto[1]
-        else:
-            secciones["4.3_Medio_biotico"] = texto_generado
+    # Salida estructurada: si no cumple el esquema, llm_chat_json ya reintenta indicando el fallo
+    esquema = esquema_desde_prompt({k: "string" for k in APARTADOS})
+    on_campo = (lambda k, texto: on_apartado(APARTADOS.get(k, k), texto)) if on_apartado else None
+    texto_generado = llm_chat_json(prompt, esquema, nombre="medio_red_natura", on_campo=on_campo)
+    return {ph: texto_generado[k] for k, ph in APARTADOS.items()}
+
 
-        data.update(secciones)
+def generar_medio_biotico_red_natura(json_path: str):
+    """Genera los apartados 4.3, 4.4 y 4.5 del EIA usando el texto del SDF."""
+    json_path = Path(json_path)
+    data = cargar_json(json_path)
+    with informe_llm(json_path):
+        data.update(redactar_medio_red_natura(data))
 
-    json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    guardar_json(json_path, data)
     print("Apartados 4.3-S4.5 generados correctamente.")
+    print(f"RN_STEP: Resumen {llm_cache.resumen()} · llamadas al modelo: {resumen_llamadas()}")
 
 
 if __name__ == "__main__":
@@ -1,35 +1,29 @@
 import os
 import re
-import json
 import sys
 from pathlib import Path
-from openai import OpenAI
 
 sys.path.append(str(Path(__file__).resolve().parents[2]))  # asegúrate de que pueda importar 'core'
 
-from core.extraccion.llm_utils import get_client
-
-client = get_client()
+from core.extraccion import llm_cache
+from core.extraccion.llm_utils import llm_chat
+from core.extraccion.registro_llm import informe_llm
+from core.modelo_placeholders import cargar_json, guardar_json
+from core.sintesis.secciones import anotar_huellas
 
 
 # ==============================================================
 # 🔹 CARGA SEGURA DE VARIABLES DE ENTORNO
 # ==============================================================
-
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise EnvironmentError(
-        "No se encontró la variable OPENAI_API_KEY. "
-        "Asegúrate de tener un archivo .env en la raíz con la clave."
-    )
-else:
+def comprobar_clave():
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise EnvironmentError(
+            "No se encontró la variable OPENAI_API_KEY. "
+            "Asegúrate de tener un archivo .env en la raíz con la clave."
+        )
     print("Clave OpenAI cargada correctamente.")
 
-# ==============================================================
-# 🔹 CONFIGURACIÓN DEL CLIENTE OPENAI
-# ==============================================================
-client = OpenAI(api_key=api_key)
-
 # ==============================================================
 # 🔹 PROMPT PARA PH_CONSUMO
 # ==============================================================
@@ -72,6 +66,25 @@ para que tenga formato limpio y legible en Word.
 4. Asegúrate de que los saltos sean interpretables en Word.
 """
 
+# ==============================================================
+# 🔹 REDACCIÓN DE CADA PLACEHOLDER (sin escribir en disco)
+# ==============================================================
+def redactar_consumo(data: dict) -> str:
+    texto_base = (data.get("PH_Consumo") or "").strip()
+    contexto = data.get("contexto_general", "Estudio de Impacto Ambiental del proyecto.")
+    prompt = PROMPT_CONSUMO.format(texto_base=texto_base, contexto=contexto)
+    texto_final = llm_chat(prompt, model="gpt-4.1-mini", temperature=1.0)
+    return re.sub(r"\n{3,}", "\n\n", texto_final).replace("\r", "")
+
+
+def redactar_localizacion(data: dict) -> str:
+    texto_base = (data.get("PH_Localizacion") or "").strip()
+    prompt = PROMPT_LOCALIZACION.format(texto_base=texto_base)
+    texto_final = llm_chat(prompt, model="gpt-4.1-mini", temperature=1.0)
+    texto_final = re.sub(r"\.\s+(?=[A-ZÁÉÍÓÚÑ])", ".\n\n", texto_final)
+    return re.sub(r"\n{3,}", "\n\n", texto_final)
+
+
 # ==============================================================
 # 🔹 PROCESAMIENTO DE PLACEHOLDERS
 # ==============================================================
@@ -84,43 +97,36 @@ def procesar_json():
     latest_json = json_files[0]
     print(f"\nUsando JSON más reciente: {latest_json.name}")
 
-    with open(latest_json, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = cargar_json(latest_json)
 
-    contexto = data.get("contexto_general", "Estudio de Impacto Ambiental del proyecto.")
+    # Los ya redactados por la generación en paralelo (core/sintesis/secciones.py) no se repiten
+    hechas = set((data.get("secciones_llm") or {}).get("generadas") or [])
+    redactadas = []
 
-    # === PH_Consumo ===
-    if texto_base := data.get("PH_Consumo", "").strip():
-        print("Reformateando y redactando PH_Consumo...")
-        prompt = PROMPT_CONSUMO.format(texto_base=texto_base, contexto=contexto)
-        respuesta = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[{"role": "user", "content": prompt}],
-        )
-        texto_final = respuesta.choices[0].message.content.strip()
-        texto_final = re.sub(r"\n{3,}", "\n\n", texto_final).replace("\r", "")
-        data["PH_Consumo"] = texto_final
-        print("PH_Consumo formateado correctamente.")
-
-    # === PH_Localizacion ===
-    if texto_base := data.get("PH_Localizacion", "").strip():
-        print("Reformateando PH_Localizacion...")
-        prompt = PROMPT_LOCALIZACION.format(texto_base=texto_base)
-        respuesta = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[{"role": "user", "content": prompt}],
-        )
-        texto_final = respuesta.choices[0].message.content.strip()
-        texto_final = re.sub(r"\.\s+(?=[A-ZÁÉÍÓÚÑ])", ".\n\n", texto_final)
-        texto_final = re.sub(r"\n{3,}", "\n\n", texto_final)
-        data["PH_Localizacion"] = texto_final
-        print("PH_Localizacion reformateado correctamente.")
+    with informe_llm(latest_json):
+        # === PH_Consumo ===
+        if "PH_Consumo" not in hechas and data.get("PH_Consumo", "").strip():
+            print("Reformateando y redactando PH_Consumo...")
+            data["PH_Consumo"] = redactar_consumo(data)
+            redactadas.append("PH_Consumo")
+            print("PH_Consumo formateado correctamente.")
+
+        # === PH_Localizacion ===
+        if "PH_Localizacion" not in hechas and data.get("PH_Localizacion", "").strip():
+            print("Reformateando PH_Localizacion...")
+            data["PH_Localizacion"] = redactar_localizacion(data)
+            redactadas.append("PH_Localizacion")
+            print("PH_Localizacion reformateado correctamente.")
+
+    # Huella con el texto ya redactado, para que secciones.recalcular() no lo vuelva a redactar
+    if redactadas:
+        anotar_huellas(data, redactadas)
 
     # === Guardar JSON actualizado ===
-    with open(latest_json, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    guardar_json(latest_json, data)
 
-    print("\nJSON actualizado con formato técnico listo para exportar a Word.\n")
+    print("\nJSON actualizado con formato técnico listo para exportar a Word.")
+    print(f"Resumen {llm_cache.resumen()}\n")
     return latest_json
 
 
@@ -128,4 +134,5 @@ def procesar_json():
 # 🔹 EJECUCIÓN DIRECTA
 # ==============================================================
 if __name__ == "__main__":
+    comprobar_clave()
     procesar_json()
@@ -0,0 +1,265 @@
+# core/sintesis/secciones.py
+"""
+Generación concurrente de las secciones redactadas por el LLM.
+
+Ninguna sección depende de otra, así que se lanzan todas a la vez (asyncio + hilos,
+con un tope de EIA_LLM_CONCURRENCIA llamadas simultáneas) sobre el cliente compartido
+y la caché de llm_utils. Los resultados se fusionan en el JSON de placeholders al final,
+en una sola escritura. La latencia total queda en la de la sección más lenta.
+
+Cada sección declara sus entradas (claves del JSON, con punto para los datos anidados:
+"parametros.potencia_bombeo_kw"). Al generarla se guarda la huella de esas entradas en
+"huellas_secciones"; recalcular() solo vuelve a generar las secciones cuyas entradas han
+cambiado desde entonces (otro tipo de instalación, una coordenada corregida, el resultado
+de Red Natura) y deja el resto como está.
+
+Uso directo:
+    python core/sintesis/secciones.py <placeholders.json> [seccion ...]
+    python core/sintesis/secciones.py <placeholders.json> --recalcular [seccion ...]
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+import asyncio
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from core.extraccion import llm_cache, limite_llm, respaldo_llm
+from core.extraccion.llm_utils import seccion_llm, llamadas_por_seccion
+from core.extraccion.registro_llm import informe_llm
+from core.modelo_placeholders import cargar_json, guardar_json
+
+CONCURRENCIA = int(os.getenv("EIA_LLM_CONCURRENCIA") or 4)
+# Huella de las entradas con que se generó cada sección, en el JSON de placeholders
+CLAVE_HUELLAS = "huellas_secciones"
+
+
+class Seccion(NamedTuple):
+    nombre: str
+    claves: List[str]                       # placeholders que rellena
+    entradas: Tuple[str, ...]               # claves del JSON que lee (con punto si van anidadas)
+    elegible: Callable[[dict], bool]        # si hay datos para generarla
+    generar: Callable[[dict], Dict[str, str]]
+
+
+def _valor(data: dict, ruta: str) -> Any:
+    nodo = data
+    for parte in ruta.split("."):
+        if not isinstance(nodo, dict):
+            return None
+        nodo = nodo.get(parte)
+    return nodo
+
+
+def huella(seccion: Seccion, data: dict) -> str:
+    """Huella de las entradas de la sección en `data`."""
+    valores = [_valor(data, e) for e in seccion.entradas]
+    base = json.dumps(valores, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()[:16]
+
+
+def _en_red_natura(data: dict) -> bool:
+    return (data.get("estado_red_natura") or "").lower() == "en_red_natura" or bool(data.get("red_natura"))
+
+
+# --- generadores (importan su módulo al usarse: algunos arrastran selenium) ---
+def _consumo(data):
+    from core.sintesis.redactar_placeholder import redactar_consumo
+    return {"PH_Consumo": redactar_consumo(data)}
+
+
+def _localizacion(data):
+    from core.sintesis.redactar_placeholder import redactar_localizacion
+    return {"PH_Localizacion": redactar_localizacion(data)}
+
+
+def _alternativas(data):
+    from core.sintesis.alternativas_llm import generar_alternativas_llm
+    return generar_alternativas_llm(data)
+
+
+def _instalacion(data):
+    from core.sintesis.instalacion_electrica import redactar_instalacion_llm
+    return {"instalacion_electrica": redactar_instalacion_llm(data, tipo=data["tipo_instalacion"])}
+
+
+def _usos(data):
+    from core.sintesis.usos_actuales_llm import redactar_usos_actuales
+    return {"usos_actuales_llm": redactar_usos_actuales(data)}
+
+
+def _medio(data):
+    if _en_red_natura(data):
+        from core.sintesis.medio_biotico_red_natura import redactar_medio_red_natura
+        return redactar_medio_red_natura(data)
+    from core.sintesis.medio_biotico_no_red_natura import redactar_medio_no_red_natura
+    return redactar_medio_no_red_natura(data)
+
+
+_USO = ("parametros.uso_previsto", "parametros.detalles_de_uso")
+
+# Consumo y localización reescriben su propio bloque: su huella se toma con el texto ya redactado,
+# así que solo vuelven a estar pendientes si alguien cambia ese texto
+SECCIONES: Dict[str, Seccion] = {s.nombre: s for s in [
+    Seccion("PH_Consumo", ["PH_Consumo"], ("PH_Consumo", "contexto_general"),
+            lambda d: bool((d.get("PH_Consumo") or "").strip()), _consumo),
+    Seccion("PH_Localizacion", ["PH_Localizacion"], ("PH_Localizacion",),
+            lambda d: bool((d.get("PH_Localizacion") or "").strip()), _localizacion),
+    Seccion("alternativas", ["PH_Alternativas_Desc", "PH_Alternativas_Val", "PH_Alternativas_Just"],
+            _USO + ("parametros.profundidad_proyectada_m", "parametros.diametro_perforacion_inicial_mm",
+                    "parametros.diametro_perforacion_definitivo_mm", "localizacion.municipio",
+                    "localizacion.provincia"),
+            lambda d: True, _alternativas),
+    Seccion("instalacion_electrica", ["instalacion_electrica"],
+            _USO + ("tipo_instalacion", "parametros.potencia_bombeo_kw", "localizacion.municipio",
+                    "localizacion.provincia"),
+            lambda d: d.get("tipo_instalacion") in ("red", "fotovoltaica"), _instalacion),
+    Seccion("usos_actuales", ["usos_actuales_llm"],
+            ("municipio", "localizacion.parcela", "localizacion.poligono", "parcela", "poligono"),
+            lambda d: True, _usos),
+    # 4.3-4.5 dependen de si la parcela está en Red Natura: solo tras la comprobación
+    Seccion("medio", ["4.3_Medio_biotico", "4.4_Medio_perceptual", "4.5_Medio_socioeconomico"],
+            ("estado_red_natura", "red_natura", "codigo_red_natura", "codigos_red_natura",
+             "municipio", "provincia", "utm_x_principal", "utm_y_principal"),
+            lambda d: "estado_red_natura" in d or "red_natura" in d, _medio),
+]}
+
+
+def anotar_huellas(data: dict, nombres: List[str]):
+    """Guarda en `data` la huella actual de `nombres` (secciones que acaban de generarse fuera de aquí)."""
+    huellas = data.setdefault(CLAVE_HUELLAS, {})
+    for n in nombres:
+        huellas[n] = huella(SECCIONES[n], data)
+
+
+def pendientes(data: dict, nombres: Optional[List[str]] = None) -> List[str]:
+    """Secciones elegibles (de `nombres`, o todas) sin generar o con entradas cambiadas desde entonces."""
+    huellas = data.get(CLAVE_HUELLAS) or {}
+    return [s.nombre for s in (SECCIONES[n] for n in (SECCIONES if nombres is None else nombres))
+            if s.elegible(data) and huellas.get(s.nombre) != huella(s, data)]
+
+
+async def _generar(secciones: List[Seccion], data: dict, concurrencia: int):
+    sem = asyncio.Semaphore(concurrencia)
+
+    async def una(s: Seccion):
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                with seccion_llm(s.nombre):  # to_thread copia el contexto: las llamadas se atribuyen a la sección
+                    res = await asyncio.to_thread(s.generar, data)
+                # Error que el generador devuelve en vez de lanzar, o respuesta sin ningún placeholder
+                err = res.pop("_error", None)
+                if not err and not any(res.get(k) not in (None, "") for k in s.claves):
+                    err = "respuesta vacía"
+            except Exception as e:
+                res, err = {}, f"{type(e).__name__}: {e}"
+            return s.nombre, res, err, time.perf_counter() - t0
+
+    return await asyncio.gather(*(una(s) for s in secciones))
+
+
+def generar_secciones(json_path, nombres: Optional[List[str]] = None,
+                      concurrencia: int = CONCURRENCIA) -> Dict:
+    """
+    Genera en paralelo las secciones elegibles (todas, o las de `nombres`) y las fusiona en el
+    JSON. Devuelve el informe: generadas, omitidas (sin datos), errores y tiempos por sección.
+    """
+    json_path = Path(json_path)
+    data = cargar_json(json_path)
+    pedidas = [SECCIONES[n] for n in (SECCIONES if nombres is None else nombres)]
+    elegibles = [s for s in pedidas if s.elegible(data)]
+
+    cache_antes, llamadas_antes, cola_antes = llm_cache.estadisticas(), llamadas_por_seccion(), limite_llm.estadisticas()
+    respaldo_antes = respaldo_llm.estadisticas()
+    t0 = time.perf_counter()
+    with informe_llm(json_path):
+        resultados = asyncio.run(_generar(elegibles, data, concurrencia)) if elegibles else []
+    total = time.perf_counter() - t0
+    cache_despues, llamadas_despues, cola_despues = (llm_cache.estadisticas(), llamadas_por_seccion(),
+                                                     limite_llm.estadisticas())
+    respaldo_despues = respaldo_llm.estadisticas()
+
+    informe = {
+        "generadas": [n for n, res, err, _ in resultados if not err],
+        "omitidas": [s.nombre for s in pedidas if s not in elegibles],
+        "errores": {n: err for n, _, err, _ in resultados if err},
+        "tiempos_s": {n: round(t, 2) for n, _, _, t in resultados},
+        "total_s": round(total, 2),
+        "cache": {k: cache_despues[k] - cache_antes[k] for k in cache_despues},
+        # Llamadas reales al API por sección (0 = todo salió de la caché)
+        "llamadas": {n: llamadas_despues.get(n, 0) - llamadas_antes.get(n, 0) for n, _, _, _ in resultados},
+        # Tiempo en cola del limitador de ritmo (RPM/TPM) y 429 recibidos
+        "cola": {
+            "esperas": cola_despues["esperas"] - cola_antes["esperas"],
+            "espera_s": round(cola_despues["espera_total_s"] - cola_antes["espera_total_s"], 2),
+            "rechazos_429": cola_despues["rechazos_429"] - cola_antes["rechazos_429"],
+        },
+        # Copias lanzadas por respaldo_llm (si está activo) y cuántas ganaron a la original
+        "respaldo": {k: round(respaldo_despues[k] - respaldo_antes[k], 2) for k in ("disparos", "ganados")},
+    }
+
+    # Fusión única al final (relee por si otra parte de la app tocó el JSON mientras tanto)
+    actual = cargar_json(json_path)
+    origen = actual.setdefault("origen", {})
+    for nombre, res, err, _ in resultados:
+        # Lo que haya llegado se guarda, pero con error no hay huella: recalcular la volverá a pedir
+        nuevos = {k: v for k, v in res.items() if v not in (None, "")}
+        actual.update(nuevos)
+        origen.update({k: f"ia:{nombre}" for k in nuevos})
+        if not err:
+            # Huella de las entradas con que se generó (las de `data`, no las releídas)
+            actual.setdefault(CLAVE_HUELLAS, {})[nombre] = huella(SECCIONES[nombre], {**data, **nuevos})
+    previas = (actual.get("secciones_llm") or {}).get("generadas") or []
+    actual["secciones_llm"] = {**informe, "generadas": sorted(set(previas) | set(informe["generadas"]))}
+    guardar_json(json_path, actual)
+    return informe
+
+
+def recalcular(json_path, nombres: Optional[List[str]] = None, concurrencia: int = CONCURRENCIA) -> Dict:
+    """
+    Genera solo las secciones pendientes (sin generar o con entradas cambiadas) de `nombres`, o
+    de todas. Devuelve el informe de generar_secciones con "al_dia": las que no hizo falta tocar.
+    Si no hay ninguna pendiente no se llama a generar_secciones ni se toca el JSON.
+    """
+    data = cargar_json(json_path)
+    candidatas = list(SECCIONES if nombres is None else nombres)
+    a_generar = pendientes(data, candidatas)
+    if a_generar:
+        informe = generar_secciones(json_path, a_generar, concurrencia)
+    else:
+        # Nada pendiente: no se reescribe el JSON (secciones_llm queda como estaba)
+        informe = {
+            "generadas": [], "errores": {}, "tiempos_s": {}, "total_s": 0.0,
+            "cache": {k: 0 for k in llm_cache.estadisticas()}, "llamadas": {},
+            "cola": {"esperas": 0, "espera_s": 0.0, "rechazos_429": 0},
+            "respaldo": {"disparos": 0, "ganados": 0},
+        }
+    informe["omitidas"] = [n for n in candidatas if not SECCIONES[n].elegible(data)]
+    informe["al_dia"] = [n for n in candidatas if n not in a_generar and n not in informe["omitidas"]]
+    return informe
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--recalcular"]
+    if not args:
+        print("Uso: python core/sintesis/secciones.py <placeholders.json> [--recalcular] [seccion ...]")
+        sys.exit(1)
+    if "--recalcular" in sys.argv:
+        inf = recalcular(args[0], args[1:] or None)
+        print(f"Al día (sin regenerar): {', '.join(inf['al_dia']) or '—'}")
+    else:
+        inf = generar_secciones(args[0], args[1:] or None)
+    for nombre, t in inf["tiempos_s"].items():
+        estado = "ERROR " + inf["errores"][nombre] if nombre in inf["errores"] else "ok"
+        print(f"{nombre:24s} {t:6.2f} s  {inf['llamadas'][nombre]} llamadas  {estado}")
+    print(f"Total {inf['total_s']:.2f} s (suma secuencial {sum(inf['tiempos_s'].values()):.2f} s) · "
+          f"omitidas: {', '.join(inf['omitidas']) or '—'}")
+    print(f"Cola LLM: {inf['cola']['esperas']} esperas ({inf['cola']['espera_s']:.1f} s), "
+          f"{inf['cola']['rechazos_429']} rechazos 429 · {respaldo_llm.resumen()}")
@@ -1,5 +1,5 @@
 from pathlib import Path
-import os, sys, json, subprocess, time
+import os, sys, subprocess, time
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -8,7 +8,11 @@ PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from core.extraccion.llm_utils import get_client
+from core.extraccion import llm_cache
+from core.extraccion.llm_utils import llm_chat
+from core.extraccion.registro_llm import informe_llm
+from core.modelo_placeholders import actualizar_json, cargar_json
+from core.sintesis.secciones import CLAVE_HUELLAS, anotar_huellas
 
 load_dotenv(dotenv_path=PROJECT_ROOT / ".env", override=True)
 
@@ -24,18 +28,9 @@ def done(path_img=None):
     if path_img:
         print(f"UA_CAPTURE: {path_img}", flush=True)
 
-# --- función principal ---
-def usos_actuales_llm(json_path: Path):
-    """Genera texto técnico de 'Usos actuales del terreno' y lanza la captura CH Duero."""
-
-    # === 1. Cargar JSON ===
-    if not json_path.exists():
-        print(f"❌ No existe JSON: {json_path}", flush=True)
-        sys.exit(1)
-
-    step(f"JSON de trabajo => {json_path.name}")
-    data = json.loads(json_path.read_text(encoding="utf-8"))
-
+# --- redacción (sin captura ni escritura) ---
+def redactar_usos_actuales(data: dict) -> str:
+    """Párrafo técnico de 'Usos actuales del terreno' (texto genérico si falla el modelo)."""
     municipio = (
         data.get("municipio")
         or data.get("PH_Localizacion", {}).get("municipio")
@@ -45,8 +40,6 @@ def usos_actuales_llm(json_path: Path):
     parcela = loc.get("parcela") or data.get("parcela") or ""
     poligono = loc.get("poligono") or data.get("poligono") or ""
 
-    # === 2. Generar texto técnico con el modelo ===
-    client = get_client()
     prompt = f"""
     Redacta un párrafo técnico, sin encabezado ni título, describiendo los usos actuales del terreno 
     en el ámbito del Estudio de Impacto Ambiental. Explica la ocupación actual, los cultivos o 
@@ -60,13 +53,8 @@ def usos_actuales_llm(json_path: Path):
 
     step("Solicitando redacción al modelo…")
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.6,
-        )
-        texto_usos = (resp.choices[0].message.content or "").strip()
-        step("Texto recibido del modelo.")
+        texto_usos = llm_chat(prompt, model="gpt-4o-mini", temperature=0.6)
+        step(f"Texto recibido del modelo ({llm_cache.resumen()}).")
     except Exception as e:
         warn(f"Fallo LLM: {e}. Se usa texto genérico.")
         texto_usos = (
@@ -74,6 +62,24 @@ def usos_actuales_llm(json_path: Path):
             "herbáceas y matorral disperso. No existen construcciones destacadas en las inmediaciones, "
             "manteniendo un uso rural tradicional."
         )
+    return texto_usos
+
+
+# --- función principal ---
+def usos_actuales_llm(json_path: Path):
+    """Genera texto técnico de 'Usos actuales del terreno' y lanza la captura CH Duero."""
+
+    # === 1. Cargar JSON ===
+    if not json_path.exists():
+        print(f"❌ No existe JSON: {json_path}", flush=True)
+        sys.exit(1)
+
+    step(f"JSON de trabajo => {json_path.name}")
+    data = cargar_json(json_path)
+
+    # === 2. Generar texto técnico con el modelo ===
+    with informe_llm(json_path):
+        texto_usos = redactar_usos_actuales(data)
 
     # === 3. Generar captura CH Duero ===
     captura_path = None
@@ -117,11 +123,13 @@ def usos_actuales_llm(json_path: Path):
 
     # === 4. Guardar resultados ===
     step("Escribiendo 'usos_actuales_llm' en el JSON…")
-    data["usos_actuales_llm"] = texto_usos
+    # Huella de las entradas usadas, para que secciones.recalcular() no lo repita
+    anotar_huellas(data, ["usos_actuales"])
+    cambios = {"usos_actuales_llm": texto_usos, CLAVE_HUELLAS: data[CLAVE_HUELLAS]}
     if captura_path:
-        data["captura_usos_actuales"] = str(Path(captura_path).resolve()).replace("\\", "/")
+        cambios["captura_usos_actuales"] = str(Path(captura_path).resolve()).replace("\\", "/")
 
-    json_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    actualizar_json(json_path, cambios)
     step("JSON actualizado correctamente.")
     done(captura_path)
 